@@ -0,0 +1,15 @@
+"""
+Performance benchmarks for the backend.
+
+Run from the backend directory, e.g. ``python -m benchmarks.bench_columnar``.
+"""
+import os
+import sys
+
+
+def setup_django():
+    """Configure Django so benchmarks can import the equipment app"""
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
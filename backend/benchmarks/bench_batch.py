@@ -0,0 +1,102 @@
+"""
+Batch upload throughput by number of parser processes.
+
+    python -m benchmarks.bench_batch --files 16 --rows 50000 --workers 0 1 2 4 8
+
+Ingests the same number of fresh synthetic CSVs once per worker count
+(0 parses in the calling thread) and once file by file through
+``create_dataset``, the path a loop over the single-file upload takes.
+Parse time is reported separately from staging and the database insert.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks import setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--files', type=int, default=16)
+    parser.add_argument('--rows', type=int, default=50_000, help='Rows per file')
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 1, 2, 4, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.update(
+            DJANGO_SETTINGS_MODULE='benchmarks.settings',
+            BENCH_DB=os.path.join(tmp, 'db.sqlite3'),
+            BENCH_MEDIA=os.path.join(tmp, 'media'),
+            REPORT_PRERENDER='False',
+            RETENTION_IN_PROCESS='False',
+        )
+        setup_django()
+        from django.conf import settings
+        from django.contrib.auth.models import User
+        from django.core.files import File
+        from django.core.management import call_command
+        from equipment import batch
+        from equipment.ingest import create_dataset
+        from equipment.workers import get_process_pool, reset_process_pool
+        from benchmarks.synthetic import write_csv
+
+        call_command('migrate', verbosity=0)
+        user = User.objects.create_user('bench-batch')
+        seed = 0
+
+        def fresh_files():
+            # New seeds every run, so no content is deduplicated against earlier runs
+            nonlocal seed
+            paths = []
+            for _ in range(args.files):
+                path = os.path.join(tmp, f'bench_{seed}.csv')
+                write_csv(path, args.rows, seed=seed)
+                paths.append(path)
+                seed += 1
+            return paths
+
+        total_rows = args.files * args.rows
+        print(f'{args.files} files x {args.rows} rows, {os.cpu_count()} CPUs')
+        print(f'{"mode":>12} {"parse":>9} {"total":>9} {"files/s":>8} {"rows/s":>10}')
+
+        paths = fresh_files()
+        start = time.perf_counter()
+        for path in paths:
+            with open(path, 'rb') as f:
+                create_dataset(user, f, os.path.basename(path))
+        sequential = time.perf_counter() - start
+        print(f'{"one by one":>12} {"":>9} {sequential:>8.2f}s {args.files / sequential:>8.2f} '
+              f'{total_rows / sequential:>10.0f}')
+
+        for workers in args.workers:
+            settings.BATCH_PARSE_WORKERS = workers
+            if workers:
+                # Start the processes before timing; they live as long as the web process
+                pool = get_process_pool()
+                list(pool.map(abs, range(workers * 4)))
+
+            handles = [open(path, 'rb') for path in fresh_files()]
+            files = [File(f, name=os.path.basename(f.name)) for f in handles]
+            with tempfile.TemporaryDirectory(dir=tmp) as directory:
+                start = time.perf_counter()
+                items = batch.stage_uploads(files, directory)
+                parse_start = time.perf_counter()
+                batch.parse_items(items)
+                parse = time.perf_counter() - parse_start
+                batch.create_datasets(user, items)
+                total = time.perf_counter() - start
+            for f in handles:
+                f.close()
+            failed = [item.error for item in items if item.dataset is None]
+            if failed:
+                raise RuntimeError(f'Batch failed: {failed[0]}')
+            if workers:
+                reset_process_pool(pool)
+
+            print(f'{f"{workers} procs":>12} {parse:>8.2f}s {total:>8.2f}s {args.files / total:>8.2f} '
+                  f'{total_rows / total:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Compare CSV re-parse time with loading the columnar binary copy.
+
+    python -m benchmarks.bench_columnar --rows 100000 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks import setup_django
+
+
+def timed(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    setup_django()
+    import pandas as pd
+    from django.core.files.storage import FileSystemStorage
+    from equipment.columnar import ColumnarReader, write_columnar
+    from equipment.parsing import iter_chunks
+    from benchmarks.synthetic import write_csv
+
+    print(f'{"rows":>10} {"csv parse":>11} {"npy full":>10} {"npy numeric":>12} {"npy page":>10} {"speedup":>8}')
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = FileSystemStorage(location=tmp)
+        for rows in args.rows:
+            csv_path = os.path.join(tmp, f'bench_{rows}.csv')
+            write_csv(csv_path, rows)
+            with open(csv_path, 'rb') as f:
+                directory = write_columnar(iter_chunks(f), f'bench_{rows}.csv', storage)
+
+            csv_time = timed(lambda: pd.read_csv(csv_path), args.repeat)
+            full_time = timed(lambda: ColumnarReader(directory, storage).frame(), args.repeat)
+            numeric_time = timed(
+                lambda: ColumnarReader(directory, storage).frame(['Flowrate', 'Pressure', 'Temperature']),
+                args.repeat
+            )
+            page_time = timed(
+                lambda: ColumnarReader(directory, storage).frame(start=rows // 2, stop=rows // 2 + 500),
+                args.repeat
+            )
+            print(
+                f'{rows:>10} {csv_time * 1000:>9.1f}ms {full_time * 1000:>8.1f}ms '
+                f'{numeric_time * 1000:>10.1f}ms {page_time * 1000:>8.2f}ms {csv_time / full_time:>7.1f}x'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+CSV parse time and chunk memory by engine and float dtype.
+
+    python -m benchmarks.bench_parse --rows 10000 100000 1000000
+
+``inferred`` is plain ``pd.read_csv`` in chunks with pandas' own type
+inference, the parser uploads used before. The other modes run
+``parsing.iter_chunks`` with the given engine (pyarrow only when installed)
+and float dtype. ``--dirty`` turns that fraction of Flowrate values into
+text, so the coercion path is timed too. Memory is the deep size of one
+parsed chunk.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks import setup_django
+
+
+def timed(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--dirty', type=float, default=0.0, help='Fraction of Flowrate values made non-numeric')
+    args = parser.parse_args()
+
+    setup_django()
+    import numpy as np
+    import pandas as pd
+    from django.conf import settings
+    from equipment.parsing import CHUNK_ROWS, ParseReport, iter_chunks, pa
+    from benchmarks.synthetic import write_csv
+
+    def inferred(path):
+        with open(path, 'rb') as f:
+            chunks = pd.read_csv(f, chunksize=CHUNK_ROWS)
+            first = next(chunks)
+            return first, None, len(first) + sum(len(chunk) for chunk in chunks)
+
+    def parsed(path, engine, float_dtype):
+        settings.CSV_FLOAT_DTYPE = float_dtype
+        report = ParseReport()
+        with open(path, 'rb') as f:
+            chunks = iter_chunks(f, report=report, engine=engine)
+            first = next(chunks)
+            return first, report, len(first) + sum(len(chunk) for chunk in chunks)
+
+    modes = [('inferred', inferred)]
+    for engine in ['c', 'pyarrow'] if pa is not None else ['c']:
+        for float_dtype in ['float64', 'float32']:
+            modes.append((
+                f'{engine}/{float_dtype[-2:]}',
+                lambda path, engine=engine, float_dtype=float_dtype: parsed(path, engine, float_dtype)
+            ))
+
+    print(f'{"rows":>9} {"mode":>10} {"seconds":>8} {"MB/s":>7} {"rows/s":>10} {"chunk MB":>9} {"coerced":>8}')
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            path = os.path.join(tmp, f'bench_{rows}.csv')
+            write_csv(path, rows)
+            if args.dirty:
+                frame = pd.read_csv(path)
+                bad = np.random.default_rng(0).random(rows) < args.dirty
+                frame['Flowrate'] = frame['Flowrate'].astype(object)
+                frame.loc[bad, 'Flowrate'] = '#VALUE!'
+                frame.to_csv(path, index=False)
+            size_mb = os.path.getsize(path) / 1024 / 1024
+
+            for name, parse in modes:
+                seconds, (first, report, count) = timed(lambda: parse(path), args.repeat)
+                chunk_mb = first.memory_usage(deep=True).sum() / 1024 / 1024
+                coerced = sum(report.coerced_values.values()) if report else '-'
+                print(f'{count:>9} {name:>10} {seconds:>8.3f} {size_mb / seconds:>7.1f} '
+                      f'{count / seconds:>10.0f} {chunk_mb:>9.2f} {coerced:>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Render time and peak memory of the full PDF report.
+
+    python -m benchmarks.bench_report --rows 10000 100000 --budget-mb 64
+
+For each size this ingests a synthetic dataset into a scratch database and
+times the full report cold (chart data computed) and warm (chart data
+reused from storage), then renders it once more under tracemalloc for the
+peak allocation. ``--baseline-rows`` also times the rows as one giant
+Table, the layout the paged row listing replaces. Exits non-zero when the
+peak exceeds ``--budget-mb``.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks import setup_django
+
+
+def render(build, dataset, path):
+    """Seconds taken to render into ``path``"""
+    with open(path, 'wb') as out:
+        start = time.perf_counter()
+        build(dataset, out)
+        return time.perf_counter() - start
+
+
+def peak_mb(build, dataset, path):
+    """Peak MB of Python allocations while rendering into ``path``"""
+    tracemalloc.start()
+    try:
+        render(build, dataset, path)
+        return tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def build_single_table_pdf(dataset, out):
+    """The naive layout: every row as cells of one Table flowable"""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Table
+    from equipment.columnar import NAME_COLUMN, TYPE_COLUMN, iter_frames
+    from equipment.parsing import NUMERIC_COLUMNS
+
+    columns = [NAME_COLUMN, TYPE_COLUMN] + NUMERIC_COLUMNS
+    rows = [['#'] + columns]
+    for frame in iter_frames(dataset, columns):
+        for values in frame.itertuples(index=False):
+            rows.append([str(len(rows))] + [
+                f'{v:.2f}' if isinstance(v, float) else str(v) for v in values
+            ])
+    doc = SimpleDocTemplate(out, pagesize=letter, pageCompression=1)
+    doc.build([Table(rows, colWidths=[40, 150, 86, 64, 64, 64], rowHeights=12, repeatRows=1)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--budget-mb', type=float, default=64, help='Peak allocation allowed per render')
+    parser.add_argument('--baseline-rows', type=int, default=10_000,
+                        help='Largest size also rendered as one Table (0 to skip)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.update(
+            DJANGO_SETTINGS_MODULE='benchmarks.settings',
+            BENCH_DB=os.path.join(tmp, 'db.sqlite3'),
+            BENCH_MEDIA=os.path.join(tmp, 'media'),
+            REPORT_PRERENDER='False',
+            RETENTION_IN_PROCESS='False',
+            REPORT_MAX_ROWS='',
+        )
+        setup_django()
+        from django.contrib.auth.models import User
+        from django.core.management import call_command
+        from equipment.charts import evict_chart_data
+        from equipment.ingest import create_dataset
+        from equipment.reports import build_full_pdf
+        from benchmarks.synthetic import write_csv
+
+        call_command('migrate', verbosity=0)
+        user = User.objects.create_user('bench-report')
+
+        print(f'{"rows":>9} {"cold":>8} {"warm":>8} {"peak MB":>8} {"pdf MB":>7} {"one Table":>10}')
+        over_budget = False
+        path = os.path.join(tmp, 'report.pdf')
+        for rows in args.rows:
+            csv_path = os.path.join(tmp, f'bench_{rows}.csv')
+            write_csv(csv_path, rows)
+            with open(csv_path, 'rb') as f:
+                dataset = create_dataset(user, f, f'bench_{rows}.csv')
+            evict_chart_data(dataset.id, dataset.revision)
+
+            cold = render(build_full_pdf, dataset, path)
+            warm = render(build_full_pdf, dataset, path)
+            size = os.path.getsize(path) / 1024 / 1024
+            peak = peak_mb(build_full_pdf, dataset, path)
+            over_budget = over_budget or peak > args.budget_mb
+            single = (
+                f'{render(build_single_table_pdf, dataset, path):>9.2f}s'
+                if rows <= args.baseline_rows else f'{"-":>10}'
+            )
+            print(f'{rows:>9} {cold:>7.2f}s {warm:>7.2f}s {peak:>8.1f} {size:>7.2f} {single}')
+
+    if over_budget:
+        print(f'Peak allocation exceeded the {args.budget_mb:.0f} MB budget')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
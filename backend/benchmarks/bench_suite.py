@@ -0,0 +1,309 @@
+"""
+Latency, peak RSS and allocations of the backend hot paths, with a regression check.
+
+    python -m benchmarks.bench_suite --output before.json
+    python -m benchmarks.bench_suite --output after.json --baseline before.json --threshold 0.25
+
+Requests go through the Django test client to a scratch database:
+``upload`` of synthetic CSVs at each of ``--rows``, ``download_pdf`` of
+every ``--pdf-modes`` report rendered cold, ``history`` with ``--datasets``
+datasets stored (response cache cleared before each run) and ``cleanup``
+of that many datasets through retention. Each case runs ``--warmup`` times
+untimed, so imports and first-request setup are left out, then
+``--repeat`` times timed. ``peak_rss_mb`` is the process high-water mark
+during a run and ``rss_growth_mb`` how far it rose above the RSS at the
+start (the mark is reset before each run on Linux, elsewhere it only ever
+grows); ``peak_alloc_mb`` is the tracemalloc peak of one further, untimed
+run. Background work that a run or its preparation schedules (quantiles
+and quality checks after an upload) is waited for untimed, so it counts
+towards memory but not latency and never overlaps a timed run. The test
+client builds request bodies in memory, so upload figures include a copy
+of the file.
+
+Results are written as JSON. With ``--baseline``, a case whose median time
+or memory grew by more than ``--threshold`` (and by more than a small
+absolute amount, to ignore noise) is reported and the exit status is 1.
+"""
+import argparse
+import gc
+import itertools
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from benchmarks import setup_django
+
+# A benchmark: ``prepare()`` runs untimed before each run and returns the argument of ``run``
+Case = namedtuple('Case', 'name prepare run')
+
+# Metrics compared with a baseline, and the least growth that counts as a regression
+COMPARED_METRICS = {'median_s': 0.01, 'peak_alloc_mb': 1.0, 'rss_growth_mb': 10.0}
+
+
+def reset_peak_rss():
+    """Reset the RSS high-water mark; returns False where that is not possible"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def rss_mb(field='VmHWM'):
+    """Peak (``VmHWM``) or current (``VmRSS``) resident set size in MB"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(f'{field}:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Without /proc only the lifetime peak is known; ru_maxrss is KB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / (1024 if sys.platform == 'darwin' else 1)
+
+
+def expect(response, status):
+    if response.status_code != status:
+        raise RuntimeError(f'{response.status_code} instead of {status}: {response.content[:200]!r}')
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    response.close()
+
+
+def prepare(case):
+    """``case.prepare()``, once the background work it scheduled has finished"""
+    from equipment.workers import wait_for_background
+
+    arg = case.prepare()
+    wait_for_background()
+    return arg
+
+
+def measure(case, repeat, warmup=1, allocations=True):
+    """Run a case ``warmup`` times untimed, ``repeat`` times timed and once under tracemalloc"""
+    from equipment.workers import wait_for_background
+
+    for _ in range(warmup):
+        case.run(prepare(case))
+        wait_for_background()
+    times = []
+    peak_rss = rss_growth = 0
+    resettable = True
+    for _ in range(repeat):
+        arg = prepare(case)
+        gc.collect()
+        resettable = reset_peak_rss()
+        start_rss = rss_mb('VmRSS')
+        start = time.perf_counter()
+        case.run(arg)
+        times.append(time.perf_counter() - start)
+        wait_for_background()
+        peak = rss_mb()
+        peak_rss = max(peak_rss, peak)
+        rss_growth = max(rss_growth, peak - start_rss)
+
+    result = {
+        'runs': repeat,
+        'median_s': round(statistics.median(times), 4),
+        'min_s': round(min(times), 4),
+        'max_s': round(max(times), 4),
+        'peak_rss_mb': round(peak_rss, 1),
+        'rss_growth_mb': round(rss_growth, 1) if resettable else None,
+    }
+    if allocations:
+        arg = prepare(case)
+        gc.collect()
+        tracemalloc.start()
+        try:
+            case.run(arg)
+            wait_for_background()
+            result['peak_alloc_mb'] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def regressions(results, baseline, threshold):
+    """``(case, metric, before, after)`` for every metric that grew past the threshold"""
+    found = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        for metric, least in COMPARED_METRICS.items():
+            old, new = before.get(metric), result.get(metric)
+            if old is None or new is None:
+                continue
+            if new > old * (1 + threshold) and new - old > least:
+                found.append((name, metric, old, new))
+    return found
+
+
+def build_cases(args, tmp):
+    """The cases to run, with the users, clients and stored datasets they need"""
+    from django.contrib.auth.models import User
+    from django.test import Client
+    from equipment.analytics import MAX_HISTORY_LIMIT
+    from equipment.caching import invalidate_user
+    from equipment.ingest import create_dataset
+    from equipment.models import Dataset
+    from equipment.reports import evict_reports
+    from benchmarks.synthetic import write_csv
+
+    # Every synthetic file gets a new seed, so no upload is deduplicated against an earlier one
+    seeds = itertools.count(1)
+
+    def fresh_csv(rows, name):
+        return write_csv(os.path.join(tmp, name), rows, seed=next(seeds))
+
+    def make_datasets(user, count):
+        for i in range(count):
+            path = fresh_csv(args.dataset_rows, 'stored.csv')
+            with open(path, 'rb') as f:
+                create_dataset(user, f, f'stored_{i}.csv')
+
+    def client_for(username):
+        user = User.objects.create_user(username)
+        client = Client()
+        client.force_login(user)
+        return user, client
+
+    cases = []
+    if 'upload' in args.cases:
+        _, upload_client = client_for('bench-upload')
+
+        def upload(path):
+            with open(path, 'rb') as f:
+                expect(upload_client.post('/api/datasets/upload/?include_rows=false', {'file': f}), 201)
+
+        for rows in args.rows:
+            cases.append(Case(
+                f'upload/{rows}', lambda rows=rows: fresh_csv(rows, f'upload_{rows}.csv'), upload
+            ))
+
+    if 'download_pdf' in args.cases:
+        pdf_user, pdf_client = client_for('bench-pdf')
+        for rows in args.rows:
+            with open(fresh_csv(rows, f'report_{rows}.csv'), 'rb') as f:
+                dataset = create_dataset(pdf_user, f, f'report_{rows}.csv')
+
+            def cold(dataset=dataset):
+                # Cached reports and chart data are dropped, so every run renders
+                evict_reports(dataset.id, dataset.revision)
+                return dataset.id
+
+            for mode in args.pdf_modes:
+                cases.append(Case(
+                    f'download_pdf/{mode}/{rows}',
+                    cold,
+                    lambda pk, mode=mode: expect(pdf_client.get(f'/api/datasets/{pk}/download_pdf/?mode={mode}'), 200)
+                ))
+
+    if 'history' in args.cases:
+        history_user, history_client = client_for('bench-history')
+        make_datasets(history_user, args.datasets)
+        limit = min(args.datasets, MAX_HISTORY_LIMIT)
+        cases.append(Case(
+            f'history/{args.datasets}',
+            lambda: invalidate_user(history_user.id),
+            lambda _: expect(history_client.get(f'/api/datasets/history/?limit={limit}'), 200)
+        ))
+
+    if 'cleanup' in args.cases:
+        cleanup_user = User.objects.create_user('bench-cleanup')
+
+        def cleanup(_):
+            removed = Dataset.cleanup_old_datasets(cleanup_user, keep_count=0)
+            if removed != args.datasets:
+                raise RuntimeError(f'{removed} datasets removed instead of {args.datasets}')
+
+        cases.append(Case(
+            f'cleanup/{args.datasets}', lambda: make_datasets(cleanup_user, args.datasets), cleanup
+        ))
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cases', nargs='+', default=['upload', 'download_pdf', 'history', 'cleanup'],
+                        choices=['upload', 'download_pdf', 'history', 'cleanup'])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000, 100_000, 1_000_000],
+                        help='Dataset sizes for upload and download_pdf')
+    parser.add_argument('--pdf-modes', nargs='+', default=['summary', 'full'], choices=['summary', 'full'])
+    parser.add_argument('--datasets', type=int, default=100, help='Datasets stored for history and cleanup')
+    parser.add_argument('--dataset-rows', type=int, default=1_000, help='Rows of each of those datasets')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per case')
+    parser.add_argument('--warmup', type=int, default=1, help='Untimed runs per case before those')
+    parser.add_argument('--no-allocations', action='store_true', help='Skip the tracemalloc run')
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    parser.add_argument('--baseline', help='Results of an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Relative growth of a metric reported as a regression')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.update(
+            DJANGO_SETTINGS_MODULE='benchmarks.settings',
+            BENCH_DB=os.path.join(tmp, 'db.sqlite3'),
+            BENCH_MEDIA=os.path.join(tmp, 'media'),
+            # Keep background work out of the measured requests
+            REPORT_PRERENDER='False',
+            RETENTION_IN_PROCESS='False',
+            DATASET_RETENTION_COUNT='',
+        )
+        setup_django()
+        from django.core.management import call_command
+
+        call_command('migrate', verbosity=0)
+        cases = build_cases(args, tmp)
+
+        print(f'{"case":>28} {"median":>9} {"min":>9} {"peak RSS":>9} {"growth":>8} {"alloc":>8}')
+        results = {}
+        for case in cases:
+            r = results[case.name] = measure(case, args.repeat, args.warmup, not args.no_allocations)
+            growth = '-' if r['rss_growth_mb'] is None else f'{r["rss_growth_mb"]:.1f}'
+            alloc = f'{r["peak_alloc_mb"]:.1f}' if 'peak_alloc_mb' in r else '-'
+            print(f'{case.name:>28} {r["median_s"]:>8.3f}s {r["min_s"]:>8.3f}s '
+                  f'{r["peak_rss_mb"]:>7.1f}MB {growth:>6}MB {alloc:>6}MB')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'environment': {
+                    'python': platform.python_version(),
+                    'platform': platform.platform(),
+                    'cpus': os.cpu_count(),
+                },
+                'arguments': vars(args),
+                'results': results,
+            }, f, indent=2)
+
+    if baseline is not None:
+        found = regressions(results, baseline, args.threshold)
+        for name, metric, old, new in found:
+            change = f' ({(new - old) / old:+.0%})' if old else ''
+            print(f'Regression: {name} {metric} {old} -> {new}{change}')
+        if found:
+            sys.exit(1)
+        print(f'No regressions above {args.threshold:.0%} against {args.baseline}')
+
+
+if __name__ == '__main__':
+    main()
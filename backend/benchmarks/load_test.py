@@ -0,0 +1,193 @@
+"""
+Concurrent-request throughput of the sync WSGI and the ASGI deployment.
+
+    python -m benchmarks.load_test --requests 200 --concurrency 16 --rows 50000
+
+Starts gunicorn twice on a scratch sqlite database, once with sync
+workers on ``config.wsgi`` and once with uvicorn workers on
+``config.asgi``, and fires the same requests at both with a thread pool.
+Needs gunicorn and uvicorn (see requirements.txt).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import setup_django
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = {
+    'wsgi': ['config.wsgi:application', '--worker-class', 'sync'],
+    'asgi': ['config.asgi:application', '--worker-class', 'uvicorn.workers.UvicornWorker'],
+}
+
+
+def prepare(tmp, rows):
+    """Create the scratch database, a user with a session and one dataset"""
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'benchmarks.settings'
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.test import Client
+    from equipment.ingest import create_dataset
+    from benchmarks.synthetic import write_csv
+
+    call_command('migrate', verbosity=0)
+    user = User.objects.create_user('loadtest', password='loadtest')
+    client = Client()
+    client.force_login(user)
+
+    csv_path = os.path.join(tmp, 'dataset.csv')
+    write_csv(csv_path, rows)
+    with open(csv_path, 'rb') as f:
+        dataset = create_dataset(user, f, 'dataset.csv')
+
+    upload_path = os.path.join(tmp, 'upload.csv')
+    write_csv(upload_path, max(rows // 10, 100), seed=1)
+    return client.cookies['sessionid'].value, dataset.id, upload_path
+
+
+def start_server(mode, port, workers, env):
+    command = [
+        sys.executable, '-m', 'gunicorn', *MODES[mode],
+        '--bind', f'127.0.0.1:{port}', '--workers', str(workers), '--log-level', 'warning',
+    ]
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/api/auth/csrf/', timeout=5)
+            return process
+        except OSError:
+            # Refused until gunicorn binds, then slow while workers import
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f'{mode} server did not start')
+
+
+def multipart(path):
+    boundary = uuid.uuid4().hex
+    with open(path, 'rb') as f:
+        content = f.read()
+    body = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="include_rows"\r\n\r\nfalse\r\n'
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="upload.csv"\r\n'
+        f'Content-Type: text/csv\r\n\r\n'
+    ).encode() + content + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+def build_requests(base, endpoint, session, dataset_id, upload_path):
+    cookie = f'sessionid={session}'
+    if endpoint == 'rows':
+        return lambda i: urllib.request.Request(
+            f'{base}/api/datasets/{dataset_id}/rows/?limit=2000&cursor=&columns=Type,Flowrate,Pressure',
+            headers={'Cookie': cookie}
+        )
+    if endpoint == 'pdf':
+        return lambda i: urllib.request.Request(
+            f'{base}/api/datasets/{dataset_id}/download_pdf/', headers={'Cookie': cookie}
+        )
+    if endpoint == 'history':
+        return lambda i: urllib.request.Request(f'{base}/api/datasets/history/', headers={'Cookie': cookie})
+    if endpoint == 'upload':
+        token = uuid.uuid4().hex
+        body, content_type = multipart(upload_path)
+        return lambda i: urllib.request.Request(
+            f'{base}/api/datasets/upload/', data=body, method='POST',
+            headers={
+                'Cookie': f'{cookie}; csrftoken={token}', 'X-CSRFToken': token,
+                'Content-Type': content_type,
+            }
+        )
+    raise ValueError(endpoint)
+
+
+def fire(make_request, count, concurrency):
+    def one(i):
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(make_request(i), timeout=300) as response:
+                response.read()
+                ok = response.status < 400
+        except urllib.error.HTTPError as e:
+            e.read()
+            ok = False
+        except OSError:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(one, range(count)))
+    elapsed = time.perf_counter() - start
+    latencies = sorted(latency for latency, _ in results)
+    return {
+        'requests': count,
+        'errors': sum(1 for _, ok in results if not ok),
+        'seconds': round(elapsed, 3),
+        'throughput': round(count / elapsed, 2),
+        'p50_ms': round(statistics.median(latencies) * 1000, 1),
+        'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint and mode')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--rows', type=int, default=50_000, help='Rows of the dataset that is read')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--endpoints', nargs='+', default=['rows', 'pdf', 'history', 'upload'],
+                        choices=['rows', 'pdf', 'history', 'upload'])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, BENCH_DB=os.path.join(tmp, 'db.sqlite3'), BENCH_MEDIA=os.path.join(tmp, 'media'))
+        os.environ.update(env)
+        session, dataset_id, upload_path = prepare(tmp, args.rows)
+        env['DJANGO_SETTINGS_MODULE'] = 'benchmarks.settings'
+        # Keep the benchmark about request handling, not background work
+        env.update(REPORT_PRERENDER='False', RETENTION_IN_PROCESS='False', DATASET_RETENTION_COUNT='')
+
+        results = {}
+        for mode in MODES:
+            server = start_server(mode, args.port, args.workers, env)
+            try:
+                base = f'http://127.0.0.1:{args.port}'
+                for endpoint in args.endpoints:
+                    make_request = build_requests(base, endpoint, session, dataset_id, upload_path)
+                    fire(make_request, min(args.concurrency, args.requests), args.concurrency)  # warm up
+                    results[(mode, endpoint)] = fire(make_request, args.requests, args.concurrency)
+            finally:
+                server.terminate()
+                server.wait()
+
+    print(f'{"endpoint":>9} {"mode":>5} {"req/s":>8} {"p50":>9} {"p95":>9} {"errors":>7}')
+    for endpoint in args.endpoints:
+        for mode in MODES:
+            r = results[(mode, endpoint)]
+            print(
+                f'{endpoint:>9} {mode:>5} {r["throughput"]:>8.1f} {r["p50_ms"]:>7.1f}ms '
+                f'{r["p95_ms"]:>7.1f}ms {r["errors"]:>7}'
+            )
+        wsgi, asgi = results[('wsgi', endpoint)], results[('asgi', endpoint)]
+        print(f'{"":>9} asgi/wsgi throughput: {asgi["throughput"] / wsgi["throughput"]:.2f}x')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({f'{mode}:{endpoint}': r for (mode, endpoint), r in results.items()}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,18 @@
+"""
+Settings for benchmark servers: the project settings with a scratch
+database and media root, so load tests never touch real data.
+"""
+import os
+
+from config.settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['BENCH_DB'],
+        # Concurrent writers wait for the lock instead of failing at once
+        'OPTIONS': {'timeout': 30},
+    }
+}
+MEDIA_ROOT = os.environ['BENCH_MEDIA']
+DEBUG = False
@@ -0,0 +1,47 @@
+"""
+Synthetic equipment CSVs following the sample_equipment_data.csv schema.
+"""
+import numpy as np
+import pandas as pd
+
+# Type -> (flowrate mean, pressure mean, temperature mean), from the sample data
+EQUIPMENT_TYPES = {
+    'Reactor': (150.0, 8.5, 120.0),
+    'Pump': (200.0, 12.5, 85.0),
+    'Heat Exchanger': (180.0, 10.0, 95.0),
+    'Column': (220.0, 15.0, 110.0),
+    'Compressor': (300.0, 25.0, 75.0),
+    'Mixer': (120.0, 5.5, 65.0),
+    'Separator': (165.0, 9.5, 100.0),
+}
+
+
+def generate_frame(rows, seed=0):
+    """Return a DataFrame with ``rows`` synthetic equipment readings"""
+    rng = np.random.default_rng(seed)
+    names = list(EQUIPMENT_TYPES)
+    type_idx = rng.integers(0, len(names), rows)
+    means = np.array([EQUIPMENT_TYPES[name] for name in names])[type_idx]
+    types = np.array(names, dtype=object)[type_idx]
+    return pd.DataFrame({
+        'Equipment Name': [f'{t}-{i}' for t, i in zip(types, range(rows))],
+        'Type': types,
+        'Flowrate': np.round(means[:, 0] * rng.normal(1.0, 0.1, rows), 1),
+        'Pressure': np.round(means[:, 1] * rng.normal(1.0, 0.1, rows), 1),
+        'Temperature': np.round(means[:, 2] * rng.normal(1.0, 0.05, rows)).astype(int),
+    })
+
+
+def write_csv(path, rows, seed=0, chunk_rows=200_000):
+    """Write a synthetic CSV of ``rows`` rows to ``path`` in bounded chunks"""
+    written = 0
+    with open(path, 'w', newline='') as f:
+        while written < rows:
+            n = min(chunk_rows, rows - written)
+            frame = generate_frame(n, seed + written)
+            frame['Equipment Name'] = [
+                f'{t}-{i}' for t, i in zip(frame['Type'], range(written, written + n))
+            ]
+            frame.to_csv(f, header=written == 0, index=False)
+            written += n
+    return path
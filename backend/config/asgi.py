@@ -8,4 +8,7 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
+# Serve upload, PDF and row endpoints with async views (see equipment/async_views.py)
+os.environ.setdefault('ASYNC_VIEWS', 'True')
+
 application = get_asgi_application()
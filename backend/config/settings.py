@@ -3,6 +3,7 @@ Django settings for Chemical Equipment Visualizer project.
 """
 
 from pathlib import Path
+import json
 import os
 import dj_database_url
 
@@ -148,6 +149,9 @@ if DEBUG:
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Let the frontend read the validators used for conditional requests
+CORS_EXPOSE_HEADERS = ['ETag', 'X-Cache']
+
 # CSRF settings for cross-origin requests
 CSRF_TRUSTED_ORIGINS = [
     'http://localhost:3000',
@@ -167,3 +171,83 @@ CSRF_COOKIE_HTTPONLY = False  # Allow JavaScript to read the CSRF cookie
 # Session settings for cross-origin
 SESSION_COOKIE_SAMESITE = 'None' if not DEBUG else 'Lax'
 SESSION_COOKIE_SECURE = not DEBUG
+
+# Background upload processing
+# Threads per web process that drain the upload job queue. Set
+# UPLOAD_JOBS_IN_PROCESS=False to leave the queue to `manage.py process_upload_jobs`.
+UPLOAD_JOB_WORKERS = int(os.environ.get('UPLOAD_JOB_WORKERS', '2'))
+UPLOAD_JOBS_IN_PROCESS = os.environ.get('UPLOAD_JOBS_IN_PROCESS', 'True').lower() == 'true'
+
+# CSV parsing. 'auto' uses pyarrow when it is installed and the pandas C
+# parser otherwise. float32 halves the memory of parsed chunks but keeps only
+# ~7 significant digits, in the stored copy too.
+CSV_PARSE_ENGINE = os.environ.get('CSV_PARSE_ENGINE', 'auto')
+CSV_FLOAT_DTYPE = os.environ.get('CSV_FLOAT_DTYPE', 'float64')
+
+# Data quality checks run on every upload (see equipment/quality.py). Ranges
+# are [min, max] per column, null leaving a side open, with per-Type
+# overrides under 'types'; a QUALITY_RANGES JSON value replaces them.
+QUALITY_RANGES = json.loads(os.environ['QUALITY_RANGES']) if os.environ.get('QUALITY_RANGES') else {
+    'default': {'Flowrate': [0, None], 'Pressure': [0, None], 'Temperature': [-273.15, None]},
+    'types': {},
+}
+# 'zscore' flags values more than QUALITY_ZSCORE_THRESHOLD standard deviations
+# from their Type's mean; 'iqr' those beyond QUALITY_IQR_FACTOR x IQR of the quartiles
+QUALITY_OUTLIER_METHOD = os.environ.get('QUALITY_OUTLIER_METHOD', 'zscore')
+QUALITY_ZSCORE_THRESHOLD = float(os.environ.get('QUALITY_ZSCORE_THRESHOLD', '3.0'))
+QUALITY_IQR_FACTOR = float(os.environ.get('QUALITY_IQR_FACTOR', '1.5'))
+
+# Batch uploads (many CSVs or one ZIP per request). Files are parsed in a pool
+# of BATCH_PARSE_WORKERS processes; 0 parses them in the request thread.
+BATCH_PARSE_WORKERS = int(os.environ.get('BATCH_PARSE_WORKERS', str(os.cpu_count() or 1)))
+BATCH_MAX_FILES = int(os.environ.get('BATCH_MAX_FILES', '100'))
+BATCH_MAX_BYTES = int(os.environ.get('BATCH_MAX_BYTES', str(1024 * 1024 * 1024)))
+DATA_UPLOAD_MAX_NUMBER_FILES = BATCH_MAX_FILES
+
+# Hash uploads while they stream in so identical files can be deduplicated
+FILE_UPLOAD_HANDLERS = [
+    'equipment.uploadhandlers.HashingMemoryFileUploadHandler',
+    'equipment.uploadhandlers.HashingTemporaryFileUploadHandler',
+]
+
+# Render PDF reports in the background right after upload
+REPORT_PRERENDER = os.environ.get('REPORT_PRERENDER', 'True').lower() == 'true'
+
+# Rows listed in the full (?mode=full) PDF report; empty lists every row
+_report_max_rows = os.environ.get('REPORT_MAX_ROWS', '100000')
+REPORT_MAX_ROWS = int(_report_max_rows) if _report_max_rows else None
+
+# Dataset retention, enforced per user after every upload (off the request
+# path) and by `manage.py apply_retention`. An empty value disables a limit;
+# a user's RetentionPolicy overrides these defaults.
+_retention_count = os.environ.get('DATASET_RETENTION_COUNT', '50')
+DATASET_RETENTION_COUNT = int(_retention_count) if _retention_count else None
+DATASET_RETENTION_DAYS = int(os.environ['DATASET_RETENTION_DAYS']) if os.environ.get('DATASET_RETENTION_DAYS') else None
+DATASET_RETENTION_BYTES = int(os.environ['DATASET_RETENTION_BYTES']) if os.environ.get('DATASET_RETENTION_BYTES') else None
+RETENTION_IN_PROCESS = os.environ.get('RETENTION_IN_PROCESS', 'True').lower() == 'true'
+
+# Datasets returned by /api/datasets/history/ when no ?limit= is given
+DATASET_HISTORY_LIMIT = int(os.environ.get('DATASET_HISTORY_LIMIT', '5'))
+
+# Response cache for dataset list/detail/history. Local memory by default;
+# CACHE_BACKEND=file shares it between processes via CACHE_DIR.
+if os.environ.get('CACHE_BACKEND', 'locmem') == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR', str(BASE_DIR / '.cache')),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'equipment-datasets',
+        }
+    }
+DATASET_CACHE_TIMEOUT = int(os.environ.get('DATASET_CACHE_TIMEOUT', '300'))
+
+# ASGI deployment. config/asgi.py turns on the async upload/PDF/rows views;
+# CPU_WORKERS bounds the threads they use for pandas and ReportLab work.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', 'False').lower() == 'true'
+CPU_WORKERS = int(os.environ.get('CPU_WORKERS', str(min(4, os.cpu_count() or 1))))
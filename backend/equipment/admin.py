@@ -1,10 +1,32 @@
 from django.contrib import admin
-from .models import Dataset
+from .models import Dataset, DatasetSegment, RetentionPolicy, UploadJob
 
 
 @admin.register(Dataset)
 class DatasetAdmin(admin.ModelAdmin):
-    list_display = ['filename', 'user', 'uploaded_at', 'total_count']
+    list_display = ['filename', 'user', 'uploaded_at', 'total_count', 'file_size']
     list_filter = ['uploaded_at', 'user']
     search_fields = ['filename', 'user__username']
     readonly_fields = ['uploaded_at']
+
+
+@admin.register(DatasetSegment)
+class DatasetSegmentAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'dataset', 'uploaded_at', 'row_count']
+    list_filter = ['uploaded_at']
+    search_fields = ['filename', 'dataset__filename']
+    readonly_fields = ['uploaded_at']
+
+
+@admin.register(UploadJob)
+class UploadJobAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'user', 'status', 'created_at', 'rows_processed']
+    list_filter = ['status', 'created_at']
+    search_fields = ['filename', 'user__username']
+    readonly_fields = ['created_at', 'started_at', 'finished_at']
+
+
+@admin.register(RetentionPolicy)
+class RetentionPolicyAdmin(admin.ModelAdmin):
+    list_display = ['user', 'max_count', 'max_age_days', 'max_bytes']
+    search_fields = ['user__username']
@@ -0,0 +1,212 @@
+"""
+Cross-dataset comparison and trends.
+
+Everything here is computed from the summary fields and running aggregates
+stored on each ``Dataset`` (see ``statistics.py``), never from the stored
+files, so a request costs one query and O(datasets x types) arithmetic.
+Per-user retention (``DATASET_RETENTION_*``) bounds the number of datasets
+a trend covers.
+"""
+import math
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Dataset
+from .statistics import RunningAggregates
+
+AVERAGE_FIELDS = ['avg_flowrate', 'avg_pressure', 'avg_temperature']
+SERIES_FIELDS = ['id', 'filename', 'uploaded_at', 'total_count', 'type_distribution'] + AVERAGE_FIELDS
+MAX_COMPARE = 50
+MAX_HISTORY_LIMIT = 100
+
+
+def _finite(value):
+    if value is None or (isinstance(value, float) and not math.isfinite(value)):
+        return None
+    return value
+
+
+def _share(distribution, total):
+    return {eq_type: count / total for eq_type, count in distribution.items()} if total else {}
+
+
+def _delta(value, base):
+    value, base = _finite(value), _finite(base)
+    if value is None or base is None:
+        return {'absolute': None, 'relative': None}
+    return {'absolute': value - base, 'relative': (value - base) / base if base else None}
+
+
+def _types(datasets):
+    """Every type across ``datasets``, most frequent overall first"""
+    totals = {}
+    for dataset in datasets:
+        for eq_type, count in dataset['type_distribution'].items():
+            totals[eq_type] = totals.get(eq_type, 0) + count
+    return sorted(totals, key=lambda t: (-totals[t], t))
+
+
+def parse_ids(params):
+    """Dataset ids from ``?ids=1,2,3`` (or repeated ``ids``), in request order"""
+    ids = []
+    for value in params.getlist('ids'):
+        for part in value.split(','):
+            part = part.strip()
+            if not part:
+                continue
+            if not part.isdigit():
+                raise ValueError(f'Invalid dataset id: {part}')
+            if int(part) not in ids:
+                ids.append(int(part))
+    if len(ids) < 2:
+        raise ValueError('Provide at least two dataset ids, e.g. ?ids=1,2')
+    if len(ids) > MAX_COMPARE:
+        raise ValueError(f'At most {MAX_COMPARE} datasets can be compared')
+    return ids
+
+
+def compare_datasets(user, ids):
+    """
+    Side-by-side summaries of the given datasets and their deltas against
+    the first one. Raises Dataset.DoesNotExist naming any missing ids.
+    """
+    found = {
+        row['id']: row
+        for row in Dataset.objects.filter(user=user, id__in=ids).values(*SERIES_FIELDS)
+    }
+    missing = [dataset_id for dataset_id in ids if dataset_id not in found]
+    if missing:
+        raise Dataset.DoesNotExist(f'Datasets not found: {", ".join(map(str, missing))}')
+
+    datasets = [found[dataset_id] for dataset_id in ids]
+    types = _types(datasets)
+    base = datasets[0]
+    base_share = _share(base['type_distribution'], base['total_count'])
+
+    summaries, deltas = [], []
+    for dataset in datasets:
+        share = _share(dataset['type_distribution'], dataset['total_count'])
+        summaries.append({
+            'id': dataset['id'],
+            'filename': dataset['filename'],
+            'uploaded_at': dataset['uploaded_at'],
+            'total_count': dataset['total_count'],
+            **{field: _finite(dataset[field]) for field in AVERAGE_FIELDS},
+            'type_distribution': dataset['type_distribution'],
+            'type_share': share,
+        })
+        if dataset is base:
+            continue
+        deltas.append({
+            'id': dataset['id'],
+            'total_count': _delta(dataset['total_count'], base['total_count']),
+            **{field: _delta(dataset[field], base[field]) for field in AVERAGE_FIELDS},
+            'type_distribution': {
+                eq_type: dataset['type_distribution'].get(eq_type, 0) - base['type_distribution'].get(eq_type, 0)
+                for eq_type in types
+            },
+            'type_share': {
+                eq_type: share.get(eq_type, 0.0) - base_share.get(eq_type, 0.0)
+                for eq_type in types
+            },
+        })
+
+    return {'baseline': base['id'], 'types': types, 'datasets': summaries, 'deltas': deltas}
+
+
+def _parse_bound(value, name):
+    """A date (matched on whole days) or a datetime, naive ones in the current time zone"""
+    try:
+        day = parse_date(value)
+    except ValueError:
+        day = None
+    if day is not None:
+        return day
+    try:
+        moment = parse_datetime(value)
+    except ValueError:
+        moment = None
+    if moment is None:
+        raise ValueError(f'{name} must be an ISO 8601 date or datetime')
+    return moment if timezone.is_aware(moment) else timezone.make_aware(moment)
+
+
+def trend_queryset(user, params):
+    """The user's datasets selected by ``since``, ``until`` and ``limit``, oldest first"""
+    queryset = Dataset.objects.filter(user=user)
+    if params.get('since'):
+        bound = _parse_bound(params['since'], 'since')
+        lookup = 'uploaded_at__gte' if hasattr(bound, 'hour') else 'uploaded_at__date__gte'
+        queryset = queryset.filter(**{lookup: bound})
+    if params.get('until'):
+        bound = _parse_bound(params['until'], 'until')
+        lookup = 'uploaded_at__lte' if hasattr(bound, 'hour') else 'uploaded_at__date__lte'
+        queryset = queryset.filter(**{lookup: bound})
+    queryset = queryset.order_by('-uploaded_at', '-id')
+    if params.get('limit'):
+        try:
+            limit = int(params['limit'])
+        except ValueError:
+            raise ValueError('limit must be a positive integer')
+        if limit < 1:
+            raise ValueError('limit must be a positive integer')
+        queryset = queryset[:limit]
+    return queryset
+
+
+def dataset_trends(queryset):
+    """
+    Time series of counts, averages and type mix over ``queryset``.
+
+    Series are columnar lists in upload order; ``deltas`` holds the change
+    from the previous dataset. ``overall`` merges the stored running
+    aggregates, so its statistics are exact over every row of every
+    dataset (quantiles aside, which do not merge).
+    """
+    rows = list(queryset.values(*SERIES_FIELDS, 'aggregates'))
+    rows.reverse()
+    types = _types(rows)
+
+    series = {
+        'dataset_id': [row['id'] for row in rows],
+        'filename': [row['filename'] for row in rows],
+        'uploaded_at': [row['uploaded_at'] for row in rows],
+        'total_count': [row['total_count'] for row in rows],
+        **{field: [_finite(row[field]) for row in rows] for field in AVERAGE_FIELDS},
+        'type_distribution': {
+            eq_type: [row['type_distribution'].get(eq_type, 0) for row in rows] for eq_type in types
+        },
+        'type_share': {
+            eq_type: [
+                row['type_distribution'].get(eq_type, 0) / row['total_count'] if row['total_count'] else None
+                for row in rows
+            ]
+            for eq_type in types
+        },
+    }
+    deltas = {}
+    for field in ['total_count'] + AVERAGE_FIELDS:
+        values = series[field]
+        deltas[field] = [None] + [
+            _delta(current, previous)['absolute'] for previous, current in zip(values, values[1:])
+        ]
+
+    total = sum(row['total_count'] for row in rows)
+    overall = {
+        'datasets': len(rows),
+        'total_count': total,
+        'type_distribution': {eq_type: sum(series['type_distribution'][eq_type]) for eq_type in types},
+        'statistics': None,
+    }
+    for field in AVERAGE_FIELDS:
+        weighted = [(row[field], row['total_count']) for row in rows if _finite(row[field]) is not None]
+        weight = sum(count for _, count in weighted)
+        overall[field] = sum(value * count for value, count in weighted) / weight if weight else None
+    if rows and all(row['aggregates'] for row in rows):
+        merged = RunningAggregates()
+        for row in rows:
+            merged.merge(RunningAggregates.from_dict(row['aggregates']))
+        overall['statistics'] = merged.statistics()
+
+    return {'count': len(rows), 'types': types, 'series': series, 'deltas': deltas, 'overall': overall}
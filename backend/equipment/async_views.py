@@ -0,0 +1,243 @@
+"""
+Async versions of the I/O-heavy dataset endpoints for ASGI deployments.
+
+Under ASGI, Django runs sync views (including every DRF view) one at a
+time on a single shared thread, so one slow upload or PDF render stalls
+all of them. These views keep the same URLs and response shapes as their
+``DatasetViewSet`` counterparts but await I/O and hand pandas/ReportLab
+work to the bounded pool in ``workers.run_cpu``. ``config/asgi.py``
+enables them through ``ASYNC_VIEWS``.
+"""
+from asgiref.sync import sync_to_async
+from django.core.files.storage import default_storage
+from django.http import HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.http import parse_etags
+
+from .columnar import integral_columns
+from .downloads import (
+    STREAM_CHUNK_SIZE, RangeNotSatisfiable, range_not_satisfiable, requested_range, set_download_headers
+)
+from .exports import (
+    COMPRESSIBLE_FORMATS, CONTENT_TYPES, export_chunks, export_filename, negotiate_encoding,
+    parse_export_params, set_export_headers, xlsx_file
+)
+from .ingest import create_dataset, IngestError
+from .jobs import enqueue_upload
+from .models import Dataset
+from .reports import REPORT_MODES, get_or_render, report_etag, report_filename
+from .quality import upload_quality
+from .rows import integral_records, page_for_params, to_records
+from .views import is_truthy, summary_payload
+from .workers import run_cpu
+
+def _error(message, status):
+    return JsonResponse({'error': message}, status=status)
+
+
+def _method_not_allowed(request):
+    return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+
+
+async def get_user(request):
+    """The authenticated user of a request, or None"""
+    def resolve():
+        user = request.user
+        return user if user.is_authenticated else None
+    return await sync_to_async(resolve)()
+
+
+async def get_dataset(request, pk):
+    """(dataset, error response) for a dataset owned by the requesting user"""
+    user = await get_user(request)
+    if user is None:
+        return None, JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=403)
+    dataset = await Dataset.objects.filter(pk=pk, user=user).afirst()
+    if dataset is None:
+        return None, JsonResponse({'detail': 'Not found.'}, status=404)
+    return dataset, None
+
+
+def _ingest(user, csv_file, include_rows):
+    records = []
+    dataset = create_dataset(
+        user,
+        csv_file,
+        csv_file.name,
+        on_chunk=(lambda chunk: records.extend(to_records(chunk, ()))) if include_rows else None
+    )
+    # Whole-number columns are only known once every row is read
+    return dataset, integral_records(records, integral_columns(dataset))
+
+
+async def upload(request):
+    """Upload and process CSV file"""
+    if request.method != 'POST':
+        return _method_not_allowed(request)
+    user = await get_user(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=403)
+
+    # Parsing the multipart body reads and writes temporary files
+    files, form = await sync_to_async(lambda: (request.FILES, request.POST), thread_sensitive=False)()
+    if 'file' not in files:
+        return _error('No file provided', 400)
+    csv_file = files['file']
+    if not csv_file.name.endswith('.csv'):
+        return _error('File must be a CSV', 400)
+
+    if is_truthy(request.GET.get('async', form.get('async', ''))):
+        job = await sync_to_async(enqueue_upload, thread_sensitive=False)(user, csv_file)
+        return JsonResponse(
+            {
+                'message': 'File queued for processing',
+                'job_id': str(job.id),
+                'status_url': request.build_absolute_uri(
+                    reverse('dataset-job-status', kwargs={'job_id': job.id})
+                )
+            },
+            status=202
+        )
+
+    include_rows = is_truthy(request.GET.get('include_rows', form.get('include_rows', 'true')))
+    try:
+        dataset, records = await run_cpu(_ingest, user, csv_file, include_rows)
+    except IngestError as e:
+        return _error(str(e), 400)
+    except Exception as e:
+        return _error(f'Error processing file: {str(e)}', 400)
+
+    response_data = {
+        'message': 'File uploaded successfully',
+        'dataset_id': dataset.id,
+        'summary': summary_payload(dataset),
+        'parse_report': dataset.parse_report,
+        'quality': upload_quality(dataset.quality),
+        'rows_url': request.build_absolute_uri(reverse('dataset-rows', kwargs={'pk': dataset.id}))
+    }
+    if include_rows:
+        response_data['data'] = records
+    return JsonResponse(response_data, status=201)
+
+
+async def _stream_file(name, start, stop):
+    f = await sync_to_async(default_storage.open, thread_sensitive=False)(name, 'rb')
+    async for chunk in _stream_open_file(f, start, stop):
+        yield chunk
+
+
+async def _stream_open_file(f, start, stop):
+    """Bytes ``[start, stop)`` of an open file, which is closed at the end"""
+    read = sync_to_async(f.read, thread_sensitive=False)
+    try:
+        await sync_to_async(f.seek, thread_sensitive=False)(start)
+        remaining = stop - start
+        while remaining > 0:
+            chunk = await read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        await sync_to_async(f.close, thread_sensitive=False)()
+
+
+async def download_pdf(request, pk):
+    """Download the (cached) PDF report for a dataset"""
+    if request.method != 'GET':
+        return _method_not_allowed(request)
+    mode = request.GET.get('mode', 'summary')
+    if mode not in REPORT_MODES:
+        return _error(f'mode must be one of: {", ".join(REPORT_MODES)}', 400)
+    dataset, error = await get_dataset(request, pk)
+    if error is not None:
+        return error
+
+    etag = report_etag(dataset, mode)
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    try:
+        name = await run_cpu(get_or_render, dataset, mode)
+        size = await sync_to_async(default_storage.size, thread_sensitive=False)(name)
+    except Exception as e:
+        return _error(f'Error generating PDF: {str(e)}', 500)
+
+    try:
+        byte_range = requested_range(request, size, etag)
+    except RangeNotSatisfiable:
+        return range_not_satisfiable(size)
+    start, stop = byte_range or (0, size)
+    response = StreamingHttpResponse(
+        _stream_file(name, start, stop),
+        status=200 if byte_range is None else 206,
+        content_type='application/pdf'
+    )
+    return set_download_headers(response, size, byte_range, report_filename(dataset, mode), etag)
+
+
+async def rows(request, pk):
+    """Page through dataset rows in a compact columnar encoding"""
+    if request.method != 'GET':
+        return _method_not_allowed(request)
+    dataset, error = await get_dataset(request, pk)
+    if error is not None:
+        return error
+    try:
+        page = await run_cpu(page_for_params, dataset, request.GET)
+    except ValueError as e:
+        return _error(str(e), 400)
+    return JsonResponse(page)
+
+
+async def _stream_chunks(chunks):
+    """Advance a sync chunk generator in the CPU pool, one chunk at a time"""
+    try:
+        while True:
+            chunk = await run_cpu(next, chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        chunks.close()
+
+
+async def export(request, pk):
+    """Stream the parsed rows as csv, json, parquet or xlsx, optionally filtered"""
+    if request.method != 'GET':
+        return _method_not_allowed(request)
+    dataset, error = await get_dataset(request, pk)
+    if error is not None:
+        return error
+    try:
+        fmt, columns, types = parse_export_params(request.GET)
+    except ValueError as e:
+        return _error(str(e), 400)
+    filename = export_filename(dataset, fmt)
+
+    if fmt == 'xlsx':
+        try:
+            f, size = await run_cpu(xlsx_file, dataset, columns, types)
+        except ValueError as e:
+            return _error(str(e), 400)
+        try:
+            byte_range = requested_range(request, size, None)
+        except RangeNotSatisfiable:
+            await sync_to_async(f.close, thread_sensitive=False)()
+            return range_not_satisfiable(size)
+        start, stop = byte_range or (0, size)
+        response = StreamingHttpResponse(
+            _stream_open_file(f, start, stop),
+            status=200 if byte_range is None else 206,
+            content_type=CONTENT_TYPES[fmt]
+        )
+        return set_download_headers(response, size, byte_range, filename)
+
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding')) if fmt in COMPRESSIBLE_FORMATS else None
+    response = StreamingHttpResponse(
+        _stream_chunks(export_chunks(dataset, fmt, columns, types, encoding)),
+        content_type=CONTENT_TYPES[fmt]
+    )
+    return set_export_headers(response, filename, encoding)
@@ -0,0 +1,208 @@
+"""
+Batch ingestion of many CSV files, uploaded together or as ZIP archives.
+
+Files are staged on disk and hashed in the request. Every distinct content
+that is not stored yet is then parsed in the process pool
+(``workers.get_process_pool``), so a batch uses every core; content already
+stored is reused as in ``create_dataset``. The datasets of a batch are
+inserted with one ``bulk_create`` in a single transaction, and retention is
+scheduled once for the whole batch instead of once per file.
+"""
+import hashlib
+import os
+import zipfile
+from concurrent.futures import as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.db import transaction
+
+from .blobstore import HASH_BLOCK_SIZE, find_source, hash_file, release_many
+from .caching import invalidate_user
+from .columnar import iter_frames
+from .ingest import parse_fields, schedule_derived, source_fields
+from .models import Dataset
+from .parsing import IngestError
+from .readings import store_readings
+from .reports import schedule_prerender
+from .retention import schedule_retention
+from .workers import get_process_pool, reset_process_pool
+
+
+class BatchItem:
+    """One CSV of a batch and what became of it"""
+
+    def __init__(self, filename, path=None, digest=None, error=None):
+        self.filename = filename
+        self.path = path
+        self.digest = digest
+        self.error = error
+        self.fields = None
+        self.parsed = False
+        self.dataset = None
+
+
+class _Budget:
+    """Running limit on the bytes staged for one batch"""
+
+    def __init__(self, max_bytes):
+        self.remaining = max_bytes
+
+    def consume(self, size):
+        self.remaining -= size
+        if self.remaining < 0:
+            raise IngestError(f'Batch exceeds the limit of {settings.BATCH_MAX_BYTES} bytes')
+
+
+def _copy(blocks, path, budget):
+    """Write ``blocks`` to ``path``, returning their SHA-256 digest"""
+    hasher = hashlib.sha256()
+    with open(path, 'wb') as out:
+        for block in blocks:
+            # Counted while copying, so archives cannot understate their size
+            budget.consume(len(block))
+            hasher.update(block)
+            out.write(block)
+    return hasher.hexdigest()
+
+
+def _stage_zip(upload, directory, budget, items):
+    try:
+        archive = zipfile.ZipFile(upload)
+    except zipfile.BadZipFile:
+        items.append(BatchItem(upload.name, error='Not a valid ZIP archive'))
+        return
+    with archive:
+        for info in archive.infolist():
+            name = os.path.basename(info.filename)
+            if info.is_dir() or not name or name.startswith('.') or info.filename.startswith('__MACOSX/'):
+                continue
+            if not name.endswith('.csv'):
+                items.append(BatchItem(name, error='File must be a CSV'))
+                continue
+            path = os.path.join(directory, f'{len(items)}.csv')
+            try:
+                with archive.open(info) as member:
+                    digest = _copy(iter(lambda: member.read(HASH_BLOCK_SIZE), b''), path, budget)
+            except (RuntimeError, zipfile.BadZipFile, NotImplementedError) as e:
+                # Encrypted members, corrupt data or unsupported compression
+                items.append(BatchItem(name, error=f'Cannot extract file: {str(e)}'))
+                continue
+            items.append(BatchItem(name, path, digest))
+
+
+def stage_uploads(files, directory):
+    """BatchItems for uploaded CSVs and the CSVs inside uploaded ZIP archives"""
+    budget = _Budget(settings.BATCH_MAX_BYTES)
+    items = []
+    for upload in files:
+        if upload.name.endswith('.zip'):
+            _stage_zip(upload, directory, budget, items)
+        elif not upload.name.endswith('.csv'):
+            items.append(BatchItem(upload.name, error='File must be a CSV or ZIP archive'))
+        elif hasattr(upload, 'temporary_file_path'):
+            # Large uploads are already on disk
+            budget.consume(upload.size)
+            items.append(BatchItem(upload.name, upload.temporary_file_path(), hash_file(upload)))
+        else:
+            path = os.path.join(directory, f'{len(items)}.csv')
+            items.append(BatchItem(upload.name, path, _copy(upload.chunks(HASH_BLOCK_SIZE), path, budget)))
+        if len(items) > settings.BATCH_MAX_FILES:
+            raise IngestError(f'A batch may contain at most {settings.BATCH_MAX_FILES} files')
+    return items
+
+
+def _parse(path, filename, digest):
+    # Runs in a pool process
+    with open(path, 'rb') as f:
+        return parse_fields(f, filename, digest)
+
+
+def _error_message(error):
+    if isinstance(error, IngestError):
+        return str(error)
+    return f'Error processing file: {str(error)}'
+
+
+def parse_items(items):
+    """Fill in the Dataset fields of every staged item, parsing new content in parallel"""
+    fields, errors, pending = {}, {}, {}
+    for item in items:
+        if item.error or item.digest in fields or item.digest in pending:
+            continue
+        source = find_source(item.digest)
+        if source is not None:
+            fields[item.digest] = source_fields(source)
+        else:
+            pending[item.digest] = item
+
+    if settings.BATCH_PARSE_WORKERS > 0 and len(pending) > 1:
+        pool = get_process_pool()
+        futures = {
+            pool.submit(_parse, item.path, item.filename, digest): digest
+            for digest, item in pending.items()
+        }
+        for future in as_completed(futures):
+            digest = futures[future]
+            try:
+                fields[digest] = future.result()
+            except BrokenProcessPool:
+                reset_process_pool(pool)
+                errors[digest] = 'Error processing file: parser process failed'
+            except Exception as e:
+                errors[digest] = _error_message(e)
+    else:
+        for digest, item in pending.items():
+            try:
+                fields[digest] = _parse(item.path, item.filename, digest)
+            except Exception as e:
+                errors[digest] = _error_message(e)
+
+    for item in items:
+        if item.error:
+            continue
+        item.error = errors.get(item.digest)
+        item.fields = fields.get(item.digest)
+        item.parsed = item.digest in pending
+
+
+def create_datasets(user, items):
+    """Insert the Datasets of all parsed items in one transaction"""
+    ready = [item for item in items if item.fields is not None]
+    if not ready:
+        return []
+    datasets = [
+        Dataset(user=user, filename=item.filename, content_hash=item.digest, **item.fields)
+        for item in ready
+    ]
+    try:
+        with transaction.atomic():
+            datasets = Dataset.objects.bulk_create(datasets)
+            for dataset in datasets:
+                store_readings(dataset, iter_frames(dataset))
+                schedule_prerender(dataset)
+                schedule_derived(dataset)
+            invalidate_user(user.id)
+    except Exception:
+        # Blobs parsed for this batch would otherwise be left unreferenced
+        parsed = [item.fields for item in ready if item.parsed]
+        release_many([f['csv_file'] for f in parsed], [f['columns_path'] for f in parsed])
+        raise
+
+    for item, dataset in zip(ready, datasets):
+        item.dataset = dataset
+    schedule_retention(user)
+    return datasets
+
+
+def ingest_batch(user, files, directory):
+    """
+    Ingest uploaded CSV and ZIP files as Datasets owned by ``user``.
+
+    ``directory`` receives the staged copies and can be removed afterwards.
+    Returns one BatchItem per CSV, with either ``dataset`` or ``error`` set.
+    """
+    items = stage_uploads(files, directory)
+    parse_items(items)
+    create_datasets(user, items)
+    return items
@@ -0,0 +1,75 @@
+"""
+Content-addressed storage for uploaded CSV files.
+
+Uploads are stored under their SHA-256 digest, so identical files share one
+blob (and its columnar copy) and re-uploads can reuse the summary computed
+the first time. Blobs are deleted only once no dataset references them.
+"""
+import hashlib
+
+from django.core.files.storage import default_storage
+
+from .columnar import delete_columnar
+from .models import Dataset, DatasetSegment
+
+BLOB_DIR = 'uploads/sha256'
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def blob_name(digest):
+    """Storage name of the CSV blob with the given SHA-256 digest"""
+    return f'{BLOB_DIR}/{digest}.csv'
+
+
+def hash_file(fileobj):
+    """SHA-256 of a file-like object, read in blocks; rewinds it afterwards"""
+    digest = getattr(fileobj, 'content_hash', None)
+    if digest:
+        return digest
+
+    hasher = hashlib.sha256()
+    if hasattr(fileobj, 'chunks'):
+        for block in fileobj.chunks(HASH_BLOCK_SIZE):
+            hasher.update(block)
+    else:
+        for block in iter(lambda: fileobj.read(HASH_BLOCK_SIZE), b''):
+            hasher.update(block)
+    fileobj.seek(0)
+    return hasher.hexdigest()
+
+
+def find_source(digest):
+    """Most recent dataset whose stored blob has this digest, if it still exists"""
+    # Datasets with appended rows no longer summarize just this blob
+    candidates = (
+        Dataset.objects.filter(content_hash=digest, segments__isnull=True)
+        .exclude(csv_file='')
+        .order_by('-uploaded_at')
+    )
+    for dataset in candidates[:5]:
+        if dataset.csv_file and default_storage.exists(dataset.csv_file.name):
+            return dataset
+    return None
+
+
+def release_many(csv_names, columns_paths):
+    """Delete stored blobs and columnar copies that no dataset or segment references any more"""
+    csv_names = set(filter(None, csv_names))
+    columns_paths = set(filter(None, columns_paths))
+    referenced_csv = set(
+        Dataset.objects.filter(csv_file__in=csv_names).values_list('csv_file', flat=True)
+    ) | set(
+        DatasetSegment.objects.filter(csv_file__in=csv_names).values_list('csv_file', flat=True)
+    )
+    referenced_columns = set(
+        Dataset.objects.filter(columns_path__in=columns_paths).values_list('columns_path', flat=True)
+    ) | set(
+        DatasetSegment.objects.filter(columns_path__in=columns_paths).values_list('columns_path', flat=True)
+    )
+    removed = 0
+    for name in csv_names - referenced_csv:
+        default_storage.delete(name)
+        removed += 1
+    for directory in columns_paths - referenced_columns:
+        delete_columnar(directory)
+    return removed
@@ -0,0 +1,114 @@
+"""
+Per-user response cache for the dataset list, detail and history endpoints.
+
+Every user has a version token in the Django cache. Cached payloads and
+ETags include it, so bumping the token (on upload, append, delete,
+retention or statistics refresh) invalidates all of the user's entries at
+once without tracking individual keys. The token is a millisecond
+timestamp, finer than an HTTP date, so the ETag is the only validator:
+there is no Last-Modified and If-Modified-Since is ignored, as a date
+could not tell apart two versions within the same second. A lost token is
+simply replaced by a new one, which can only cause misses, never stale hits.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponseNotModified
+from django.utils.http import parse_etags
+from rest_framework.response import Response
+
+KEY_PREFIX = 'datasets'
+COUNTERS = ['hits', 'misses', 'not_modified']
+
+
+def _version_key(user_id):
+    return f'{KEY_PREFIX}:version:{user_id}'
+
+
+def _new_version(previous=None):
+    now = int(time.time() * 1000)
+    return max(now, previous + 1) if previous else now
+
+
+def get_version(user_id):
+    """The user's current cache version, creating one if it was evicted"""
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = _new_version()
+        # add() keeps a version set concurrently by another request
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def _bump(user_id):
+    key = _version_key(user_id)
+    cache.set(key, _new_version(cache.get(key)), timeout=None)
+
+
+def invalidate_user(user_id):
+    """Drop the user's cached responses once the current transaction commits"""
+    transaction.on_commit(lambda: _bump(user_id), robust=True)
+
+
+def _count(name):
+    key = f'{KEY_PREFIX}:stats:{name}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        # incr() fails on missing keys; another process may create it meanwhile
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def cache_stats():
+    """Hit/miss/304 counters and the hit ratio (per cache backend, not global)"""
+    stats = {name: cache.get(f'{KEY_PREFIX}:stats:{name}', 0) for name in COUNTERS}
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else None
+    return stats
+
+
+def reset_stats():
+    cache.delete_many([f'{KEY_PREFIX}:stats:{name}' for name in COUNTERS])
+
+
+def cached_response(request, name, build):
+    """
+    Serve ``build()`` for the requesting user through the cache.
+
+    Answers 304 when the client's ETag is still current, otherwise returns
+    the cached payload or builds and caches it.
+    ``name`` identifies the endpoint and any arguments that change the data.
+    """
+    user_id = request.user.id
+    version = get_version(user_id)
+    query = request.query_params.urlencode()
+    tag = f'{name}?{query}' if query else name
+    etag = f'"{KEY_PREFIX}-{user_id}-{version}-{tag}"'
+
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        _count('not_modified')
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    key = f'{KEY_PREFIX}:{user_id}:{version}:{tag}'
+    data = cache.get(key)
+    if data is None:
+        _count('misses')
+        data = build()
+        cache.set(key, data, timeout=settings.DATASET_CACHE_TIMEOUT)
+        state = 'MISS'
+    else:
+        _count('hits')
+        state = 'HIT'
+
+    response = Response(data)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    response['X-Cache'] = state
+    return response
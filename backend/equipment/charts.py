@@ -0,0 +1,211 @@
+"""
+Chart data and ReportLab drawings for the full PDF report.
+
+The inputs of every chart (type counts, column averages and per-type
+histograms) are computed once per dataset revision in a single streaming
+pass and stored as JSON next to the cached reports, so re-rendering a
+report (new ``REPORT_VERSION``, evicted PDF, another mode) only redraws
+them. Drawings are vector graphics, so no raster backend is needed.
+"""
+import json
+
+import numpy as np
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from reportlab.graphics.charts.barcharts import VerticalBarChart
+from reportlab.graphics.charts.legends import Legend
+from reportlab.graphics.charts.linecharts import HorizontalLineChart
+from reportlab.graphics.charts.piecharts import Pie
+from reportlab.graphics.shapes import Drawing, String
+from reportlab.lib import colors
+
+from .columnar import TYPE_COLUMN, iter_frames
+from .parsing import NUMERIC_COLUMNS
+from .storage import save_atomic
+
+CHART_VERSION = 1
+CHART_DIR = 'reports/charts'
+HISTOGRAM_BINS = 20
+MAX_CHART_TYPES = 6
+OTHER_TYPE = 'Other'
+PALETTE = [
+    colors.HexColor(c) for c in
+    ['#36A2EB', '#FF6384', '#4BC0C0', '#FF9F40', '#9966FF', '#FFCD56', '#C9CBCF']
+]
+
+
+def chart_data_name(dataset_id, revision):
+    return f'{CHART_DIR}/dataset_{dataset_id}_r{revision}_v{CHART_VERSION}.json'
+
+
+def chart_types(type_distribution, limit=MAX_CHART_TYPES):
+    """The most frequent types, plus OTHER_TYPE when the rest are folded together"""
+    ranked = sorted(type_distribution, key=lambda t: (-type_distribution[t], str(t)))
+    if len(ranked) <= limit:
+        return [str(t) for t in ranked]
+    return [str(t) for t in ranked[:limit - 1]] + [OTHER_TYPE]
+
+
+def histogram_edges(column_stats, bins=HISTOGRAM_BINS):
+    """``bins`` equal-width bins over a column's range, None for a column with no values"""
+    low, high = column_stats.get('min'), column_stats.get('max')
+    if low is None or high is None:
+        return None
+    if low == high:
+        low, high = low - 0.5, high + 0.5
+    return np.linspace(low, high, bins + 1)
+
+
+def type_histograms(dataset, types, edges):
+    """
+    Histogram counts of each numeric column with ``edges``, one row per
+    type in ``types`` plus a last row for rows of any other type, from one
+    chunked pass over the dataset. Columns whose edges are None are left out.
+    """
+    counts = {
+        col: np.zeros((len(types) + 1) * (len(col_edges) - 1), dtype=np.int64)
+        for col, col_edges in edges.items() if col_edges is not None
+    }
+    if counts:
+        lookup = {t: i for i, t in enumerate(types)}
+        unlisted = lookup.get(OTHER_TYPE, len(types))
+        for frame in iter_frames(dataset, [TYPE_COLUMN] + list(counts)):
+            labels = frame[TYPE_COLUMN].astype(str)
+            codes = labels.map(lookup).fillna(unlisted).to_numpy(dtype=np.int64)
+            for col, col_counts in counts.items():
+                bin_count = len(edges[col]) - 1
+                values = frame[col].to_numpy(dtype='float64', na_value=np.nan)
+                keep = ~np.isnan(values)
+                bins = np.clip(
+                    np.searchsorted(edges[col], values[keep], side='right') - 1, 0, bin_count - 1
+                )
+                col_counts += np.bincount(codes[keep] * bin_count + bins, minlength=len(col_counts))
+    return {col: col_counts.reshape(len(types) + 1, -1) for col, col_counts in counts.items()}
+
+
+def compute_chart_data(dataset):
+    """Chart inputs for a dataset, from one chunked pass over its rows"""
+    types = chart_types(dataset.type_distribution)
+    column_stats = (dataset.statistics or {}).get('columns', {})
+    edges = {col: histogram_edges(column_stats.get(col, {})) for col in NUMERIC_COLUMNS}
+    counts = type_histograms(dataset, types, edges) if types else {}
+
+    distribution = {}
+    for eq_type, count in dataset.type_distribution.items():
+        key = str(eq_type) if str(eq_type) in types else OTHER_TYPE
+        distribution[key] = distribution.get(key, 0) + count
+
+    return {
+        'types': types,
+        'type_counts': [distribution.get(t, 0) for t in types],
+        'averages': {
+            'Flowrate': dataset.avg_flowrate,
+            'Pressure': dataset.avg_pressure,
+            'Temperature': dataset.avg_temperature,
+        },
+        'histograms': {
+            col: {
+                'edges': edges[col].tolist(),
+                'counts': col_counts[:len(types)].tolist(),
+            }
+            for col, col_counts in counts.items()
+        },
+    }
+
+
+def get_chart_data(dataset):
+    """Cached chart inputs for the dataset's current revision"""
+    name = chart_data_name(dataset.id, dataset.revision)
+    if default_storage.exists(name):
+        with default_storage.open(name, 'rb') as f:
+            return json.load(f)
+    data = compute_chart_data(dataset)
+    save_atomic(name, ContentFile(json.dumps(data).encode()))
+    return data
+
+
+def evict_chart_data(dataset_id, revision):
+    for version in range(1, CHART_VERSION + 1):
+        default_storage.delete(f'{CHART_DIR}/dataset_{dataset_id}_r{revision}_v{version}.json')
+
+
+def _title(drawing, text):
+    drawing.add(String(drawing.width / 2, drawing.height - 14, text, fontName='Helvetica-Bold',
+                       fontSize=11, textAnchor='middle'))
+
+
+def type_pie(data, width=230, height=220):
+    drawing = Drawing(width, height)
+    _title(drawing, 'Equipment Type Distribution')
+    pie = Pie()
+    pie.x, pie.y = 35, 20
+    pie.width = pie.height = min(width, height) - 80
+    pie.data = data['type_counts'] or [1]
+    pie.labels = data['types'] or ['No data']
+    pie.simpleLabels = 1
+    pie.sideLabels = 1
+    pie.slices.strokeColor = colors.white
+    pie.slices.fontSize = 7
+    for i in range(len(pie.data)):
+        pie.slices[i].fillColor = PALETTE[i % len(PALETTE)]
+    drawing.add(pie)
+    return drawing
+
+
+def average_bar(data, width=230, height=220):
+    drawing = Drawing(width, height)
+    _title(drawing, 'Average Parameters')
+    chart = VerticalBarChart()
+    chart.x, chart.y = 40, 30
+    chart.width, chart.height = width - 55, height - 60
+    chart.data = [[data['averages'][col] or 0 for col in NUMERIC_COLUMNS]]
+    chart.categoryAxis.categoryNames = list(NUMERIC_COLUMNS)
+    chart.categoryAxis.labels.fontSize = 8
+    chart.valueAxis.labels.fontSize = 7
+    chart.valueAxis.valueMin = min(0, *chart.data[0])
+    chart.barWidth = 20
+    chart.bars.strokeColor = None
+    for i in range(len(NUMERIC_COLUMNS)):
+        chart.bars[(0, i)].fillColor = PALETTE[i]
+    drawing.add(chart)
+    return drawing
+
+
+def type_distributions(data, column, width=460, height=190):
+    """Per-type histogram of one numeric column, one line per type"""
+    histogram = data['histograms'][column]
+    edges = histogram['edges']
+    drawing = Drawing(width, height)
+    _title(drawing, f'{column} Distribution by Type')
+    chart = HorizontalLineChart()
+    chart.x, chart.y = 40, 30
+    chart.width, chart.height = width - 150, height - 55
+    chart.data = histogram['counts']
+    step = max(len(edges) // 5, 1)
+    chart.categoryAxis.categoryNames = [
+        f'{(edges[i] + edges[i + 1]) / 2:.1f}' if i % step == 0 else '' for i in range(len(edges) - 1)
+    ]
+    chart.categoryAxis.labels.fontSize = 7
+    chart.valueAxis.labels.fontSize = 7
+    chart.valueAxis.valueMin = 0
+    for i in range(len(chart.data)):
+        chart.lines[i].strokeColor = PALETTE[i % len(PALETTE)]
+        chart.lines[i].strokeWidth = 1.2
+    drawing.add(chart)
+
+    legend = Legend()
+    legend.x, legend.y = width - 100, height - 35
+    legend.fontSize = 7
+    legend.alignment = 'right'
+    legend.colorNamePairs = [
+        (PALETTE[i % len(PALETTE)], eq_type) for i, eq_type in enumerate(data['types'])
+    ]
+    drawing.add(legend)
+    return drawing
+
+
+def report_charts(data):
+    """Drawings of the full report, in page order"""
+    drawings = [type_pie(data), average_bar(data)]
+    drawings.extend(type_distributions(data, col) for col in NUMERIC_COLUMNS if col in data['histograms'])
+    return drawings
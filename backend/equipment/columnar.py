@@ -0,0 +1,326 @@
+"""
+Columnar binary copies of ingested datasets.
+
+Next to every stored CSV the ingestion pipeline writes a directory of NumPy
+``.npy`` files: numeric columns as float64, ``Type`` as int32 category codes
+and ``Equipment Name`` as UTF-8 bytes plus int64 offsets. Every file can be
+memory-mapped, so reading a page or a column costs O(rows read) instead of a
+full CSV re-parse. Readers fall back to the CSV when no copy exists.
+"""
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+from .parsing import REQUIRED_COLUMNS, NUMERIC_COLUMNS, CHUNK_ROWS, iter_chunks
+from .storage import save_atomic
+
+FORMAT_VERSION = 1
+MANIFEST = 'manifest.json'
+NAME_COLUMN = 'Equipment Name'
+TYPE_COLUMN = 'Type'
+
+
+def columns_dir_for(csv_path):
+    """Storage directory holding the binary copy of ``csv_path``"""
+    root, _ = os.path.splitext(csv_path)
+    return f'{root}.columns'
+
+
+class ColumnarWriter:
+    """Appends DataFrame chunks to per-column raw files, then emits .npy files"""
+
+    def __init__(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='columnar-')
+        self.row_count = 0
+        self.categories = {}
+        self.integral = {col: True for col in NUMERIC_COLUMNS}
+        self.name_bytes = 0
+        self.files = {
+            key: open(os.path.join(self.tmpdir, key), 'wb')
+            for key in self._raw_specs()
+        }
+
+    @staticmethod
+    def _raw_specs():
+        specs = {col: '<f8' for col in NUMERIC_COLUMNS}
+        specs[f'{TYPE_COLUMN}.codes'] = '<i4'
+        specs[f'{NAME_COLUMN}.offsets'] = '<i8'
+        specs[f'{NAME_COLUMN}.mask'] = '|b1'
+        specs[f'{NAME_COLUMN}.data'] = '|u1'
+        return specs
+
+    def append(self, chunk):
+        if self.row_count == 0:
+            # Leading offset so that row i spans offsets[i]:offsets[i + 1]
+            self.files[f'{NAME_COLUMN}.offsets'].write(np.zeros(1, '<i8').tobytes())
+
+        for col in NUMERIC_COLUMNS:
+            series = chunk[col]
+            values = series.to_numpy(dtype='<f8', na_value=np.nan)
+            if self.integral[col] and not pd.api.types.is_integer_dtype(series):
+                # Parsed as floats, so whole numbers are recognized by value (NaN is not one)
+                self.integral[col] = bool(np.all(np.mod(values, 1) == 0))
+            self.files[col].write(values.tobytes())
+
+        # Chunk-local factorize, then map onto the dataset-wide categories
+        codes, uniques = pd.factorize(chunk[TYPE_COLUMN])
+        lookup = np.array(
+            [self.categories.setdefault(value, len(self.categories)) for value in uniques] + [-1],
+            dtype='<i4'
+        )
+        self.files[f'{TYPE_COLUMN}.codes'].write(lookup[codes].tobytes())
+
+        names = chunk[NAME_COLUMN]
+        missing = names.isna().to_numpy()
+        encoded = [b'' if miss else str(name).encode('utf-8') for name, miss in zip(names.tolist(), missing)]
+        lengths = np.fromiter((len(b) for b in encoded), dtype='<i8', count=len(encoded))
+        offsets = self.name_bytes + np.cumsum(lengths)
+        self.files[f'{NAME_COLUMN}.offsets'].write(offsets.tobytes())
+        self.files[f'{NAME_COLUMN}.mask'].write(missing.astype('|b1').tobytes())
+        self.files[f'{NAME_COLUMN}.data'].write(b''.join(encoded))
+        if len(offsets):
+            self.name_bytes = int(offsets[-1])
+
+        self.row_count += len(chunk)
+
+    def finish(self, directory, storage=default_storage):
+        """Write .npy files and the manifest under ``directory`` in storage"""
+        try:
+            for key, descr in self._raw_specs().items():
+                raw = self.files[key]
+                raw.close()
+                raw_path = os.path.join(self.tmpdir, key)
+                length = os.path.getsize(raw_path) // np.dtype(descr).itemsize
+                npy_path = raw_path + '.npy'
+                with open(npy_path, 'wb') as out, open(raw_path, 'rb') as src:
+                    np.lib.format.write_array_header_1_0(out, {
+                        'descr': descr, 'fortran_order': False, 'shape': (length,)
+                    })
+                    shutil.copyfileobj(src, out, 1024 * 1024)
+                self._save(storage, f'{directory}/{key}.npy', npy_path)
+
+            manifest = {
+                'version': FORMAT_VERSION,
+                'row_count': self.row_count,
+                'categories': [
+                    value.item() if isinstance(value, np.generic) else value
+                    for value in self.categories
+                ],
+                'integral': [col for col, integral in self.integral.items() if integral],
+            }
+            manifest_path = os.path.join(self.tmpdir, MANIFEST)
+            with open(manifest_path, 'w') as f:
+                json.dump(manifest, f)
+            self._save(storage, f'{directory}/{MANIFEST}', manifest_path)
+        finally:
+            self.discard()
+        return directory
+
+    @staticmethod
+    def _save(storage, name, local_path):
+        # Datasets sharing the CSV may be reading the old file; swap it, never delete it
+        with open(local_path, 'rb') as f:
+            save_atomic(name, File(f), storage)
+
+    def discard(self):
+        for raw in self.files.values():
+            raw.close()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+
+class ColumnarReader:
+    """Memory-mapped access to a dataset's binary column files"""
+
+    def __init__(self, directory, storage=default_storage):
+        self.directory = directory
+        self.storage = storage
+        with storage.open(f'{directory}/{MANIFEST}', 'rb') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('version') != FORMAT_VERSION:
+            raise ValueError(f'Unsupported columnar format in {directory}')
+        self.row_count = self.manifest['row_count']
+        self.categories = np.array(self.manifest['categories'] + [None], dtype=object)
+        self._arrays = {}
+
+    def array(self, key):
+        if key not in self._arrays:
+            name = f'{self.directory}/{key}.npy'
+            try:
+                path = self.storage.path(name)
+            except NotImplementedError:
+                with self.storage.open(name, 'rb') as f:
+                    self._arrays[key] = np.load(f)
+            else:
+                try:
+                    self._arrays[key] = np.load(path, mmap_mode='r')
+                except ValueError:
+                    # Zero-length arrays cannot be memory-mapped
+                    self._arrays[key] = np.load(path)
+        return self._arrays[key]
+
+    def column(self, col, start=0, stop=None):
+        stop = self.row_count if stop is None else min(stop, self.row_count)
+        start = min(start, stop)
+        if col in NUMERIC_COLUMNS:
+            values = np.asarray(self.array(col)[start:stop])
+            if col in self.manifest['integral']:
+                return pd.Series(values.astype('int64'), name=col)
+            return pd.Series(values, name=col)
+        if col == TYPE_COLUMN:
+            codes = np.asarray(self.array(f'{TYPE_COLUMN}.codes')[start:stop])
+            return pd.Series(self.categories[codes], name=col)
+        if col == NAME_COLUMN:
+            offsets = self.array(f'{NAME_COLUMN}.offsets')[start:stop + 1]
+            mask = self.array(f'{NAME_COLUMN}.mask')[start:stop]
+            if len(offsets) < 2:
+                return pd.Series([], dtype=object, name=col)
+            data = bytes(self.array(f'{NAME_COLUMN}.data')[offsets[0]:offsets[-1]])
+            base = int(offsets[0])
+            names = [
+                None if missing else data[lo - base:hi - base].decode('utf-8')
+                for lo, hi, missing in zip(offsets[:-1].tolist(), offsets[1:].tolist(), mask.tolist())
+            ]
+            return pd.Series(names, dtype=object, name=col)
+        raise KeyError(col)
+
+    def frame(self, columns=None, start=0, stop=None):
+        columns = columns or list(REQUIRED_COLUMNS)
+        return pd.DataFrame({col: self.column(col, start, stop) for col in columns})[columns]
+
+
+def write_columnar(chunks, csv_path, storage=default_storage):
+    """Write a binary copy of ``chunks`` next to ``csv_path``; returns its directory"""
+    writer = ColumnarWriter()
+    try:
+        for chunk in chunks:
+            writer.append(chunk)
+    except Exception:
+        writer.discard()
+        raise
+    return writer.finish(columns_dir_for(csv_path), storage)
+
+
+def has_columnar(directory, storage=default_storage):
+    """Whether a complete binary copy exists under ``directory`` (the manifest is written last)"""
+    return storage.exists(f'{directory}/{MANIFEST}')
+
+
+def delete_columnar(directory, storage=default_storage):
+    """Remove every file of a binary copy"""
+    if not directory:
+        return
+    try:
+        _, files = storage.listdir(directory)
+    except (FileNotFoundError, NotImplementedError):
+        return
+    for name in files:
+        storage.delete(f'{directory}/{name}')
+    try:
+        os.rmdir(storage.path(directory))
+    except (NotImplementedError, OSError):
+        # Non-local storages have no directories to remove
+        pass
+
+
+def open_reader(part):
+    """Return a ColumnarReader for a dataset or segment, or None when it has no usable copy"""
+    if not part.columns_path:
+        return None
+    try:
+        return ColumnarReader(part.columns_path)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def read_csv_range(part, columns, start, stop):
+    """Fallback: read rows [start, stop) from the stored CSV of a dataset or segment"""
+    if not part.csv_file:
+        raise ValueError('Dataset has no stored data')
+
+    # Skip whole chunks in C instead of building a skiprows set of size start
+    skipped = 0
+    parts = []
+    with part.csv_file.open('rb') as f:
+        # Parsed as at ingestion, so row numbers skip the same malformed lines
+        for chunk in iter_chunks(f, CHUNK_ROWS):
+            if skipped + len(chunk) <= start:
+                skipped += len(chunk)
+                continue
+            lo = max(start - skipped, 0)
+            hi = None if stop is None else max(stop - skipped, 0)
+            parts.append(chunk[columns].iloc[lo:hi])
+            skipped += len(chunk)
+            if stop is not None and skipped >= stop:
+                break
+
+    if not parts:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(parts, ignore_index=True)[columns]
+
+
+def dataset_parts(dataset):
+    """(part, row_count) for the base upload followed by every appended segment"""
+    segments = list(dataset.segments.all()) if dataset.pk else []
+    base_rows = dataset.total_count - sum(segment.row_count for segment in segments)
+    return [(dataset, base_rows)] + [(segment, segment.row_count) for segment in segments]
+
+
+def integral_columns(dataset):
+    """Numeric columns holding only whole numbers in every part of a dataset, per the binary copies"""
+    integral = set(NUMERIC_COLUMNS)
+    for part, _ in dataset_parts(dataset):
+        reader = open_reader(part)
+        # Without a copy nothing is known, and CSV reads give floats
+        integral &= set(reader.manifest['integral']) if reader is not None else set()
+    return integral
+
+
+def load_frame(dataset, columns=None, start=0, stop=None):
+    """Load rows [start, stop) of a dataset, preferring the binary copies"""
+    columns = columns or list(REQUIRED_COLUMNS)
+    frames = []
+    offset = 0
+    for part, row_count in dataset_parts(dataset):
+        lo = max(start - offset, 0)
+        hi = row_count if stop is None else min(stop - offset, row_count)
+        offset += row_count
+        if hi <= lo:
+            continue
+        reader = open_reader(part)
+        if reader is not None:
+            frames.append(reader.frame(columns, lo, hi))
+        else:
+            frames.append(read_csv_range(part, columns, lo, hi))
+
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    if len(frames) == 1:
+        return frames[0]
+    return pd.concat(frames, ignore_index=True)
+
+
+def iter_part_frames(part, columns=None, chunk_rows=CHUNK_ROWS):
+    """Yield the rows of one dataset or segment in bounded chunks"""
+    columns = columns or list(REQUIRED_COLUMNS)
+    reader = open_reader(part)
+    if reader is not None:
+        for start in range(0, reader.row_count, chunk_rows):
+            yield reader.frame(columns, start, start + chunk_rows)
+        return
+    if not part.csv_file:
+        raise ValueError('Dataset has no stored data')
+    with part.csv_file.open('rb') as f:
+        for chunk in iter_chunks(f, chunk_rows):
+            yield chunk[columns]
+
+
+def iter_frames(dataset, columns=None, chunk_rows=CHUNK_ROWS):
+    """Yield the whole dataset in bounded chunks, preferring the binary copies"""
+    for part, _ in dataset_parts(dataset):
+        yield from iter_part_frames(part, columns, chunk_rows)
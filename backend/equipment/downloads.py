@@ -0,0 +1,108 @@
+"""
+Streaming file downloads with Content-Length and single-range support.
+
+Reports (and other stored files) are streamed straight from storage in
+fixed-size chunks instead of being read into memory. A ``Range:
+bytes=start-end`` request gets a ``206 Partial Content`` response, so
+interrupted downloads can resume; ``If-Range`` falls back to the full file
+when the client's copy is outdated. Multiple ranges are not supported and
+are answered with the whole file, as RFC 9110 allows.
+"""
+import re
+
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import parse_etags
+
+STREAM_CHUNK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(ValueError):
+    """The requested byte range lies outside the file"""
+
+
+def parse_range(header, size):
+    """(start, stop) of a single-range Range header, or None to send the whole file"""
+    match = RANGE_RE.match((header or '').strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        stop = min(int(last) + 1, size) if last else size
+    elif last:
+        # Suffix range: the final N bytes
+        if int(last) == 0:
+            raise RangeNotSatisfiable
+        start, stop = max(size - int(last), 0), size
+    else:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable
+    return start, stop
+
+
+def requested_range(request, size, etag=None):
+    """Byte range to send for ``request``; None means the whole file"""
+    if_range = request.headers.get('If-Range')
+    if if_range and (etag is None or if_range not in parse_etags(etag)):
+        return None
+    return parse_range(request.headers.get('Range'), size)
+
+
+def range_not_satisfiable(size):
+    response = HttpResponse(status=416)
+    response['Content-Range'] = f'bytes */{size}'
+    return response
+
+
+def set_download_headers(response, size, byte_range=None, filename=None, etag=None):
+    """Length, range, validator and disposition headers shared by sync and async downloads"""
+    if byte_range is not None:
+        start, stop = byte_range
+        response['Content-Range'] = f'bytes {start}-{stop - 1}/{size}'
+        response['Content-Length'] = str(stop - start)
+    else:
+        response['Content-Length'] = str(size)
+    response['Accept-Ranges'] = 'bytes'
+    if filename:
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    if etag:
+        response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def iter_range(fileobj, start, stop, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield bytes [start, stop) of a seekable file, closing it afterwards"""
+    try:
+        fileobj.seek(start)
+        remaining = stop - start
+        while remaining > 0:
+            chunk = fileobj.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        fileobj.close()
+
+
+def file_response(request, fileobj, size, content_type, filename=None, etag=None):
+    """Stream an open file, honouring Range; the response closes the file"""
+    try:
+        byte_range = requested_range(request, size, etag)
+    except RangeNotSatisfiable:
+        fileobj.close()
+        return range_not_satisfiable(size)
+
+    if byte_range is None:
+        response = FileResponse(fileobj, content_type=content_type)
+        response.block_size = STREAM_CHUNK_SIZE
+    else:
+        response = StreamingHttpResponse(
+            iter_range(fileobj, *byte_range), status=206, content_type=content_type
+        )
+    return set_download_headers(response, size, byte_range, filename, etag)
@@ -0,0 +1,267 @@
+"""
+Streaming exports of a dataset's parsed rows as CSV, JSON, Parquet or XLSX.
+
+Rows are read chunk by chunk (``iter_frames``, from the columnar copy when
+there is one), filtered, and encoded as each chunk arrives, so memory does
+not grow with the dataset: CSV and JSON are written as text per chunk and
+Parquet as one row group per chunk. An XLSX file is a zip archive that is
+only complete once closed, so it is written to a temporary file with
+openpyxl's write-only workbook, which keeps no rows in memory, and then
+streamed from disk. JSON numbers are encoded like /rows/ pages, floats in
+their shortest round-trip form (with orjson when it is installed). CSV and
+JSON are compressed on the fly with zstd or gzip when the client accepts
+it; Parquet and XLSX are compressed already.
+"""
+import json
+import os
+import tempfile
+import zlib
+
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+
+from .columnar import TYPE_COLUMN, integral_columns, iter_frames
+from .downloads import file_response
+from .parsing import NUMERIC_COLUMNS
+from .rows import parse_columns, to_records
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pa_parquet
+except ImportError:
+    pa = None
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'json': 'application/json',
+    'parquet': 'application/vnd.apache.parquet',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Formats compressed with the negotiated Content-Encoding
+COMPRESSIBLE_FORMATS = {'csv', 'json'}
+
+# Rows of an Excel sheet, less the header
+XLSX_MAX_ROWS = 1_048_575
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def parse_export_params(params):
+    """Validated ``(format, columns, types)`` of an export request; raises ValueError"""
+    fmt = params.get('format') or 'csv'
+    if fmt not in CONTENT_TYPES:
+        raise ValueError(f'format must be one of: {", ".join(CONTENT_TYPES)}')
+    if fmt == 'parquet' and pa is None:
+        raise ValueError('Parquet export needs pyarrow installed')
+    if fmt == 'xlsx' and openpyxl is None:
+        raise ValueError('XLSX export needs openpyxl installed')
+    columns = parse_columns(params.get('columns'))
+    types = [t.strip() for t in params.get('type', '').split(',') if t.strip()] or None
+    return fmt, columns, types
+
+
+def export_filename(dataset, fmt):
+    stem = os.path.splitext(os.path.basename(dataset.filename))[0] or f'dataset_{dataset.id}'
+    return f'{stem}.{fmt}'
+
+
+def export_frames(dataset, columns, types=None):
+    """Chunks of the dataset's rows with ``columns``, only rows of ``types`` if given"""
+    read = columns if types is None or TYPE_COLUMN in columns else columns + [TYPE_COLUMN]
+    for frame in iter_frames(dataset, read):
+        if types is not None:
+            frame = frame[frame[TYPE_COLUMN].isin(types)]
+        if len(frame):
+            yield frame[columns]
+
+
+def csv_chunks(frames, columns):
+    header = True
+    for frame in frames:
+        yield frame.to_csv(index=False, header=header, lineterminator='\n').encode()
+        header = False
+    if header:
+        yield (','.join(columns) + '\n').encode()
+
+
+def dump_json(value):
+    """Compact UTF-8 JSON; floats as repr() writes them, the shortest form that reads back the same"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def json_chunks(frames, integral=None):
+    """One JSON array of row objects; missing values are null, ``integral`` columns ints"""
+    yield b'['
+    separator = b''
+    for frame in frames:
+        # Each chunk is an array itself; drop its brackets and join the rows
+        body = dump_json(to_records(frame, integral))[1:-1]
+        yield separator + body
+        separator = b','
+    yield b']'
+
+
+class _Sink:
+    """A write-only file that hands over what was written since the last drain"""
+
+    def __init__(self):
+        self.parts = []
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def parquet_chunks(frames, columns):
+    """A Parquet file with one row group per chunk"""
+    # A fixed schema: numeric columns read as integers from one part may be floats in another
+    schema = pa.schema([(col, pa.float64() if col in NUMERIC_COLUMNS else pa.string()) for col in columns])
+    sink = _Sink()
+    with pa_parquet.ParquetWriter(pa.PythonFile(sink, mode='w'), schema) as writer:
+        for frame in frames:
+            writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def write_xlsx(frames, columns, fileobj):
+    """Write the rows to ``fileobj`` as one sheet; raises ValueError past Excel's row limit"""
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('Equipment')
+    sheet.append(columns)
+    rows = 0
+    for frame in frames:
+        rows += len(frame)
+        if rows > XLSX_MAX_ROWS:
+            raise ValueError(f'XLSX export is limited to {XLSX_MAX_ROWS} rows; filter by type or use csv')
+        for row in frame.astype(object).where(frame.notna(), None).itertuples(index=False, name=None):
+            sheet.append(row)
+    workbook.save(fileobj)
+
+
+def xlsx_file(dataset, columns, types=None):
+    """The export as ``(temporary file, size)``; the file is deleted once closed"""
+    if types is None and dataset.total_count > XLSX_MAX_ROWS:
+        raise ValueError(f'XLSX export is limited to {XLSX_MAX_ROWS} rows; filter by type or use csv')
+    fileobj = tempfile.TemporaryFile(suffix='.xlsx')
+    try:
+        write_xlsx(export_frames(dataset, columns, types), columns, fileobj)
+        size = fileobj.seek(0, os.SEEK_END)
+        fileobj.seek(0)
+    except BaseException:
+        fileobj.close()
+        raise
+    return fileobj, size
+
+
+def negotiate_encoding(accept_encoding):
+    """The Content-Encoding to use for an Accept-Encoding header: 'zstd', 'gzip' or None"""
+    accepted = set()
+    for item in (accept_encoding or '').split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    if 'zstd' in accepted and zstandard is not None:
+        return 'zstd'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress(chunks, encoding):
+    """Compress a stream of byte chunks with a streaming compressor"""
+    if encoding == 'zstd':
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    else:
+        # wbits 31: a gzip header and trailer around the deflate stream
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def dataset_json_chunks(dataset, frames):
+    """``json_chunks`` with the dataset's integral columns, looked up with the first chunk"""
+    # Not when the export is set up: async views build it on the event loop, where queries fail
+    yield from json_chunks(frames, integral_columns(dataset))
+
+
+def export_chunks(dataset, fmt, columns, types=None, encoding=None):
+    """
+    The export of a streamed format (not xlsx) as byte chunks, compressed with ``encoding``.
+
+    Nothing is read until the first chunk is requested.
+    """
+    frames = export_frames(dataset, columns, types)
+    if fmt == 'csv':
+        chunks = csv_chunks(frames, columns)
+    elif fmt == 'json':
+        chunks = dataset_json_chunks(dataset, frames)
+    else:
+        chunks = parquet_chunks(frames, columns)
+    if encoding is not None:
+        chunks = compress(chunks, encoding)
+    return chunks
+
+
+def set_export_headers(response, filename, encoding=None):
+    """Disposition and encoding headers of a streamed export, shared by sync and async views"""
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['Cache-Control'] = 'private, no-cache'
+    if encoding is not None:
+        response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+
+def export_response(request, dataset, fmt, columns, types=None):
+    """Stream an export; raises ValueError for an XLSX export that is too large"""
+    filename = export_filename(dataset, fmt)
+    if fmt == 'xlsx':
+        fileobj, size = xlsx_file(dataset, columns, types)
+        return file_response(request, fileobj, size, CONTENT_TYPES[fmt], filename)
+
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding')) if fmt in COMPRESSIBLE_FORMATS else None
+    response = StreamingHttpResponse(
+        export_chunks(dataset, fmt, columns, types, encoding), content_type=CONTENT_TYPES[fmt]
+    )
+    return set_export_headers(response, filename, encoding)
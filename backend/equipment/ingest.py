@@ -0,0 +1,275 @@
+"""
+Streaming CSV ingestion for uploaded equipment datasets.
+
+The upload is read in bounded chunks so that peak memory depends on the
+chunk size rather than the file size. While pandas consumes the bytes they
+are teed into a spooled temporary file, which is then handed to
+``default_storage`` as a chunked ``File``. The same chunks feed a columnar
+binary copy (see ``columnar.py``) used by every later read path, and the
+rows are stored as ``EquipmentReading`` records for filtered queries.
+"""
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+
+from .blobstore import blob_name, find_source, hash_file
+from .caching import invalidate_user
+from .columnar import ColumnarWriter, columns_dir_for, has_columnar, iter_frames, iter_part_frames
+from .models import Dataset, DatasetSegment
+from .parsing import NUMERIC_COLUMNS, CHUNK_ROWS, IngestError, ParseReport, iter_chunks
+from .quality import schedule_quality_refresh
+from .readings import store_readings
+from .reports import evict_reports, schedule_prerender
+from .retention import schedule_retention
+from .statistics import QUANTILES, RunningAggregates, schedule_quantile_refresh
+
+
+# Bytes kept in memory before the stored copy spools to disk
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+# Dataset fields derived purely from the file content
+SUMMARY_FIELDS = [
+    'total_count', 'avg_flowrate', 'avg_pressure', 'avg_temperature',
+    'type_distribution', 'statistics', 'aggregates', 'file_size', 'parse_report', 'quality'
+]
+
+
+class TeeReader:
+    """File-like wrapper that copies every byte read into a sink"""
+
+    def __init__(self, source, sink):
+        self.source = source
+        self.sink = sink
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self.source.read(size)
+        if data:
+            self.sink.write(data)
+            self.bytes_read += len(data)
+        return data
+
+    def readable(self):
+        return True
+
+    @property
+    def closed(self):
+        return getattr(self.source, 'closed', False)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.source.readline()
+        if not line:
+            raise StopIteration
+        self.sink.write(line)
+        self.bytes_read += len(line)
+        return line
+
+
+def ingest_csv(fileobj, filename, chunk_rows=CHUNK_ROWS, on_chunk=None, storage_name=None):
+    """
+    Parse, summarize and store an uploaded CSV in a single streaming pass.
+
+    ``on_chunk`` is called with every parsed chunk, letting callers collect
+    rows or report progress without the whole file being held in memory.
+    ``storage_name`` overrides the default ``uploads/<filename>`` location;
+    a file already stored there has the same content (the name is its
+    digest) and may be shared with other datasets, so it and its columnar
+    copy are reused rather than written again.
+    Returns ``(aggregates, file_path, columns_path, report)``, ``report``
+    being the ParseReport of skipped lines and coerced values. Quantiles and
+    quality checks need every row at once, so they are left to a background
+    pass over the columnar copy (``schedule_derived``).
+    """
+    aggregates = RunningAggregates()
+    report = ParseReport()
+    stored = storage_name if storage_name and default_storage.exists(storage_name) else None
+    columns_path = columns_dir_for(stored) if stored else None
+    writer = None if columns_path and has_columnar(columns_path) else ColumnarWriter()
+    try:
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as spool:
+            tee = fileobj if stored else TeeReader(fileobj, spool)
+            for chunk in iter_chunks(tee, chunk_rows, report):
+                aggregates.update(chunk)
+                if writer is not None:
+                    writer.append(chunk)
+                if on_chunk is not None:
+                    on_chunk(chunk)
+            if not aggregates.total_count:
+                raise IngestError('CSV has no data rows')
+            for col in NUMERIC_COLUMNS:
+                # Coercion keeps the odd bad value, not a column without numbers
+                if not aggregates.columns[col]['count']:
+                    raise IngestError(f'Column "{col}" must be numeric')
+
+            if stored:
+                file_path = stored
+            else:
+                # Drain anything pandas did not need so the stored copy is complete
+                while tee.read(64 * 1024):
+                    pass
+
+                spool.seek(0)
+                file_path = default_storage.save(
+                    storage_name or f'uploads/{filename}',
+                    File(spool, name=filename)
+                )
+    except Exception:
+        if writer is not None:
+            writer.discard()
+        raise
+
+    if writer is not None:
+        columns_path = writer.finish(columns_dir_for(file_path))
+    return aggregates, file_path, columns_path, report
+
+
+def source_fields(source):
+    """Dataset fields shared with an existing dataset of identical content"""
+    return {
+        'csv_file': source.csv_file.name,
+        'columns_path': source.columns_path,
+        **{field: getattr(source, field) for field in SUMMARY_FIELDS}
+    }
+
+
+def parse_fields(fileobj, filename, digest, on_chunk=None):
+    """Store and summarize new content; returns the Dataset fields derived from it"""
+    aggregates, file_path, columns_path, report = ingest_csv(
+        fileobj, filename, on_chunk=on_chunk, storage_name=blob_name(digest)
+    )
+    return {
+        'csv_file': file_path,
+        'columns_path': columns_path,
+        'aggregates': aggregates.to_dict(),
+        'statistics': {**aggregates.statistics(), 'quantiles_pending': True},
+        'file_size': default_storage.size(file_path),
+        'parse_report': report.to_dict(),
+        'quality': {'pending': True},
+        **aggregates.summary()
+    }
+
+
+def schedule_derived(dataset):
+    """Compute the quantiles and quality report of a new dataset in the background if pending"""
+    if (dataset.statistics or {}).get('quantiles_pending'):
+        schedule_quantile_refresh(dataset)
+    if (dataset.quality or {}).get('pending'):
+        schedule_quality_refresh(dataset)
+
+
+def create_dataset(user, fileobj, filename, on_chunk=None):
+    """
+    Ingest an upload and record it as a Dataset owned by ``user``.
+
+    Content already stored under the same SHA-256 digest is not parsed
+    again: the new dataset shares the blob, columnar copy and summary of the
+    existing one, and ``on_chunk`` is fed from the columnar copy.
+    """
+    digest = hash_file(fileobj)
+    source = find_source(digest)
+    if source is not None:
+        fields = source_fields(source)
+        if on_chunk is not None:
+            for chunk in iter_frames(source):
+                on_chunk(chunk)
+    else:
+        fields = parse_fields(fileobj, filename, digest, on_chunk=on_chunk)
+
+    with transaction.atomic():
+        dataset = Dataset.objects.create(user=user, filename=filename, content_hash=digest, **fields)
+        # Per-row copy for database-side filtering, read back from the columnar copy
+        store_readings(dataset, iter_frames(dataset))
+        invalidate_user(user.id)
+        schedule_prerender(dataset)
+        schedule_derived(dataset)
+
+    # Old datasets are removed in the background, not on the upload path
+    schedule_retention(user)
+    return dataset
+
+
+def lock_dataset(pk):
+    """The dataset, locked against concurrent writers until the transaction ends"""
+    # A no-op update rather than select_for_update(), which sqlite ignores: there a
+    # transaction that reads first cannot upgrade to a write lock while background
+    # work writes, and fails with "database is locked" instead of waiting. Writing
+    # first takes the lock up front (the row lock on other databases).
+    Dataset.objects.filter(pk=pk).update(revision=F('revision'))
+    return Dataset.objects.get(pk=pk)
+
+
+def append_rows(dataset, fileobj, filename):
+    """
+    Append the rows of an uploaded CSV to ``dataset``.
+
+    Only the new rows are parsed: their aggregates are merged into the
+    stored running aggregates in O(new rows), and they are kept as a
+    DatasetSegment so every read path sees them after the original rows.
+    Quantiles need all rows and are refreshed in the background.
+    Returns ``(dataset, rows appended, ParseReport of the new file)``.
+    """
+    digest = hash_file(fileobj)
+    source = find_source(digest)
+    if source is not None and source.aggregates:
+        new_aggregates = RunningAggregates.from_dict(source.aggregates)
+        file_path, columns_path = source.csv_file.name, source.columns_path
+        new_report = ParseReport.from_dict(source.parse_report)
+    else:
+        new_aggregates, file_path, columns_path, new_report = ingest_csv(
+            fileobj, filename, storage_name=blob_name(digest)
+        )
+
+    with transaction.atomic():
+        dataset = lock_dataset(dataset.pk)
+        if dataset.aggregates:
+            aggregates = RunningAggregates.from_dict(dataset.aggregates)
+        else:
+            # Datasets ingested before running aggregates existed
+            aggregates = RunningAggregates()
+            for frame in iter_frames(dataset):
+                aggregates.update(frame)
+        aggregates.merge(new_aggregates)
+
+        segment = DatasetSegment.objects.create(
+            dataset=dataset,
+            filename=filename,
+            row_count=new_aggregates.total_count,
+            csv_file=file_path,
+            columns_path=columns_path,
+            content_hash=digest
+        )
+        store_readings(dataset, iter_part_frames(segment), start_row=dataset.total_count)
+
+        old_revision = dataset.revision
+        quantiles = {
+            col: {key: dataset.statistics.get('columns', {}).get(col, {}).get(key) for key in QUANTILES}
+            for col in NUMERIC_COLUMNS
+        }
+        statistics = aggregates.statistics(quantiles)
+        statistics['quantiles_pending'] = True
+        for field, value in aggregates.summary().items():
+            setattr(dataset, field, value)
+        dataset.aggregates = aggregates.to_dict()
+        dataset.statistics = statistics
+        report = ParseReport.from_dict(dataset.parse_report)
+        report.rows = aggregates.total_count - new_aggregates.total_count
+        report.merge(new_report, filename)
+        dataset.parse_report = report.to_dict()
+        # Duplicates and outliers depend on every row, so the whole dataset is rechecked
+        dataset.quality = {**dataset.quality, 'pending': True}
+        dataset.file_size += default_storage.size(file_path)
+        dataset.revision = old_revision + 1
+        dataset.save()
+        invalidate_user(dataset.user_id)
+
+    evict_reports(dataset.id, old_revision)
+    schedule_quantile_refresh(dataset)
+    schedule_quality_refresh(dataset)
+    schedule_prerender(dataset)
+    return dataset, new_aggregates.total_count, new_report
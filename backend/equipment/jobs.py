@@ -0,0 +1,115 @@
+"""
+Database-backed queue for asynchronous upload processing.
+
+Uploads are staged to ``default_storage`` and recorded as ``UploadJob`` rows.
+Workers claim queued jobs with a conditional UPDATE, so any number of local
+thread pools (one per web process) and ``process_upload_jobs`` workers can
+share the queue without an external broker.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from .ingest import create_dataset, IngestError
+from .models import UploadJob
+from .workers import get_executor
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_upload(user, uploaded_file):
+    """Stage an uploaded file and queue it for background processing"""
+    job = UploadJob(
+        user=user,
+        filename=uploaded_file.name,
+        bytes_total=uploaded_file.size or 0
+    )
+    # FileField.save streams the upload in chunks
+    job.staged_file.save(uploaded_file.name, uploaded_file, save=False)
+    job.save()
+
+    if settings.UPLOAD_JOBS_IN_PROCESS:
+        get_executor().submit(drain_queue)
+    return job
+
+
+def claim_next_job():
+    """Atomically move the oldest queued job to running and return it"""
+    while True:
+        job_id = (
+            UploadJob.objects.filter(status=UploadJob.STATUS_QUEUED)
+            .values_list('id', flat=True)
+            .first()
+        )
+        if job_id is None:
+            return None
+        claimed = UploadJob.objects.filter(
+            pk=job_id, status=UploadJob.STATUS_QUEUED
+        ).update(status=UploadJob.STATUS_RUNNING, started_at=timezone.now())
+        if claimed:
+            return UploadJob.objects.get(pk=job_id)
+        # Another worker won the race; try the next one
+
+
+def run_job(job):
+    """Process a claimed job, recording progress and the final outcome"""
+    progress = {'rows': 0}
+
+    try:
+        with job.staged_file.open('rb') as staged:
+            def report(chunk):
+                progress['rows'] += len(chunk)
+                UploadJob.objects.filter(pk=job.pk).update(
+                    rows_processed=progress['rows'],
+                    bytes_processed=staged.tell()
+                )
+
+            dataset = create_dataset(job.user, staged, job.filename, on_chunk=report)
+    except Exception as e:
+        if isinstance(e, IngestError):
+            logger.info('Upload job %s rejected: %s', job.pk, e)
+        else:
+            logger.exception('Upload job %s failed', job.pk)
+        UploadJob.objects.filter(pk=job.pk).update(
+            status=UploadJob.STATUS_FAILED,
+            error=str(e),
+            finished_at=timezone.now()
+        )
+    else:
+        UploadJob.objects.filter(pk=job.pk).update(
+            status=UploadJob.STATUS_DONE,
+            dataset=dataset,
+            rows_processed=progress['rows'],
+            bytes_processed=job.bytes_total,
+            finished_at=timezone.now()
+        )
+    finally:
+        job.staged_file.delete(save=False)
+        UploadJob.objects.filter(pk=job.pk).update(staged_file=None)
+
+
+def drain_queue():
+    """Process queued jobs until none are left; returns the number run"""
+    processed = 0
+    close_old_connections()
+    try:
+        while True:
+            job = claim_next_job()
+            if job is None:
+                return processed
+            run_job(job)
+            processed += 1
+    finally:
+        # Worker threads own their connections; release them when idle
+        connection.close()
+
+
+def requeue_stale_jobs(older_than=timedelta(minutes=30)):
+    """Return running jobs abandoned by a dead worker to the queue"""
+    cutoff = timezone.now() - older_than
+    return UploadJob.objects.filter(
+        status=UploadJob.STATUS_RUNNING, started_at__lt=cutoff
+    ).update(status=UploadJob.STATUS_QUEUED, started_at=None)
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from equipment.retention import expire_datasets, select_expired, sweep
+
+
+class Command(BaseCommand):
+    help = 'Delete datasets outside each user\'s retention policy (run periodically, e.g. from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only apply retention for this user id')
+        parser.add_argument('--dry-run', action='store_true', help='Report expired datasets without deleting them')
+        parser.add_argument('--interval', type=float, help='Keep running, sweeping every this many seconds')
+
+    def handle(self, *args, **options):
+        while True:
+            self.run_once(options)
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    def run_once(self, options):
+        if options['user'] is not None:
+            expired = select_expired(options['user'])
+            if expired and not options['dry_run']:
+                expire_datasets(expired)
+            results = [(options['user'], expired)]
+        else:
+            results = list(sweep(dry_run=options['dry_run']))
+
+        removed = 0
+        for user_id, expired in results:
+            if expired:
+                removed += len(expired)
+                self.stdout.write(f'User {user_id}: {len(expired)} dataset(s) expired')
+        verb = 'Would remove' if options['dry_run'] else 'Removed'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {removed} dataset(s)'))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from equipment.caching import invalidate_user
+from equipment.columnar import open_reader, write_columnar
+from equipment.models import Dataset
+from equipment.parsing import iter_chunks
+from equipment.statistics import full_statistics
+
+
+class Command(BaseCommand):
+    help = 'Write columnar binary copies, statistics and running aggregates for datasets that predate them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rebuild copies and statistics that already exist')
+
+    def handle(self, *args, **options):
+        converted = skipped = failed = 0
+        for dataset in Dataset.objects.exclude(csv_file='').exclude(csv_file__isnull=True).iterator():
+            needs_copy = options['force'] or open_reader(dataset) is None
+            needs_statistics = options['force'] or not dataset.statistics or not dataset.aggregates
+            if not needs_copy and not needs_statistics:
+                skipped += 1
+                continue
+            try:
+                columns_path = dataset.columns_path
+                if needs_copy:
+                    # Files are swapped in one at a time, so datasets sharing the copy keep reading
+                    with dataset.csv_file.open('rb') as f:
+                        columns_path = write_columnar(iter_chunks(f), dataset.csv_file.name)
+                dataset.columns_path = columns_path
+                aggregates, statistics = full_statistics(dataset)
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f'{dataset.id} ({dataset.filename}): {e}')
+                continue
+            # Datasets sharing a blob share the copy, so update them together
+            sharing = Dataset.objects.filter(csv_file=dataset.csv_file.name, segments__isnull=True)
+            sharing.update(columns_path=columns_path, statistics=statistics, aggregates=aggregates.to_dict())
+            for user_id in set(sharing.values_list('user_id', flat=True)):
+                invalidate_user(user_id)
+            converted += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Converted {converted}, skipped {skipped}, failed {failed}'
+        ))
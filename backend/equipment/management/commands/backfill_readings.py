@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from equipment.columnar import iter_frames
+from equipment.models import Dataset
+from equipment.readings import store_readings
+
+
+class Command(BaseCommand):
+    help = 'Store per-row EquipmentReading records for datasets that predate them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Replace readings that already exist')
+
+    def handle(self, *args, **options):
+        converted = skipped = failed = 0
+        for dataset in Dataset.objects.iterator():
+            if not options['force'] and dataset.readings.exists():
+                skipped += 1
+                continue
+            try:
+                with transaction.atomic():
+                    dataset.readings.all().delete()
+                    stored = store_readings(dataset, iter_frames(dataset))
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f'{dataset.id} ({dataset.filename}): {e}')
+                continue
+            converted += 1
+            self.stdout.write(f'{dataset.id} ({dataset.filename}): {stored} rows')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Converted {converted}, skipped {skipped}, failed {failed}'
+        ))
@@ -0,0 +1,28 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from equipment.jobs import drain_queue, requeue_stale_jobs
+
+
+class Command(BaseCommand):
+    help = 'Process queued CSV upload jobs (run alongside the web workers)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds between queue polls')
+        parser.add_argument('--stale-minutes', type=int, default=30, help='Requeue running jobs older than this')
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale_jobs(timedelta(minutes=options['stale_minutes']))
+        if requeued:
+            self.stdout.write(f'Requeued {requeued} stale job(s)')
+
+        while True:
+            processed = drain_queue()
+            if processed:
+                self.stdout.write(f'Processed {processed} job(s)')
+            if options['once']:
+                return
+            time.sleep(options['poll_interval'])
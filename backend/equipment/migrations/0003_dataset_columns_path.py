@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 07:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0002_upload_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='columns_path',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
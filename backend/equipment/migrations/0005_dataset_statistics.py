@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 07:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0004_dataset_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='statistics',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
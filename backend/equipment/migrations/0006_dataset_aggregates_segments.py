@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-17 07:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0005_dataset_statistics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='aggregates',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='revision',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='DatasetSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filename', models.CharField(max_length=255)),
+                ('uploaded_at', models.DateTimeField(auto_now_add=True)),
+                ('row_count', models.IntegerField(default=0)),
+                ('csv_file', models.FileField(blank=True, null=True, upload_to='uploads/')),
+                ('columns_path', models.CharField(blank=True, default='', max_length=255)),
+                ('content_hash', models.CharField(blank=True, db_index=True, default='', max_length=64)),
+                ('dataset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='segments', to='equipment.dataset')),
+            ],
+            options={
+                'ordering': ['uploaded_at', 'id'],
+            },
+        ),
+    ]
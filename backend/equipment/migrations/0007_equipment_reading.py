@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-17 07:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0006_dataset_aggregates_segments'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EquipmentReading',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row', models.PositiveIntegerField()),
+                ('name', models.TextField(blank=True, null=True)),
+                ('type', models.CharField(blank=True, max_length=255, null=True)),
+                ('flowrate', models.FloatField(blank=True, null=True)),
+                ('pressure', models.FloatField(blank=True, null=True)),
+                ('temperature', models.FloatField(blank=True, null=True)),
+                ('dataset', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='readings', to='equipment.dataset')),
+            ],
+            options={
+                'ordering': ['dataset', 'row'],
+                'indexes': [models.Index(fields=['dataset', 'type'], name='equipment_reading_type_idx'), models.Index(fields=['dataset', 'flowrate'], name='equipment_reading_flow_idx'), models.Index(fields=['dataset', 'pressure'], name='equipment_reading_press_idx'), models.Index(fields=['dataset', 'temperature'], name='equipment_reading_temp_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='equipmentreading',
+            constraint=models.UniqueConstraint(fields=('dataset', 'row'), name='equipment_reading_dataset_row'),
+        ),
+    ]
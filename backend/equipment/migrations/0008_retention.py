@@ -0,0 +1,56 @@
+# Generated by Django 4.2.30 on 2026-10-17 07:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_file_sizes(apps, schema_editor):
+    """Record the stored CSV size of datasets uploaded before file_size existed"""
+    from django.core.files.storage import default_storage
+
+    Dataset = apps.get_model('equipment', 'Dataset')
+    DatasetSegment = apps.get_model('equipment', 'DatasetSegment')
+
+    def size(name):
+        try:
+            return default_storage.size(name) if name else 0
+        except OSError:
+            return 0
+
+    for dataset in Dataset.objects.all().iterator():
+        total = size(dataset.csv_file.name)
+        for segment in DatasetSegment.objects.filter(dataset=dataset):
+            total += size(segment.csv_file.name)
+        if total:
+            Dataset.objects.filter(pk=dataset.pk).update(file_size=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('equipment', '0007_equipment_reading'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='file_size',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='RetentionPolicy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('max_count', models.PositiveIntegerField(blank=True, null=True)),
+                ('max_age_days', models.PositiveIntegerField(blank=True, null=True)),
+                ('max_bytes', models.BigIntegerField(blank=True, null=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='retention_policy', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'retention policies',
+            },
+        ),
+        migrations.RunPython(fill_file_sizes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-17 08:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0008_retention'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dataset',
+            index=models.Index(fields=['user', 'uploaded_at'], name='equipment_dataset_user_time'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 08:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0009_dataset_user_time'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='parse_report',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
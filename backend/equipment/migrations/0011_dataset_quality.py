@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 08:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0010_dataset_parse_report'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='quality',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
 import json
+import uuid
 
 
 class Dataset(models.Model):
@@ -16,20 +17,168 @@ class Dataset(models.Model):
     avg_temperature = models.FloatField(default=0.0)
     type_distribution = models.JSONField(default=dict)
     
+    # Min/max/std/quantiles, per-type aggregates and correlations (see statistics.py)
+    statistics = models.JSONField(default=dict, blank=True)
+    
+    # Mergeable count/sum/M2 state that appends update without re-reading rows
+    aggregates = models.JSONField(default=dict, blank=True)
+    
+    # Lines skipped and values coerced to NaN while parsing (see parsing.ParseReport)
+    parse_report = models.JSONField(default=dict, blank=True)
+    
+    # Flagged rows and the summary without them (see quality.py)
+    quality = models.JSONField(default=dict, blank=True)
+    
+    # Incremented whenever rows are appended; part of report cache keys
+    revision = models.PositiveIntegerField(default=0)
+    
     # Store the CSV file path
     csv_file = models.FileField(upload_to='uploads/', null=True, blank=True)
     
+    # Storage directory of the columnar binary copy (see columnar.py)
+    columns_path = models.CharField(max_length=255, blank=True, default='')
+    
+    # SHA-256 of the uploaded file; identical uploads share one stored blob
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True)
+    
+    # Bytes of uploaded CSV (including appended files), used by byte-based retention
+    file_size = models.BigIntegerField(default=0)
+    
     class Meta:
         ordering = ['-uploaded_at']
+        # History, trends and retention all scan one user's datasets by upload time
+        indexes = [
+            models.Index(fields=['user', 'uploaded_at'], name='equipment_dataset_user_time'),
+        ]
         
     def __str__(self):
         return f"{self.filename} - {self.uploaded_at.strftime('%Y-%m-%d %H:%M')}"
     
+    def purge(self):
+        """Delete the dataset with its unshared stored files and cached reports"""
+        from .retention import expire_datasets
+        
+        return expire_datasets([self.pk])
+    
     @classmethod
-    def cleanup_old_datasets(cls, user, keep_count=5):
-        """Keep only the last N datasets for a user"""
-        old_datasets = cls.objects.filter(user=user)[keep_count:]
-        for dataset in old_datasets:
-            if dataset.csv_file:
-                dataset.csv_file.delete()
-            dataset.delete()
+    def cleanup_old_datasets(cls, user, keep_count=None):
+        """
+        Apply the user's retention policy (see retention.py), or with
+        ``keep_count`` keep only their newest N datasets; returns the number removed
+        """
+        from .retention import apply_retention, expire_datasets, select_expired
+        
+        if keep_count is None:
+            return apply_retention(user.id)
+        policy = {'max_count': keep_count, 'max_age_days': None, 'max_bytes': None}
+        return expire_datasets(select_expired(user.id, policy))
+
+
+class RetentionPolicy(models.Model):
+    """Per-user overrides of the DATASET_RETENTION_* settings; null keeps the default"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='retention_policy')
+    max_count = models.PositiveIntegerField(null=True, blank=True)
+    max_age_days = models.PositiveIntegerField(null=True, blank=True)
+    max_bytes = models.BigIntegerField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name_plural = 'retention policies'
+    
+    def __str__(self):
+        return f"Retention for {self.user.username}"
+
+
+class DatasetSegment(models.Model):
+    """Rows appended to a dataset after its initial upload"""
+    dataset = models.ForeignKey(Dataset, on_delete=models.CASCADE, related_name='segments')
+    filename = models.CharField(max_length=255)
+    uploaded_at = models.DateTimeField(auto_now_add=True)
+    row_count = models.IntegerField(default=0)
+    
+    csv_file = models.FileField(upload_to='uploads/', null=True, blank=True)
+    columns_path = models.CharField(max_length=255, blank=True, default='')
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True)
+    
+    class Meta:
+        ordering = ['uploaded_at', 'id']
+    
+    def __str__(self):
+        return f"{self.dataset.filename} + {self.filename}"
+
+
+class EquipmentReading(models.Model):
+    """One CSV row of a dataset, stored for server-side filtering and sorting"""
+    # The composite indexes below all lead with dataset, so the FK needs no index of its own
+    dataset = models.ForeignKey(Dataset, on_delete=models.CASCADE, related_name='readings', db_index=False)
+    
+    # Position within the dataset (appended rows continue the numbering)
+    row = models.PositiveIntegerField()
+    
+    name = models.TextField(null=True, blank=True)
+    type = models.CharField(max_length=255, null=True, blank=True)
+    flowrate = models.FloatField(null=True, blank=True)
+    pressure = models.FloatField(null=True, blank=True)
+    temperature = models.FloatField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['dataset', 'row']
+        constraints = [
+            models.UniqueConstraint(fields=['dataset', 'row'], name='equipment_reading_dataset_row'),
+        ]
+        indexes = [
+            models.Index(fields=['dataset', 'type'], name='equipment_reading_type_idx'),
+            models.Index(fields=['dataset', 'flowrate'], name='equipment_reading_flow_idx'),
+            models.Index(fields=['dataset', 'pressure'], name='equipment_reading_press_idx'),
+            models.Index(fields=['dataset', 'temperature'], name='equipment_reading_temp_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} ({self.type})"
+
+
+class UploadJob(models.Model):
+    """Background processing job for an uploaded CSV file"""
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_jobs')
+    filename = models.CharField(max_length=255)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    # Uploaded file waiting to be processed
+    staged_file = models.FileField(upload_to='uploads/pending/', null=True, blank=True)
+
+    # Progress counters updated by the worker after every chunk
+    bytes_total = models.BigIntegerField(default=0)
+    bytes_processed = models.BigIntegerField(default=0)
+    rows_processed = models.BigIntegerField(default=0)
+
+    dataset = models.ForeignKey(Dataset, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    error = models.TextField(blank=True, default='')
+
+    class Meta:
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f"{self.filename} - {self.status}"
+
+    @property
+    def progress(self):
+        """Fraction of the staged file consumed so far"""
+        if self.status == self.STATUS_DONE:
+            return 1.0
+        if not self.bytes_total:
+            return 0.0
+        return min(self.bytes_processed / self.bytes_total, 1.0)
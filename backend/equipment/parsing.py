@@ -0,0 +1,248 @@
+"""
+CSV parsing for the equipment dataset schema.
+
+Uploads are read with explicit dtypes instead of per-column inference:
+``Type`` as a categorical, ``Equipment Name`` as strings and the numeric
+columns as ``CSV_FLOAT_DTYPE``, and only the required columns are kept.
+The pyarrow reader, which projects columns while parsing, is used when it
+is installed (``CSV_PARSE_ENGINE``). Lines that cannot be parsed are skipped and values
+that are not numbers become NaN; both are recorded in a ``ParseReport``
+instead of failing the upload.
+"""
+import re
+import warnings
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pa_compute
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+
+
+REQUIRED_COLUMNS = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
+NUMERIC_COLUMNS = ['Flowrate', 'Pressure', 'Temperature']
+
+# Rows parsed per chunk
+CHUNK_ROWS = 50_000
+
+# Bytes the pyarrow reader parses per block; blocks are re-sliced to CHUNK_ROWS
+PYARROW_BLOCK_SIZE = 4 * 1024 * 1024
+
+# Problems listed individually per file; the counts cover all of them
+MAX_REPORTED_ISSUES = 20
+
+ENGINES = ('auto', 'c', 'pyarrow')
+
+_SKIPPED_LINE = re.compile(r'Skipping line (\d+): (.*)')
+
+
+class IngestError(ValueError):
+    """Raised when an upload cannot be ingested (bad columns, bad values)"""
+
+
+class ParseReport:
+    """Lines skipped and values coerced to NaN while parsing one file"""
+
+    def __init__(self):
+        self.rows = 0
+        self.malformed_rows = 0
+        self.coerced_values = {col: 0 for col in NUMERIC_COLUMNS}
+        self.issues = []
+
+    @classmethod
+    def from_dict(cls, data):
+        report = cls()
+        report.rows = data.get('rows', 0)
+        report.malformed_rows = data.get('malformed_rows', 0)
+        report.coerced_values.update(data.get('coerced_values', {}))
+        report.issues = list(data.get('issues', []))
+        return report
+
+    def to_dict(self):
+        return {
+            'rows': self.rows,
+            'malformed_rows': self.malformed_rows,
+            'coerced_values': self.coerced_values,
+            'issues': self.issues,
+        }
+
+    @property
+    def clean(self):
+        return not self.malformed_rows and not any(self.coerced_values.values())
+
+    def _add(self, issue):
+        if len(self.issues) < MAX_REPORTED_ISSUES:
+            self.issues.append(issue)
+
+    def malformed(self, line, error):
+        """A line that was skipped; ``line`` counts the header as line 1"""
+        self.malformed_rows += 1
+        self._add({'line': line, 'error': error})
+
+    def coerced(self, column, rows, values):
+        """Values of ``column`` at dataset ``rows`` (0-based) that are not numbers"""
+        self.coerced_values[column] += len(rows)
+        for row, value in zip(rows, values):
+            if len(self.issues) >= MAX_REPORTED_ISSUES:
+                break
+            self._add({'row': int(row), 'column': column, 'value': str(value), 'error': 'not a number'})
+
+    def merge(self, other, filename=None):
+        """Fold in the report of rows appended after this one's"""
+        for issue in other.issues:
+            issue = dict(issue)
+            if 'row' in issue:
+                issue['row'] += self.rows
+            if filename:
+                issue['file'] = filename
+            self._add(issue)
+        self.rows += other.rows
+        self.malformed_rows += other.malformed_rows
+        for col, count in other.coerced_values.items():
+            self.coerced_values[col] = self.coerced_values.get(col, 0) + count
+
+
+def parse_engine(engine=None):
+    """The engine to parse with: ``engine`` or CSV_PARSE_ENGINE, 'auto' meaning pyarrow if installed"""
+    engine = engine or settings.CSV_PARSE_ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f'CSV_PARSE_ENGINE must be one of: {", ".join(ENGINES)}')
+    if engine == 'auto':
+        return 'pyarrow' if pa is not None else 'c'
+    if engine == 'pyarrow' and pa is None:
+        raise ImportError('CSV_PARSE_ENGINE is pyarrow but pyarrow is not installed')
+    return engine
+
+
+def _missing_columns():
+    return IngestError(f'CSV must contain columns: {", ".join(REQUIRED_COLUMNS)}')
+
+
+def _in_order(chunk):
+    """The required columns of a chunk in REQUIRED_COLUMNS order, whatever order they were read in"""
+    if list(chunk.columns) == REQUIRED_COLUMNS:
+        return chunk
+    return chunk.reindex(columns=REQUIRED_COLUMNS)
+
+
+def _coerce(chunk, report, float_dtype):
+    """Cast the numeric columns of a parsed chunk, recording values that are not numbers"""
+    for col in NUMERIC_COLUMNS:
+        series = chunk[col]
+        if not pd.api.types.is_numeric_dtype(series):
+            numbers = pd.to_numeric(series, errors='coerce')
+            bad = numbers.isna().to_numpy() & series.notna().to_numpy()
+            if bad.any():
+                positions = np.flatnonzero(bad)
+                report.coerced(col, positions + report.rows, series.iloc[positions[:MAX_REPORTED_ISSUES]])
+            series = numbers
+        chunk[col] = series.astype(float_dtype, copy=False)
+    return chunk
+
+
+def _iter_c_chunks(fileobj, chunk_rows, report, float_dtype):
+    # Numeric columns are left to the C tokenizer's own (fast) number parsing;
+    # a chunk holding a non-number comes back as strings and is coerced. No
+    # usecols here: the C parser stops checking field counts when projecting,
+    # so lines with extra fields would be read instead of reported.
+    reader = None
+    while True:
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always', pd.errors.ParserWarning)
+            try:
+                if reader is None:
+                    reader = pd.read_csv(
+                        fileobj,
+                        chunksize=chunk_rows,
+                        dtype={'Equipment Name': object, 'Type': 'category'},
+                        on_bad_lines='warn',
+                    )
+                chunk = next(reader)
+            except StopIteration:
+                return
+            except pd.errors.EmptyDataError:
+                raise IngestError('CSV file is empty')
+            except pd.errors.ParserError as e:
+                raise IngestError(f'Malformed CSV: {str(e)}')
+        for warning in caught:
+            for message in str(warning.message).splitlines():
+                match = _SKIPPED_LINE.match(message)
+                if match:
+                    report.malformed(int(match.group(1)), match.group(2))
+        if not all(col in chunk.columns for col in REQUIRED_COLUMNS):
+            raise _missing_columns()
+        # Extra columns are dropped and the rest put in a fixed order
+        yield _coerce(_in_order(chunk), report, float_dtype)
+
+
+def _iter_pyarrow_chunks(fileobj, chunk_rows, report, float_dtype):
+    # Numeric columns are read as strings and cast in Arrow; only a block
+    # whose cast fails takes the slower pandas coercion path.
+    def skip(row):
+        report.malformed(row.number, f'expected {row.expected_columns} fields, saw {row.actual_columns}')
+        return 'skip'
+
+    try:
+        reader = pa_csv.open_csv(
+            fileobj,
+            read_options=pa_csv.ReadOptions(block_size=PYARROW_BLOCK_SIZE),
+            parse_options=pa_csv.ParseOptions(invalid_row_handler=skip),
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=REQUIRED_COLUMNS,
+                column_types={
+                    'Equipment Name': pa.string(),
+                    'Type': pa.dictionary(pa.int32(), pa.string()),
+                    **{col: pa.string() for col in NUMERIC_COLUMNS},
+                },
+                strings_can_be_null=True,
+            ),
+        )
+    except pa.ArrowKeyError:
+        raise _missing_columns()
+    except pa.ArrowInvalid as e:
+        if 'Empty CSV file' in str(e):
+            raise IngestError('CSV file is empty')
+        raise IngestError(f'Malformed CSV: {str(e)}')
+
+    while True:
+        try:
+            batch = reader.read_next_batch()
+        except StopIteration:
+            return
+        except pa.ArrowInvalid as e:
+            raise IngestError(f'Malformed CSV: {str(e)}')
+
+        numbers = {}
+        for col in NUMERIC_COLUMNS:
+            try:
+                numbers[col] = pa_compute.cast(batch.column(col), pa.from_numpy_dtype(np.dtype(float_dtype)))
+            except pa.ArrowInvalid:
+                pass
+        frame = batch.drop_columns(list(numbers)).to_pandas()
+        for col, values in numbers.items():
+            frame[col] = values.to_numpy(zero_copy_only=False)
+        # Re-adding the cast columns moved them behind any column left to _coerce
+        frame = _coerce(_in_order(frame), report, float_dtype)
+        for start in range(0, len(frame), chunk_rows):
+            yield frame.iloc[start:start + chunk_rows]
+
+
+def iter_chunks(fileobj, chunk_rows=CHUNK_ROWS, report=None, engine=None):
+    """
+    Yield DataFrame chunks of the required columns, validating them on the
+    first one. Skipped lines and coerced values are recorded in ``report``.
+    """
+    report = report if report is not None else ParseReport()
+    float_dtype = settings.CSV_FLOAT_DTYPE
+    if parse_engine(engine) == 'pyarrow':
+        chunks = _iter_pyarrow_chunks(fileobj, chunk_rows, report, float_dtype)
+    else:
+        chunks = _iter_c_chunks(fileobj, chunk_rows, report, float_dtype)
+    for chunk in chunks:
+        report.rows += len(chunk)
+        yield chunk
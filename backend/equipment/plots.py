@@ -0,0 +1,158 @@
+"""
+Bounded-size plotting data for datasets of any length.
+
+Histograms are binned per numeric column and per Type in one chunked pass
+(``charts.type_histograms``), and series of a column are decimated to at
+most ``MAX_SERIES_POINTS`` points, either by largest-triangle-three-buckets
+(LTTB), which keeps the visual shape of a line, or by the minimum and
+maximum of each bucket, which keeps every spike. Both are computed with
+NumPy over whole columns (or each bucket, for LTTB) and served through the
+per-user response cache, so charting a million rows costs kilobytes.
+"""
+import numpy as np
+
+from .charts import OTHER_TYPE, chart_types, histogram_edges, type_histograms
+from .columnar import load_frame
+from .parsing import NUMERIC_COLUMNS
+
+DEFAULT_HISTOGRAM_BINS = 20
+MAX_HISTOGRAM_BINS = 200
+
+# Types binned separately; rarer ones are folded into OTHER_TYPE
+MAX_HISTOGRAM_TYPES = 20
+
+DEFAULT_SERIES_POINTS = 1000
+MAX_SERIES_POINTS = 2000
+SERIES_METHODS = ['lttb', 'minmax']
+
+
+def _int_param(params, name, default, low, high):
+    value = params.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValueError(f'{name} must be an integer')
+    if not low <= value <= high:
+        raise ValueError(f'{name} must be between {low} and {high}')
+    return value
+
+
+def parse_histogram_params(params):
+    """Validated ``bins`` of a histograms request; raises ValueError"""
+    return _int_param(params, 'bins', DEFAULT_HISTOGRAM_BINS, 1, MAX_HISTOGRAM_BINS)
+
+
+def parse_series_params(params, total_count):
+    """Validated ``(column, points, method, start, stop)`` of a series request; raises ValueError"""
+    column = params.get('column')
+    if column not in NUMERIC_COLUMNS:
+        raise ValueError(f'column must be one of: {", ".join(NUMERIC_COLUMNS)}')
+    method = params.get('method') or SERIES_METHODS[0]
+    if method not in SERIES_METHODS:
+        raise ValueError(f'method must be one of: {", ".join(SERIES_METHODS)}')
+    points = _int_param(params, 'points', DEFAULT_SERIES_POINTS, 3, MAX_SERIES_POINTS)
+    start = _int_param(params, 'start', 0, 0, total_count)
+    stop = _int_param(params, 'stop', total_count, start, total_count)
+    return column, points, method, start, stop
+
+
+def histograms_response(dataset, bins):
+    """Histograms of every numeric column over all rows and per Type"""
+    types = chart_types(dataset.type_distribution, MAX_HISTOGRAM_TYPES)
+    column_stats = (dataset.statistics or {}).get('columns', {})
+    edges = {col: histogram_edges(column_stats.get(col, {}), bins) for col in NUMERIC_COLUMNS}
+    counts = type_histograms(dataset, types, edges)
+    histograms = {}
+    for col, col_counts in counts.items():
+        by_type = dict(zip(types, col_counts[:len(types)].tolist()))
+        if col_counts[len(types)].any():
+            # Rows whose type is missing, when there are too few types to need OTHER_TYPE
+            by_type[OTHER_TYPE] = col_counts[len(types)].tolist()
+        histograms[col] = {
+            'edges': edges[col].tolist(),
+            'counts': col_counts.sum(axis=0).tolist(),
+            'by_type': by_type,
+        }
+    return {
+        'dataset_id': dataset.id,
+        'revision': dataset.revision,
+        'bins': bins,
+        'histograms': histograms,
+    }
+
+
+def minmax_decimate(x, y, points):
+    """
+    Keep the lowest and highest point of each of ``points // 2`` buckets
+    of consecutive points, in their original order.
+    """
+    buckets = points // 2
+    size = -(-len(y) // buckets)
+    # Equal-sized buckets, padded past the end so they never win
+    lows = np.full(buckets * size, np.inf)
+    highs = np.full(buckets * size, -np.inf)
+    lows[:len(y)] = y
+    highs[:len(y)] = y
+    base = np.arange(buckets) * size
+    picks = np.concatenate([
+        base + lows.reshape(buckets, size).argmin(axis=1),
+        base + highs.reshape(buckets, size).argmax(axis=1),
+    ])
+    picks = np.unique(picks[picks < len(y)])
+    return x[picks], y[picks]
+
+
+def lttb_decimate(x, y, points):
+    """
+    Largest-triangle-three-buckets: the first and last points, plus from
+    each of ``points - 2`` buckets the point forming the largest triangle
+    with the point kept from the previous bucket and the mean of the next.
+    """
+    n = len(y)
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    picks = np.empty(points, dtype=np.int64)
+    picks[0], picks[-1] = 0, n - 1
+    # Means of every bucket up front; the last bucket's successor is the last point
+    sums_x, sums_y = np.add.reduceat(x, edges[:-1]), np.add.reduceat(y, edges[:-1])
+    sizes = np.diff(edges)
+    next_x = np.append(sums_x[1:] / sizes[1:], x[-1])
+    next_y = np.append(sums_y[1:] / sizes[1:], y[-1])
+    previous = 0
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        ax, ay = x[previous], y[previous]
+        # Twice the triangle areas; the constant factor does not change the argmax
+        areas = np.abs((ax - next_x[i]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (next_y[i] - ay))
+        previous = lo + int(areas.argmax())
+        picks[i + 1] = previous
+    return x[picks], y[picks]
+
+
+def series_response(dataset, column, points, method, start, stop):
+    """
+    Rows ``[start, stop)`` of a numeric column, decimated to at most
+    ``points`` points. ``x`` holds row offsets, as used by ``/rows/``;
+    missing and infinite values are left out.
+    """
+    frame = load_frame(dataset, [column], start, stop)
+    y = frame[column].to_numpy(dtype='float64', na_value=np.nan)
+    x = np.arange(start, start + len(y), dtype=np.int64)
+    present = np.isfinite(y)
+    x, y = x[present], y[present]
+    if len(y) > points:
+        decimate = lttb_decimate if method == 'lttb' else minmax_decimate
+        x, y = decimate(x.astype('float64'), y, points)
+        x = x.astype(np.int64)
+    return {
+        'dataset_id': dataset.id,
+        'revision': dataset.revision,
+        'column': column,
+        'method': method,
+        'start': start,
+        'stop': stop,
+        'count': int(present.sum()),
+        'x': x.tolist(),
+        'y': y.tolist(),
+    }
@@ -0,0 +1,315 @@
+"""
+Data quality checks for ingested datasets.
+
+Every row is checked for missing values, values outside the plausible
+range of its Type (``QUALITY_RANGES``), outliers within its Type (z-score
+or IQR, ``QUALITY_OUTLIER_METHOD``) and duplicates: repeated equipment
+names and repeated rows, found by hashing so no pairwise comparison is
+needed. The rows are read once in chunks and only compact per-row arrays
+are kept, so a check costs linear time and a few bytes per row. As that
+still grows with the file, uploads do not run the checks while streaming:
+the report is marked ``pending`` and computed from the columnar copy in
+the background (or on the first request for it).
+
+Flagged rows stay in the dataset; the report counts them per check and per
+Type and carries the summary of the rows that were not flagged, next to
+the dataset's own summary of all rows.
+"""
+import logging
+import math
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+from .caching import invalidate_user
+from .columnar import NAME_COLUMN, TYPE_COLUMN, iter_frames
+from .models import Dataset
+from .parsing import CHUNK_ROWS, NUMERIC_COLUMNS, REQUIRED_COLUMNS
+from .statistics import RunningAggregates
+from .workers import get_executor
+
+logger = logging.getLogger(__name__)
+
+# Bumped when the checks change; older reports are recomputed on request
+QUALITY_VERSION = 1
+
+OUTLIER_METHODS = ('zscore', 'iqr')
+
+# Types with fewer valid values than this are not checked for outliers
+MIN_OUTLIER_GROUP = 8
+
+# Flagged rows listed individually in the report
+MAX_SAMPLES = 20
+
+
+def _number(value):
+    value = float(value)
+    return None if math.isnan(value) or math.isinf(value) else value
+
+
+def _bounds(types, ranges):
+    """(lower, upper) arrays of shape (types, numeric columns), -inf/inf when open"""
+    lower = np.full((len(types), len(NUMERIC_COLUMNS)), -np.inf)
+    upper = np.full((len(types), len(NUMERIC_COLUMNS)), np.inf)
+    for i, eq_type in enumerate(types):
+        limits = {**ranges.get('default', {}), **ranges.get('types', {}).get(str(eq_type), {})}
+        for j, col in enumerate(NUMERIC_COLUMNS):
+            low, high = limits.get(col) or (None, None)
+            if low is not None:
+                lower[i, j] = low
+            if high is not None:
+                upper[i, j] = high
+    return lower, upper
+
+
+def _zscore_outliers(values, codes, valid, type_count, threshold):
+    outliers = np.zeros_like(valid)
+    for j in range(values.shape[1]):
+        keep = valid[:, j]
+        group, column = codes[keep], values[keep, j]
+        counts = np.bincount(group, minlength=type_count)
+        means = np.bincount(group, weights=column, minlength=type_count) / np.maximum(counts, 1)
+        squares = np.bincount(group, weights=(column - means[group]) ** 2, minlength=type_count)
+        stds = np.sqrt(squares / np.maximum(counts - 1, 1))
+        checked = keep & (counts[codes] >= MIN_OUTLIER_GROUP) & (stds[codes] > 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = np.abs(values[:, j] - means[codes]) / stds[codes]
+        outliers[:, j] = checked & (scores > threshold)
+    return outliers
+
+
+def _iqr_outliers(values, codes, valid, type_count, factor):
+    outliers = np.zeros_like(valid)
+    for j in range(values.shape[1]):
+        keep = valid[:, j]
+        group, column = codes[keep], values[keep, j]
+        counts = np.bincount(group, minlength=type_count)
+        quartiles = (
+            pd.Series(column).groupby(group).quantile([0.25, 0.75]).unstack()
+            .reindex(range(type_count)).to_numpy()
+        )
+        spread = factor * (quartiles[:, 1] - quartiles[:, 0])
+        low, high = quartiles[:, 0] - spread, quartiles[:, 1] + spread
+        checked = keep & (counts[codes] >= MIN_OUTLIER_GROUP)
+        outliers[:, j] = checked & ((values[:, j] < low[codes]) | (values[:, j] > high[codes]))
+    return outliers
+
+
+def _clean_summary(aggregates):
+    summary = aggregates.summary()
+    for field in ('avg_flowrate', 'avg_pressure', 'avg_temperature'):
+        summary[field] = _number(summary[field])
+    return summary
+
+
+def _mix(x):
+    """splitmix64 finalizer over a uint64 array"""
+    with np.errstate(over='ignore'):
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _row_hashes(name_hashes, codes, values):
+    # -0.0 and every NaN hash like 0.0 and one NaN
+    bits = np.where(np.isnan(values), np.nan, values + 0.0).view(np.uint64)
+    hashes = _mix(name_hashes ^ _mix(codes.astype(np.uint64)))
+    for j in range(values.shape[1]):
+        hashes = _mix(hashes ^ bits[:, j])
+    return hashes
+
+
+class QualityCheck:
+    """Per-row quality inputs of a dataset, collected chunk by chunk"""
+
+    def __init__(self):
+        self.types = {}
+        self.codes = []
+        self.values = []
+        self.missing = []
+        self.name_hashes = []
+
+    def update(self, chunk):
+        """Collect a parsed DataFrame chunk with every required column"""
+        chunk_codes, uniques = pd.factorize(chunk[TYPE_COLUMN])
+        lookup = [self.types.setdefault(value, len(self.types)) for value in uniques]
+        # Rows without a Type form one more group, looked up through code -1
+        lookup.append(self.types.setdefault(None, len(self.types)) if (chunk_codes < 0).any() else -1)
+        self.codes.append(np.array(lookup, dtype=np.int32)[chunk_codes])
+
+        values = chunk[NUMERIC_COLUMNS].to_numpy(dtype='float64', na_value=np.nan)
+        self.values.append(values)
+        names = chunk[NAME_COLUMN].to_numpy(dtype=object)
+        missing = [pd.isna(names), chunk_codes < 0] + [np.isnan(values[:, j]) for j in range(len(NUMERIC_COLUMNS))]
+        self.missing.append(np.stack(missing, axis=1))
+        self.name_hashes.append(pd.util.hash_array(names, categorize=False))
+
+    def report(self):
+        """The quality report of every row collected so far"""
+        method = settings.QUALITY_OUTLIER_METHOD
+        if method not in OUTLIER_METHODS:
+            raise ValueError(f'QUALITY_OUTLIER_METHOD must be one of: {", ".join(OUTLIER_METHODS)}')
+
+        types = list(self.types)
+        if self.codes:
+            codes, values = np.concatenate(self.codes), np.concatenate(self.values)
+            missing, name_hashes = np.concatenate(self.missing), np.concatenate(self.name_hashes)
+            # Keep one copy of the rows, not the chunks and their concatenation
+            self.codes, self.values, self.missing, self.name_hashes = [codes], [values], [missing], [name_hashes]
+        else:
+            codes = np.empty(0, dtype=np.int32)
+            values = np.empty((0, len(NUMERIC_COLUMNS)))
+            missing = np.empty((0, len(REQUIRED_COLUMNS)), dtype=bool)
+            name_hashes = np.empty(0, dtype=np.uint64)
+
+        lower, upper = _bounds(types, settings.QUALITY_RANGES)
+        out_of_range = (values < lower[codes]) | (values > upper[codes])
+        valid = ~np.isnan(values) & ~out_of_range
+        if method == 'zscore':
+            threshold = settings.QUALITY_ZSCORE_THRESHOLD
+            outliers = _zscore_outliers(values, codes, valid, len(types), threshold)
+        else:
+            threshold = settings.QUALITY_IQR_FACTOR
+            outliers = _iqr_outliers(values, codes, valid, len(types), threshold)
+
+        # Hash tables, not sorting, so duplicates cost linear time
+        duplicate_names = pd.Series(name_hashes).duplicated().to_numpy() & ~missing[:, 0]
+        duplicate_rows = pd.Series(_row_hashes(name_hashes, codes, values)).duplicated().to_numpy()
+
+        checks = {
+            'missing': missing.any(axis=1),
+            'range': out_of_range.any(axis=1),
+            'outlier': outliers.any(axis=1),
+            'duplicate_name': duplicate_names,
+            'duplicate_row': duplicate_rows,
+        }
+        flagged = np.zeros(len(codes), dtype=bool)
+        for rows in checks.values():
+            flagged |= rows
+
+        # Categorical Types, so grouping the clean rows needs no hashing
+        categories = [eq_type for eq_type in types if eq_type is not None]
+        type_codes = np.array([categories.index(t) if t is not None else -1 for t in types], dtype=np.int64)
+        keep = ~flagged
+        clean = RunningAggregates.from_frame(pd.DataFrame({
+            TYPE_COLUMN: pd.Categorical.from_codes(type_codes[codes[keep]], categories),
+            **{col: values[keep, j] for j, col in enumerate(NUMERIC_COLUMNS)},
+        }))
+
+        samples = []
+        for row in np.flatnonzero(flagged)[:MAX_SAMPLES].tolist():
+            issues = [f'missing:{col}' for j, col in enumerate(REQUIRED_COLUMNS) if missing[row, j]]
+            issues += [f'range:{col}' for j, col in enumerate(NUMERIC_COLUMNS) if out_of_range[row, j]]
+            issues += [f'outlier:{col}' for j, col in enumerate(NUMERIC_COLUMNS) if outliers[row, j]]
+            issues += [name for name in ('duplicate_name', 'duplicate_row') if checks[name][row]]
+            samples.append({'row': row, 'issues': issues})
+
+        rows_by_type = np.bincount(codes, minlength=len(types))
+        flagged_by_type = np.bincount(codes[flagged], minlength=len(types))
+        return {
+            'version': QUALITY_VERSION,
+            'rows': int(len(codes)),
+            'flagged_rows': int(flagged.sum()),
+            'outliers': {'method': method, 'threshold': threshold},
+            'checks': {
+                'missing': {
+                    'rows': int(checks['missing'].sum()),
+                    'columns': dict(zip(REQUIRED_COLUMNS, missing.sum(axis=0).tolist())),
+                },
+                'range': {
+                    'rows': int(checks['range'].sum()),
+                    'columns': dict(zip(NUMERIC_COLUMNS, out_of_range.sum(axis=0).tolist())),
+                },
+                'outlier': {
+                    'rows': int(checks['outlier'].sum()),
+                    'columns': dict(zip(NUMERIC_COLUMNS, outliers.sum(axis=0).tolist())),
+                },
+                'duplicate_name': {
+                    'rows': int(duplicate_names.sum()),
+                    'names': int(pd.unique(name_hashes[duplicate_names]).size),
+                },
+                'duplicate_row': {'rows': int(duplicate_rows.sum())},
+            },
+            'by_type': {
+                str(eq_type): {'rows': int(rows_by_type[i]), 'flagged': int(flagged_by_type[i])}
+                for i, eq_type in enumerate(types) if eq_type is not None
+            },
+            'samples': samples,
+            'clean': {'summary': _clean_summary(clean), 'statistics': clean.statistics()},
+        }
+
+
+def compute_quality(frames):
+    """Quality report of the rows in ``frames`` (DataFrames with every required column)"""
+    check = QualityCheck()
+    for frame in frames:
+        check.update(frame)
+    return check.report()
+
+
+def upload_quality(report):
+    """The part of a quality report returned with upload responses"""
+    return {
+        'pending': bool(report.get('pending')),
+        'flagged_rows': report.get('flagged_rows'),
+        'checks': {name: check['rows'] for name, check in report.get('checks', {}).items()},
+        'clean_summary': report.get('clean', {}).get('summary'),
+    }
+
+
+def get_quality(dataset):
+    """The dataset's quality report, computed now if missing or outdated"""
+    report = dataset.quality
+    if report and report.get('version') == QUALITY_VERSION:
+        return report
+    report = compute_quality(iter_frames(dataset))
+    # Stored quietly: the report does not change what any cached response says
+    Dataset.objects.filter(pk=dataset.pk, revision=dataset.revision).update(quality=report)
+    dataset.quality = report
+    return report
+
+
+def quality_response(dataset):
+    """Quality report with the summaries of all rows and of the unflagged rows"""
+    report = dict(get_quality(dataset))
+    clean = report.pop('clean')
+    report['summary'] = {
+        'all': {
+            'total_count': dataset.total_count,
+            'avg_flowrate': _number(dataset.avg_flowrate),
+            'avg_pressure': _number(dataset.avg_pressure),
+            'avg_temperature': _number(dataset.avg_temperature),
+            'type_distribution': dataset.type_distribution,
+        },
+        'clean': clean['summary'],
+    }
+    report['clean_statistics'] = clean['statistics']
+    return {'dataset_id': dataset.id, 'revision': dataset.revision, **report}
+
+
+def refresh_quality(dataset_id):
+    """Recheck a whole dataset after an append; skipped if a newer append raced us"""
+    dataset = Dataset.objects.filter(pk=dataset_id).first()
+    if dataset is None:
+        return
+    report = compute_quality(iter_frames(dataset))
+    if Dataset.objects.filter(pk=dataset_id, revision=dataset.revision).update(quality=report):
+        invalidate_user(dataset.user_id)
+
+
+def _refresh_quality_task(dataset_id):
+    close_old_connections()
+    try:
+        refresh_quality(dataset_id)
+    except Exception:
+        logger.exception('Refreshing the quality report of dataset %s failed', dataset_id)
+    finally:
+        connection.close()
+
+
+def schedule_quality_refresh(dataset):
+    """Recheck a dataset's quality in the background pool"""
+    dataset_id = dataset.id
+    transaction.on_commit(lambda: get_executor().submit(_refresh_quality_task, dataset_id), robust=True)
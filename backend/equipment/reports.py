@@ -0,0 +1,324 @@
+"""
+PDF report rendering with a storage-backed cache.
+
+A report is rendered once per dataset revision (bumped by appends),
+``REPORT_VERSION`` and mode and then served from ``default_storage``. Bump
+``REPORT_VERSION`` whenever the layout changes to invalidate old copies.
+
+The ``summary`` mode holds the summary scalars and the type table. The
+``full`` mode adds the charts and a listing of every row. The listing is
+built one page at a time from bounded chunks of the columnar copy and
+handed to ReportLab lazily, so the number of live flowables does not grow
+with the dataset.
+"""
+import logging
+import tempfile
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, connection, transaction
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import Flowable, PageBreak, SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+from .charts import evict_chart_data, get_chart_data, report_charts
+from .columnar import NAME_COLUMN, TYPE_COLUMN, iter_frames
+from .models import Dataset
+from .parsing import NUMERIC_COLUMNS
+from .storage import save_atomic
+from .workers import get_executor
+
+logger = logging.getLogger(__name__)
+
+REPORT_VERSION = 1
+REPORT_DIR = 'reports'
+REPORT_MODES = ('summary', 'full')
+
+# Row listing of the full report: rows are read in chunks of ROW_CHUNK_SIZE,
+# formatted as fixed-width lines and fed to ReportLab one page at a time
+ROW_CHUNK_SIZE = 5000
+ROWS_PER_PAGE = 51
+ROW_HEIGHT = 12
+TITLE_ROWS = 3
+ROW_FONT_SIZE = 7
+ROW_STRIPE = colors.HexColor('#F2F2F2')
+INDEX_WIDTH, NAME_WIDTH, TYPE_WIDTH, NUMBER_WIDTH = 7, 36, 16, 12
+ROW_HEADER = ' '.join(
+    [f'{"#":>{INDEX_WIDTH}}', f'{NAME_COLUMN:<{NAME_WIDTH}}', f'{TYPE_COLUMN:<{TYPE_WIDTH}}']
+    + [f'{col:>{NUMBER_WIDTH}}' for col in NUMERIC_COLUMNS]
+)
+
+
+def _suffix(mode):
+    return '' if mode == 'summary' else f'_{mode}'
+
+
+def report_name(dataset, mode='summary'):
+    """Storage name of the cached report for a dataset"""
+    return f'{REPORT_DIR}/dataset_{dataset.id}_r{dataset.revision}_v{REPORT_VERSION}{_suffix(mode)}.pdf'
+
+
+def report_etag(dataset, mode='summary'):
+    """Strong ETag identifying the report content"""
+    return f'"report-{dataset.id}-r{dataset.revision}-v{REPORT_VERSION}{_suffix(mode).replace("_", "-")}"'
+
+
+def report_filename(dataset, mode='summary'):
+    """Download filename of a report"""
+    return f'report_{dataset.id}{_suffix(mode)}.pdf'
+
+
+class FlowableFeed(list):
+    """Flowable list that pulls more from an iterable as ReportLab consumes it
+
+    ``BaseDocTemplate.build`` pops flowables off the front of its list, so
+    keeping only a few queued holds memory flat however long the document.
+    """
+
+    def __init__(self, flowables, low_water=8):
+        super().__init__()
+        self._source = iter(flowables)
+        self._low_water = low_water
+
+    def _fill(self):
+        while self._source is not None and list.__len__(self) < self._low_water:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                self._source = None
+
+    def __len__(self):
+        self._fill()
+        return list.__len__(self)
+
+    def __getitem__(self, index):
+        self._fill()
+        return list.__getitem__(self, index)
+
+
+class RowListing(Flowable):
+    """A page of dataset rows drawn as fixed-width text lines
+
+    ``Table`` lays out and draws every cell on its own, which dominates the
+    render time of large reports; a listing is one text line per row. The
+    first page also carries the section ``title``, so every listing fills
+    a page of its own and never has to be split.
+    """
+
+    def __init__(self, lines, title=None):
+        super().__init__()
+        self.lines = lines
+        self.title = title
+
+    def _title_rows(self):
+        return TITLE_ROWS if self.title else 0
+
+    def wrap(self, availWidth, availHeight):
+        self.width = availWidth
+        self.height = (self._title_rows() + len(self.lines) + 1) * ROW_HEIGHT
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        fit = int(availHeight // ROW_HEIGHT) - self._title_rows() - 1
+        if fit < 1:
+            return []
+        if fit >= len(self.lines):
+            return [self]
+        return [RowListing(self.lines[:fit], self.title), RowListing(self.lines[fit:])]
+
+    def draw(self):
+        canv = self.canv
+        canv.saveState()
+        top = self.height - self._title_rows() * ROW_HEIGHT
+        if self.title:
+            canv.setFont('Helvetica-Bold', 14)
+            canv.drawString(0, top + ROW_HEIGHT, self.title)
+        canv.setFillColor(colors.grey)
+        canv.rect(0, top - ROW_HEIGHT, self.width, ROW_HEIGHT, stroke=0, fill=1)
+        canv.setFillColor(ROW_STRIPE)
+        for i in range(1, len(self.lines), 2):
+            canv.rect(0, top - (i + 2) * ROW_HEIGHT, self.width, ROW_HEIGHT, stroke=0, fill=1)
+
+        text = canv.beginText(2, top - ROW_HEIGHT + 3)
+        text.setFont('Courier-Bold', ROW_FONT_SIZE, leading=ROW_HEIGHT)
+        text.setFillColor(colors.whitesmoke)
+        text.textLine(ROW_HEADER)
+        text.setFont('Courier', ROW_FONT_SIZE, leading=ROW_HEIGHT)
+        text.setFillColor(colors.black)
+        text.textLines(self.lines)
+        canv.drawText(text)
+        canv.restoreState()
+
+
+def _text(series, width):
+    values = series.astype(object).where(series.notna(), '').astype(str)
+    return values.str.slice(0, width).str.ljust(width)
+
+
+def _numbers(series):
+    values = series.to_numpy(dtype='float64', na_value=np.nan)
+    formatted = np.char.mod(f'%{NUMBER_WIDTH}.2f', values)
+    return pd.Series(np.where(np.isnan(values), ' ' * NUMBER_WIDTH, formatted), index=series.index)
+
+
+def format_rows(frame, offset):
+    """Fixed-width listing lines for a chunk of rows starting at row ``offset``"""
+    index = pd.Series(np.arange(offset + 1, offset + len(frame) + 1), index=frame.index)
+    lines = index.astype(str).str.rjust(INDEX_WIDTH)
+    lines = lines + ' ' + _text(frame[NAME_COLUMN], NAME_WIDTH) + ' ' + _text(frame[TYPE_COLUMN], TYPE_WIDTH)
+    for col in NUMERIC_COLUMNS:
+        lines = lines + ' ' + _numbers(frame[col])
+    return lines.tolist()
+
+
+def iter_row_pages(dataset, limit=None, title=None):
+    """One RowListing per page of dataset rows, built from bounded chunks"""
+    capacity = ROWS_PER_PAGE - (TITLE_ROWS if title else 0)
+    pending = []
+    offset = 0
+    for frame in iter_frames(dataset, [NAME_COLUMN, TYPE_COLUMN] + NUMERIC_COLUMNS, ROW_CHUNK_SIZE):
+        if limit is not None:
+            frame = frame.iloc[:max(limit - offset, 0)]
+            if frame.empty:
+                break
+        pending.extend(format_rows(frame, offset))
+        offset += len(frame)
+        start = 0
+        while len(pending) - start >= capacity:
+            yield RowListing(pending[start:start + capacity], title)
+            start += capacity
+            capacity, title = ROWS_PER_PAGE, None
+        pending = pending[start:]
+    if pending or title:
+        yield RowListing(pending, title)
+
+
+def summary_elements(dataset, styles):
+    """Flowables of the summary report"""
+    elements = []
+
+    # Title
+    title = Paragraph(
+        f"<b>Chemical Equipment Report</b><br/>{dataset.filename}",
+        styles['Title']
+    )
+    elements.append(title)
+    elements.append(Spacer(1, 0.3*inch))
+
+    # Summary section
+    summary_text = f"""
+    <b>Summary Statistics</b><br/>
+    Upload Date: {dataset.uploaded_at.strftime('%Y-%m-%d %H:%M')}<br/>
+    Total Equipment Count: {dataset.total_count}<br/>
+    Average Flowrate: {dataset.avg_flowrate:.2f}<br/>
+    Average Pressure: {dataset.avg_pressure:.2f}<br/>
+    Average Temperature: {dataset.avg_temperature:.2f}<br/>
+    """
+    elements.append(Paragraph(summary_text, styles['Normal']))
+    elements.append(Spacer(1, 0.3*inch))
+
+    # Type distribution table
+    elements.append(Paragraph("<b>Equipment Type Distribution</b>", styles['Heading2']))
+    elements.append(Spacer(1, 0.1*inch))
+
+    type_data = [['Equipment Type', 'Count']]
+    for eq_type, count in dataset.type_distribution.items():
+        type_data.append([eq_type, str(count)])
+
+    type_table = Table(type_data)
+    type_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+    elements.append(type_table)
+    return elements
+
+
+def build_summary_pdf(dataset, out):
+    """Render the summary report for ``dataset`` into the file-like ``out``"""
+    doc = SimpleDocTemplate(out, pagesize=letter)
+    doc.build(summary_elements(dataset, getSampleStyleSheet()))
+
+
+def build_full_pdf(dataset, out):
+    """Render the summary, charts and every row of ``dataset`` into ``out``"""
+    doc = SimpleDocTemplate(out, pagesize=letter, pageCompression=1)
+    styles = getSampleStyleSheet()
+    elements = summary_elements(dataset, styles)
+
+    # Charts
+    elements.append(PageBreak())
+    elements.append(Paragraph("<b>Charts</b>", styles['Heading2']))
+    pie, bar, *distributions = report_charts(get_chart_data(dataset))
+    elements.append(Table([[pie, bar]]))
+    for drawing in distributions:
+        elements.append(Spacer(1, 0.15*inch))
+        elements.append(drawing)
+
+    # All rows
+    limit = settings.REPORT_MAX_ROWS
+    elements.append(PageBreak())
+    title = 'Equipment Data'
+    if limit is not None and dataset.total_count > limit:
+        title += f' (first {limit} of {dataset.total_count} rows)'
+
+    doc.build(FlowableFeed(chain(elements, iter_row_pages(dataset, limit, title))))
+
+
+BUILDERS = {
+    'summary': build_summary_pdf,
+    'full': build_full_pdf,
+}
+
+
+def get_or_render(dataset, mode='summary'):
+    """Return the storage name of the dataset's report, rendering it if needed"""
+    name = report_name(dataset, mode)
+    if default_storage.exists(name):
+        return name
+
+    # Published only once complete, so a concurrent download never sees a partial PDF
+    with tempfile.SpooledTemporaryFile(max_size=4 * 1024 * 1024) as out:
+        BUILDERS[mode](dataset, out)
+        save_atomic(name, File(out, name=name))
+    return name
+
+
+def _prerender(dataset_id):
+    close_old_connections()
+    try:
+        dataset = Dataset.objects.filter(pk=dataset_id).first()
+        if dataset is not None:
+            get_or_render(dataset)
+    except Exception:
+        logger.exception('Pre-rendering report for dataset %s failed', dataset_id)
+    finally:
+        connection.close()
+
+
+def schedule_prerender(dataset):
+    """Render the report in the background pool if REPORT_PRERENDER is enabled"""
+    if settings.REPORT_PRERENDER:
+        dataset_id = dataset.id
+        transaction.on_commit(lambda: get_executor().submit(_prerender, dataset_id), robust=True)
+
+
+def evict_reports(dataset_id, revision):
+    """Delete every cached report version and mode of a dataset revision"""
+    for version in range(1, REPORT_VERSION + 1):
+        for mode in REPORT_MODES:
+            default_storage.delete(f'{REPORT_DIR}/dataset_{dataset_id}_r{revision}_v{version}{_suffix(mode)}.pdf')
+    evict_chart_data(dataset_id, revision)
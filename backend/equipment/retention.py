@@ -0,0 +1,135 @@
+"""
+Per-user dataset retention.
+
+A user keeps at most ``max_count`` datasets, none older than
+``max_age_days`` and at most ``max_bytes`` of uploaded CSV. The defaults
+come from the ``DATASET_RETENTION_*`` settings and a ``RetentionPolicy``
+overrides them per user. Expired datasets are removed with one bulk
+``QuerySet.delete()`` (segments and readings cascade in the same
+statement batch), and their stored files are released afterwards in one
+batch. Uploads only schedule this work; it runs in the background pool or
+in ``manage.py apply_retention``.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .blobstore import release_many
+from .caching import invalidate_user
+from .models import Dataset, DatasetSegment, RetentionPolicy
+from .reports import evict_reports
+from .workers import get_executor
+
+logger = logging.getLogger(__name__)
+
+
+def get_policy(user_id):
+    """Effective {max_count, max_age_days, max_bytes} for a user; None means no limit"""
+    policy = {
+        'max_count': settings.DATASET_RETENTION_COUNT,
+        'max_age_days': settings.DATASET_RETENTION_DAYS,
+        'max_bytes': settings.DATASET_RETENTION_BYTES,
+    }
+    override = RetentionPolicy.objects.filter(user_id=user_id).first()
+    if override is not None:
+        for key in policy:
+            if getattr(override, key) is not None:
+                policy[key] = getattr(override, key)
+    return policy
+
+
+def select_expired(user_id, policy=None, now=None):
+    """Ids of the user's datasets that fall outside the retention policy"""
+    policy = policy or get_policy(user_id)
+    now = now or timezone.now()
+    rows = list(
+        Dataset.objects.filter(user_id=user_id)
+        .order_by('-uploaded_at', '-id')
+        .values_list('id', 'uploaded_at', 'file_size')
+    )
+
+    expired = set()
+    if policy['max_count'] is not None:
+        expired.update(dataset_id for dataset_id, _, _ in rows[policy['max_count']:])
+    if policy['max_age_days'] is not None:
+        cutoff = now - timedelta(days=policy['max_age_days'])
+        expired.update(dataset_id for dataset_id, uploaded_at, _ in rows if uploaded_at < cutoff)
+    if policy['max_bytes'] is not None:
+        total = 0
+        for index, (dataset_id, _, size) in enumerate(rows):
+            total += size
+            # The newest dataset is kept even if it alone exceeds the budget
+            if index and total > policy['max_bytes']:
+                expired.add(dataset_id)
+    return sorted(expired)
+
+
+def _release(csv_names, columns_paths, revisions):
+    release_many(csv_names, columns_paths)
+    for dataset_id, revision in revisions:
+        evict_reports(dataset_id, revision)
+
+
+def expire_datasets(dataset_ids):
+    """Bulk delete datasets, then release their unshared files; returns the number deleted"""
+    dataset_ids = list(dataset_ids)
+    if not dataset_ids:
+        return 0
+
+    csv_names, columns_paths, revisions, user_ids = set(), set(), [], set()
+    for dataset_id, user_id, revision, csv_file, columns_path in Dataset.objects.filter(
+        id__in=dataset_ids
+    ).values_list('id', 'user_id', 'revision', 'csv_file', 'columns_path'):
+        revisions.append((dataset_id, revision))
+        user_ids.add(user_id)
+        csv_names.add(csv_file)
+        columns_paths.add(columns_path)
+    for csv_file, columns_path in DatasetSegment.objects.filter(
+        dataset_id__in=dataset_ids
+    ).values_list('csv_file', 'columns_path'):
+        csv_names.add(csv_file)
+        columns_paths.add(columns_path)
+
+    with transaction.atomic():
+        _, per_model = Dataset.objects.filter(id__in=dataset_ids).delete()
+        for user_id in user_ids:
+            invalidate_user(user_id)
+        # Files go only once the rows are gone for good
+        transaction.on_commit(lambda: _release(csv_names, columns_paths, revisions), robust=True)
+    return per_model.get(Dataset._meta.label, 0)
+
+
+def apply_retention(user_id):
+    """Enforce the retention policy for one user; returns the number of datasets removed"""
+    return expire_datasets(select_expired(user_id))
+
+
+def _retention_task(user_id):
+    close_old_connections()
+    try:
+        apply_retention(user_id)
+    except Exception:
+        logger.exception('Applying retention for user %s failed', user_id)
+    finally:
+        connection.close()
+
+
+def schedule_retention(user):
+    """Enforce retention in the background pool once the current transaction commits"""
+    if settings.RETENTION_IN_PROCESS:
+        user_id = user.id
+        transaction.on_commit(lambda: get_executor().submit(_retention_task, user_id), robust=True)
+
+
+def sweep(dry_run=False):
+    """Apply retention to every user with datasets; yields (user_id, expired ids)"""
+    user_ids = User.objects.filter(datasets__isnull=False).distinct().values_list('id', flat=True)
+    for user_id in user_ids.iterator():
+        expired = select_expired(user_id)
+        if expired and not dry_run:
+            expire_datasets(expired)
+        yield user_id, expired
@@ -0,0 +1,178 @@
+"""
+Paginated, columnar access to the rows of a stored dataset.
+
+Pages are encoded one array per column (``{"columns": [...], "values":
+[[...], ...]}``) so column names are not repeated on every row, and are
+addressed by an opaque cursor instead of page numbers. Unfiltered pages
+are read from the columnar copy; filtered or sorted pages are queried from
+the stored ``EquipmentReading`` rows (see ``readings.py``). Both encode a
+numeric column the same way: as integers when every value of the dataset
+is a whole number, as floats otherwise.
+"""
+import base64
+import binascii
+import json
+import math
+
+import numpy as np
+import pandas as pd
+
+from .columnar import integral_columns, load_frame
+from .parsing import NUMERIC_COLUMNS, REQUIRED_COLUMNS
+from .readings import FIELD_FOR_COLUMN, is_query, query_readings
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+
+
+def encode_cursor(offset):
+    """Encode a row offset as an opaque cursor string"""
+    raw = json.dumps({'o': offset}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor; raises ValueError if invalid"""
+    if not cursor:
+        return 0
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        offset = json.loads(base64.urlsafe_b64decode(padded))['o']
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(offset, int) or offset < 0:
+        raise ValueError('Invalid cursor')
+    return offset
+
+
+def parse_columns(value):
+    """Parse a comma separated ?columns= projection; empty means all columns"""
+    if not value:
+        return list(REQUIRED_COLUMNS)
+    columns = [col.strip() for col in value.split(',') if col.strip()]
+    unknown = [col for col in columns if col not in REQUIRED_COLUMNS]
+    if unknown:
+        raise ValueError(f'Unknown columns: {", ".join(unknown)}')
+    return columns
+
+
+def encode_numbers(values, integral=False):
+    """JSON-safe numbers: None for missing (and infinite) values, ints if ``integral``, floats otherwise"""
+    return [None if v is None or not math.isfinite(v) else int(v) if integral else float(v) for v in values]
+
+
+def to_columnar(frame, integral=None):
+    """
+    Encode a DataFrame as one JSON-safe array per column. Numeric columns
+    follow their dtype, or with ``integral`` given are ints for the columns
+    in it and floats for the others.
+    """
+    values = []
+    for col in frame.columns:
+        series = frame[col]
+        if integral is not None and col in NUMERIC_COLUMNS:
+            values.append(encode_numbers(series.to_numpy(dtype='float64', na_value=np.nan).tolist(), col in integral))
+        elif pd.api.types.is_float_dtype(series):
+            values.append([None if math.isnan(v) else v for v in series.tolist()])
+        else:
+            values.append([None if pd.isna(v) else v for v in series.tolist()])
+    return {'columns': list(frame.columns), 'values': values}
+
+
+def to_records(frame, integral=None):
+    """Encode a DataFrame as JSON-safe row dicts"""
+    encoded = to_columnar(frame, integral)
+    return [dict(zip(encoded['columns'], row)) for row in zip(*encoded['values'])]
+
+
+def integral_records(records, integral):
+    """
+    Turn the ``integral`` columns of float-encoded records (``to_records(frame,
+    ())``) into ints, in place, for records collected before those were known.
+    """
+    if integral:
+        for record in records:
+            for col in integral:
+                record[col] = int(record[col])
+    return records
+
+
+def build_page(dataset, cursor=None, limit=DEFAULT_PAGE_SIZE, columns=None):
+    """Return one columnar page of rows plus the cursor for the next page"""
+    offset = decode_cursor(cursor)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    columns = columns or list(REQUIRED_COLUMNS)
+
+    frame = load_frame(dataset, columns, offset, offset + limit)
+    end = offset + len(frame)
+    payload = to_columnar(frame, integral_columns(dataset))
+    payload.update({
+        'count': len(frame),
+        'total_count': dataset.total_count,
+        'next_cursor': encode_cursor(end) if end < dataset.total_count else None,
+    })
+    return payload
+
+
+def build_query_page(dataset, queryset, cursor=None, limit=DEFAULT_PAGE_SIZE, columns=None):
+    """Like build_page, but for a filtered/ordered EquipmentReading queryset"""
+    offset = decode_cursor(cursor)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    columns = columns or list(REQUIRED_COLUMNS)
+
+    # Fetch one extra row to know whether another page follows
+    fields = [FIELD_FOR_COLUMN[col] for col in columns]
+    records = list(queryset.values_list(*fields)[offset:offset + limit + 1])
+    has_next = len(records) > limit
+    records = records[:limit]
+    values = [list(column) for column in zip(*records)] if records else [[] for _ in columns]
+    # Readings store every number as a float; encoded like the columnar pages
+    integral = integral_columns(dataset)
+    for i, col in enumerate(columns):
+        if col in NUMERIC_COLUMNS:
+            values[i] = encode_numbers(values[i], col in integral)
+    return {
+        'columns': columns,
+        'values': values,
+        'count': len(records),
+        'total_count': queryset.count(),
+        'next_cursor': encode_cursor(offset + len(records)) if has_next else None,
+    }
+
+
+def parse_offset(value):
+    """Parse ?offset=, the row to start at when no cursor is given"""
+    try:
+        offset = int(value)
+    except ValueError:
+        offset = -1
+    if offset < 0:
+        raise ValueError('offset must be a non-negative integer')
+    return offset
+
+
+def parse_limit(value):
+    """Parse ?limit=, the rows per page; more than MAX_PAGE_SIZE is capped later"""
+    if value in (None, ''):
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        raise ValueError('limit must be a positive integer')
+    return limit
+
+
+def page_for_params(dataset, params):
+    """The rows page requested by query parameters; raises ValueError on bad input"""
+    columns = parse_columns(params.get('columns'))
+    limit = parse_limit(params.get('limit'))
+    cursor = params.get('cursor')
+    if not cursor and params.get('offset'):
+        # Random access for clients that jump around (e.g. a scrolled table view)
+        cursor = encode_cursor(parse_offset(params['offset']))
+    if is_query(params):
+        # Filters and ordering run in the database on the indexed readings
+        return build_query_page(dataset, query_readings(dataset, params), cursor, limit, columns)
+    return build_page(dataset, cursor, limit, columns)
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Dataset
+from .models import Dataset, UploadJob
 
 
 class DatasetSerializer(serializers.ModelSerializer):
@@ -15,9 +15,12 @@ class DatasetSerializer(serializers.ModelSerializer):
             'avg_flowrate',
             'avg_pressure',
             'avg_temperature',
-            'type_distribution'
+            'type_distribution',
+            'statistics',
+            'parse_report',
+            'revision'
         ]
-        read_only_fields = ['id', 'uploaded_at']
+        read_only_fields = ['id', 'uploaded_at', 'statistics', 'parse_report', 'revision']
 
 
 class UploadResponseSerializer(serializers.Serializer):
@@ -26,3 +29,27 @@ class UploadResponseSerializer(serializers.Serializer):
     dataset_id = serializers.IntegerField()
     summary = serializers.DictField()
     data = serializers.ListField()
+
+
+class UploadJobSerializer(serializers.ModelSerializer):
+    """Serializer for background upload job status"""
+    progress = serializers.FloatField(read_only=True)
+    dataset_id = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = UploadJob
+        fields = [
+            'id',
+            'filename',
+            'status',
+            'progress',
+            'bytes_total',
+            'bytes_processed',
+            'rows_processed',
+            'dataset_id',
+            'error',
+            'created_at',
+            'started_at',
+            'finished_at'
+        ]
+        read_only_fields = fields
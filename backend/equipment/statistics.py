@@ -0,0 +1,348 @@
+"""
+Descriptive statistics for equipment datasets.
+
+Everything except the quantiles is derived from ``RunningAggregates``:
+per-column count/sum/M2/min/max, per-Type moments and pairwise co-moments.
+These merge exactly (Chan et al.), so ingestion builds them chunk by chunk
+and appends fold new rows in without touching the old ones. Quantiles need
+the full data, so they are computed from the columnar copy in the
+background after an upload or append (``quantiles_pending`` until then).
+Results are stored on the ``Dataset`` so requests never recompute them.
+"""
+import logging
+import math
+import warnings
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from django.db import close_old_connections, connection, transaction
+
+from .caching import invalidate_user
+from .columnar import iter_frames
+from .models import Dataset
+from .parsing import NUMERIC_COLUMNS, IngestError
+from .workers import get_executor
+
+logger = logging.getLogger(__name__)
+
+QUANTILES = {'p50': 0.5, 'p90': 0.9, 'p99': 0.99}
+PAIRS = list(combinations(range(len(NUMERIC_COLUMNS)), 2))
+
+
+def _number(value):
+    """JSON-safe float: NaN, infinities and None become None"""
+    if value is None:
+        return None
+    value = float(value)
+    return None if math.isnan(value) or math.isinf(value) else value
+
+
+def _empty_moments():
+    return {'count': 0, 'sum': 0.0, 'm2': 0.0, 'min': None, 'max': None}
+
+
+def _merge_moments(a, b):
+    """Combine two {count, sum, m2, min, max} dicts (parallel variance)"""
+    if not b['count']:
+        return dict(a)
+    if not a['count']:
+        return dict(b)
+    n = a['count'] + b['count']
+    delta = b['sum'] / b['count'] - a['sum'] / a['count']
+    return {
+        'count': n,
+        'sum': a['sum'] + b['sum'],
+        'm2': a['m2'] + b['m2'] + delta * delta * a['count'] * b['count'] / n,
+        'min': min(a['min'], b['min']),
+        'max': max(a['max'], b['max']),
+    }
+
+
+def _merge_pair(a, b):
+    """Combine two co-moment dicts {n, mean_x, mean_y, m2_x, m2_y, c}"""
+    if not b['n']:
+        return dict(a)
+    if not a['n']:
+        return dict(b)
+    n = a['n'] + b['n']
+    dx = b['mean_x'] - a['mean_x']
+    dy = b['mean_y'] - a['mean_y']
+    weight = a['n'] * b['n'] / n
+    return {
+        'n': n,
+        'mean_x': a['mean_x'] + dx * b['n'] / n,
+        'mean_y': a['mean_y'] + dy * b['n'] / n,
+        'm2_x': a['m2_x'] + b['m2_x'] + dx * dx * weight,
+        'm2_y': a['m2_y'] + b['m2_y'] + dy * dy * weight,
+        'c': a['c'] + b['c'] + dx * dy * weight,
+    }
+
+
+def _std(moments):
+    if moments['count'] < 2:
+        return None
+    return _number(math.sqrt(max(moments['m2'], 0.0) / (moments['count'] - 1)))
+
+
+def _mean(moments):
+    return moments['sum'] / moments['count'] if moments['count'] else None
+
+
+class RunningAggregates:
+    """Mergeable count/sum/M2 aggregates for a dataset, built chunk by chunk"""
+
+    def __init__(self):
+        self.total_count = 0
+        self.columns = {col: _empty_moments() for col in NUMERIC_COLUMNS}
+        self.pairs = {
+            f'{NUMERIC_COLUMNS[i]},{NUMERIC_COLUMNS[j]}': {
+                'n': 0, 'mean_x': 0.0, 'mean_y': 0.0, 'm2_x': 0.0, 'm2_y': 0.0, 'c': 0.0
+            }
+            for i, j in PAIRS
+        }
+        self.types = {}
+
+    @classmethod
+    def from_dict(cls, data):
+        aggregates = cls()
+        aggregates.total_count = data['total_count']
+        aggregates.columns = {col: dict(m) for col, m in data['columns'].items()}
+        aggregates.pairs = {key: dict(p) for key, p in data['pairs'].items()}
+        aggregates.types = {
+            eq_type: {'count': entry['count'], 'columns': {c: dict(m) for c, m in entry['columns'].items()}}
+            for eq_type, entry in data['types'].items()
+        }
+        return aggregates
+
+    def to_dict(self):
+        return {
+            'total_count': self.total_count,
+            'columns': self.columns,
+            'pairs': self.pairs,
+            'types': self.types,
+        }
+
+    def update(self, chunk):
+        """Fold a parsed DataFrame chunk into the aggregates"""
+        for col in NUMERIC_COLUMNS:
+            if not pd.api.types.is_numeric_dtype(chunk[col]):
+                raise IngestError(f'Column "{col}" must be numeric')
+        self.merge(self.from_frame(chunk))
+
+    @classmethod
+    def from_frame(cls, frame):
+        """Aggregates of a single frame, computed with vectorized operations"""
+        aggregates = cls()
+        aggregates.total_count = len(frame)
+        values = frame[NUMERIC_COLUMNS].to_numpy(dtype='float64', na_value=np.nan)
+        valid = ~np.isnan(values)
+        counts = valid.sum(axis=0)
+
+        with warnings.catch_warnings():
+            # All-NaN columns are skipped below via their zero count
+            warnings.simplefilter('ignore', RuntimeWarning)
+            sums = np.nansum(values, axis=0)
+            means = sums / np.maximum(counts, 1)
+            m2 = np.nansum((values - means) ** 2, axis=0)
+            minimums = np.nanmin(values, axis=0) if len(values) else np.full(len(NUMERIC_COLUMNS), np.nan)
+            maximums = np.nanmax(values, axis=0) if len(values) else np.full(len(NUMERIC_COLUMNS), np.nan)
+
+        for i, col in enumerate(NUMERIC_COLUMNS):
+            if counts[i]:
+                aggregates.columns[col] = {
+                    'count': int(counts[i]), 'sum': float(sums[i]), 'm2': float(m2[i]),
+                    'min': float(minimums[i]), 'max': float(maximums[i]),
+                }
+
+        for i, j in PAIRS:
+            both = valid[:, i] & valid[:, j]
+            n = int(both.sum())
+            if not n:
+                continue
+            x = values[both, i]
+            y = values[both, j]
+            dx = x - x.mean()
+            dy = y - y.mean()
+            aggregates.pairs[f'{NUMERIC_COLUMNS[i]},{NUMERIC_COLUMNS[j]}'] = {
+                'n': n, 'mean_x': float(x.mean()), 'mean_y': float(y.mean()),
+                'm2_x': float(dx @ dx), 'm2_y': float(dy @ dy), 'c': float(dx @ dy),
+            }
+
+        # observed: a categorical Type must not yield its unused categories
+        grouped = frame.groupby('Type', sort=False, observed=True)
+        sizes = grouped.size()
+        table = grouped[NUMERIC_COLUMNS].agg(['count', 'sum', 'min', 'max', 'var'])
+        for eq_type, row in table.iterrows():
+            entry = {'count': int(sizes[eq_type]), 'columns': {}}
+            for col in NUMERIC_COLUMNS:
+                count = int(row[(col, 'count')])
+                if not count:
+                    entry['columns'][col] = _empty_moments()
+                    continue
+                var = row[(col, 'var')]
+                entry['columns'][col] = {
+                    'count': count,
+                    'sum': float(row[(col, 'sum')]),
+                    'm2': 0.0 if count < 2 or pd.isna(var) else float(var) * (count - 1),
+                    'min': float(row[(col, 'min')]),
+                    'max': float(row[(col, 'max')]),
+                }
+            # JSON object keys are strings, so stored and fresh aggregates must agree
+            aggregates.types[str(eq_type)] = entry
+        return aggregates
+
+    def merge(self, other):
+        """Fold another RunningAggregates into this one in O(columns + types)"""
+        self.total_count += other.total_count
+        for col in NUMERIC_COLUMNS:
+            self.columns[col] = _merge_moments(self.columns[col], other.columns[col])
+        for key in self.pairs:
+            self.pairs[key] = _merge_pair(self.pairs[key], other.pairs[key])
+        for eq_type, entry in other.types.items():
+            mine = self.types.get(eq_type)
+            if mine is None:
+                self.types[eq_type] = {
+                    'count': entry['count'],
+                    'columns': {c: dict(m) for c, m in entry['columns'].items()},
+                }
+                continue
+            mine['count'] += entry['count']
+            for col in NUMERIC_COLUMNS:
+                mine['columns'][col] = _merge_moments(mine['columns'][col], entry['columns'][col])
+        return self
+
+    def mean(self, col):
+        mean = _mean(self.columns[col])
+        return float('nan') if mean is None else mean
+
+    def summary(self):
+        """The scalar Dataset summary fields"""
+        # Same ordering as value_counts(): most frequent type first
+        type_distribution = dict(sorted(
+            ((eq_type, entry['count']) for eq_type, entry in self.types.items()),
+            key=lambda item: item[1], reverse=True
+        ))
+        return {
+            'total_count': self.total_count,
+            'avg_flowrate': self.mean('Flowrate'),
+            'avg_pressure': self.mean('Pressure'),
+            'avg_temperature': self.mean('Temperature'),
+            'type_distribution': type_distribution,
+        }
+
+    def correlation(self):
+        size = len(NUMERIC_COLUMNS)
+        matrix = [[None] * size for _ in range(size)]
+        for i, col in enumerate(NUMERIC_COLUMNS):
+            moments = self.columns[col]
+            if moments['count'] > 1 and moments['m2'] > 0:
+                matrix[i][i] = 1.0
+        for i, j in PAIRS:
+            pair = self.pairs[f'{NUMERIC_COLUMNS[i]},{NUMERIC_COLUMNS[j]}']
+            if pair['n'] > 1 and pair['m2_x'] > 0 and pair['m2_y'] > 0:
+                value = _number(pair['c'] / math.sqrt(pair['m2_x'] * pair['m2_y']))
+                matrix[i][j] = matrix[j][i] = value
+        return {'columns': list(NUMERIC_COLUMNS), 'matrix': matrix}
+
+    def statistics(self, quantiles=None):
+        """Statistics dict; ``quantiles`` maps column -> {p50, p90, p99}"""
+        columns = {}
+        for col in NUMERIC_COLUMNS:
+            moments = self.columns[col]
+            columns[col] = {
+                'count': moments['count'],
+                'min': _number(moments['min']),
+                'max': _number(moments['max']),
+                'mean': _number(_mean(moments)),
+                'std': _std(moments),
+            }
+            columns[col].update((quantiles or {}).get(col, {key: None for key in QUANTILES}))
+
+        by_type = {}
+        for eq_type, entry in self.types.items():
+            by_type[str(eq_type)] = {'count': entry['count']}
+            for col in NUMERIC_COLUMNS:
+                moments = entry['columns'][col]
+                by_type[str(eq_type)][col] = {
+                    'mean': _number(_mean(moments)),
+                    'min': _number(moments['min']),
+                    'max': _number(moments['max']),
+                    'std': _std(moments),
+                }
+
+        return {
+            'columns': columns,
+            'by_type': by_type,
+            'correlation': self.correlation(),
+        }
+
+
+def compute_quantiles(values):
+    """{column: {p50, p90, p99}} of an (n, k) float array in one vectorized call"""
+    if len(values):
+        with warnings.catch_warnings():
+            # All-NaN columns yield NaN results, which _number maps to None
+            warnings.simplefilter('ignore', RuntimeWarning)
+            result = np.nanquantile(values, list(QUANTILES.values()), axis=0)
+    else:
+        result = np.full((len(QUANTILES), len(NUMERIC_COLUMNS)), np.nan)
+    return {
+        col: {key: _number(result[j, i]) for j, key in enumerate(QUANTILES)}
+        for i, col in enumerate(NUMERIC_COLUMNS)
+    }
+
+
+def dataset_quantiles(dataset):
+    """Quantiles over every row of a dataset, read from its columnar copy"""
+    frames = list(iter_frames(dataset, NUMERIC_COLUMNS))
+    values = np.concatenate(
+        [frame.to_numpy(dtype='float64', na_value=np.nan) for frame in frames]
+    ) if frames else np.empty((0, len(NUMERIC_COLUMNS)))
+    return compute_quantiles(values)
+
+
+def compute_statistics(frame):
+    """Full statistics dict for a frame with Type and the numeric columns"""
+    values = frame[NUMERIC_COLUMNS].to_numpy(dtype='float64', na_value=np.nan)
+    return RunningAggregates.from_frame(frame).statistics(compute_quantiles(values))
+
+
+def full_statistics(dataset):
+    """(aggregates, statistics) for a dataset, recomputed from its stored data"""
+    aggregates = RunningAggregates()
+    for frame in iter_frames(dataset, ['Type'] + NUMERIC_COLUMNS):
+        aggregates.update(frame)
+    return aggregates, aggregates.statistics(dataset_quantiles(dataset))
+
+
+def refresh_quantiles(dataset_id):
+    """Recompute quantiles after an append; skipped if a newer append raced us"""
+    dataset = Dataset.objects.filter(pk=dataset_id).first()
+    if dataset is None:
+        return
+    statistics = dict(dataset.statistics)
+    for col, values in dataset_quantiles(dataset).items():
+        statistics['columns'][col].update(values)
+    statistics.pop('quantiles_pending', None)
+    # Appends bump the revision and schedule their own refresh, so a
+    # single conditional UPDATE is enough (and never upgrades a read lock)
+    if Dataset.objects.filter(pk=dataset_id, revision=dataset.revision).update(statistics=statistics):
+        invalidate_user(dataset.user_id)
+
+
+def _refresh_quantiles_task(dataset_id):
+    close_old_connections()
+    try:
+        refresh_quantiles(dataset_id)
+    except Exception:
+        logger.exception('Refreshing quantiles for dataset %s failed', dataset_id)
+    finally:
+        connection.close()
+
+
+def schedule_quantile_refresh(dataset):
+    """Recompute a dataset's quantiles in the background pool"""
+    dataset_id = dataset.id
+    transaction.on_commit(lambda: get_executor().submit(_refresh_quantiles_task, dataset_id), robust=True)
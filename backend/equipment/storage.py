@@ -0,0 +1,45 @@
+"""
+Atomic writes of derived files (reports, chart data) to storage.
+
+Cached files are looked up by name, so a name must never point at a file
+that is still being written: a reader would take the partial file for the
+finished one. On the local filesystem the content is written under a
+temporary name in the target directory and renamed into place, which is
+atomic; storages without local paths (object stores) make an object
+visible only once its upload completes.
+"""
+import os
+import tempfile
+
+from django.core.files.storage import default_storage
+
+PARTIAL_SUFFIX = '.partial'
+
+
+def save_atomic(name, content, storage=default_storage):
+    """Store ``content`` (a File) under exactly ``name``, replacing any file there"""
+    try:
+        path = storage.path(name)
+    except NotImplementedError:
+        saved = storage.save(name, content)
+        if saved != name:
+            # A concurrent writer stored the same name first; its copy is as good
+            storage.delete(saved)
+        return name
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, partial = tempfile.mkstemp(dir=directory, prefix='.', suffix=PARTIAL_SUFFIX)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            if hasattr(content, 'seek'):
+                content.seek(0)
+            for chunk in content.chunks():
+                out.write(chunk)
+        os.chmod(partial, storage.file_permissions_mode or 0o644)
+        os.replace(partial, path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.unlink(partial)
+        raise
+    return name
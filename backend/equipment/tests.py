@@ -0,0 +1,78 @@
+import io
+import json
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import AsyncClient, TransactionTestCase, override_settings
+from django.urls import path
+
+from . import async_views
+from .ingest import create_dataset
+
+try:
+    import pyarrow.parquet as pa_parquet
+except ImportError:
+    pa_parquet = None
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+SAMPLE_CSV = (
+    b'Equipment Name,Type,Flowrate,Pressure,Temperature\n'
+    b'Pump-1,Pump,120,5.2,110\n'
+    b'Valve-1,Valve,60,4.1,105\n'
+    b'Reactor-1,Reactor,150,7.5,\n'
+)
+
+# The endpoints served under ASGI (config/asgi.py turns ASYNC_VIEWS on)
+urlpatterns = [
+    path('api/datasets/<int:pk>/export/', async_views.export),
+]
+
+
+@override_settings(ROOT_URLCONF=__name__, REPORT_PRERENDER=False, RETENTION_IN_PROCESS=False)
+class AsyncExportTests(TransactionTestCase):
+    """Exports through the async view, which builds the stream on the event loop"""
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings = self.settings(MEDIA_ROOT=media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.user = User.objects.create_user('exporter', password='secret')
+        self.dataset = create_dataset(self.user, SimpleUploadedFile('sample.csv', SAMPLE_CSV), 'sample.csv')
+        self.client = AsyncClient()
+        self.client.force_login(self.user)
+
+    async def export(self, fmt):
+        response = await self.client.get(f'/api/datasets/{self.dataset.id}/export/?format={fmt}')
+        self.assertEqual(response.status_code, 200)
+        return b''.join([chunk async for chunk in response.streaming_content])
+
+    async def test_csv(self):
+        body = await self.export('csv')
+        self.assertEqual(len(body.decode().splitlines()), 4)
+
+    async def test_json(self):
+        records = json.loads(await self.export('json'))
+        self.assertEqual(len(records), 3)
+        self.assertEqual(records[0]['Flowrate'], 120)
+        self.assertIsNone(records[2]['Temperature'])
+
+    async def test_parquet(self):
+        if pa_parquet is None:
+            self.skipTest('pyarrow is not installed')
+        table = pa_parquet.read_table(io.BytesIO(await self.export('parquet')))
+        self.assertEqual(table.num_rows, 3)
+
+    async def test_xlsx(self):
+        if openpyxl is None:
+            self.skipTest('openpyxl is not installed')
+        sheet = openpyxl.load_workbook(io.BytesIO(await self.export('xlsx'))).active
+        self.assertEqual(sheet.max_row, 4)
@@ -0,0 +1,37 @@
+"""
+Upload handlers that SHA-256 hash file uploads while they stream in.
+
+The digest is attached to the resulting UploadedFile as ``content_hash`` so
+the ingestion pipeline can look up identical content without another pass.
+"""
+import hashlib
+
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+
+class HashingUploadMixin:
+    def new_file(self, *args, **kwargs):
+        # Set before super(), which may raise StopFutureHandlers
+        self.hasher = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        passed_on = super().receive_data_chunk(raw_data, start)
+        if passed_on is None:
+            # This handler consumed the chunk
+            self.hasher.update(raw_data)
+        return passed_on
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        if uploaded is not None:
+            uploaded.content_hash = self.hasher.hexdigest()
+        return uploaded
+
+
+class HashingMemoryFileUploadHandler(HashingUploadMixin, MemoryFileUploadHandler):
+    """In-memory upload handler that records a SHA-256 digest"""
+
+
+class HashingTemporaryFileUploadHandler(HashingUploadMixin, TemporaryFileUploadHandler):
+    """Temporary-file upload handler that records a SHA-256 digest"""
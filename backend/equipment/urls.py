@@ -1,11 +1,24 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import DatasetViewSet, register_user, login_user, get_csrf_token
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'datasets', DatasetViewSet, basename='dataset')
 
-urlpatterns = [
+urlpatterns = []
+
+# Under ASGI the I/O-heavy endpoints are served by async views (same URLs)
+if settings.ASYNC_VIEWS:
+    urlpatterns += [
+        path('datasets/upload/', async_views.upload, name='dataset-upload-async'),
+        path('datasets/<int:pk>/download_pdf/', async_views.download_pdf, name='dataset-download-pdf-async'),
+        path('datasets/<int:pk>/rows/', async_views.rows, name='dataset-rows-async'),
+        path('datasets/<int:pk>/export/', async_views.export, name='dataset-export-async'),
+    ]
+
+urlpatterns += [
     path('', include(router.urls)),
     path('auth/register/', register_user, name='register'),
     path('auth/login/', login_user, name='login'),
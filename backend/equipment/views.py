@@ -1,26 +1,52 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.reverse import reverse
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
+from django.conf import settings
 from django.contrib.auth import authenticate, login
 from django.contrib.auth.models import User
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponseNotModified, JsonResponse
 from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
+from django.utils.http import parse_etags
 from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
 from django.middleware.csrf import get_token
-from .models import Dataset
-from .serializers import DatasetSerializer, UploadResponseSerializer
-import pandas as pd
-import io
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.units import inch
+from .models import Dataset, UploadJob
+from .serializers import DatasetSerializer, UploadResponseSerializer, UploadJobSerializer
+from .ingest import append_rows, create_dataset, IngestError
+from .batch import ingest_batch
+from .analytics import MAX_HISTORY_LIMIT, compare_datasets, dataset_trends, parse_ids, trend_queryset
+from .jobs import enqueue_upload
+from .columnar import integral_columns
+from .rows import integral_records, page_for_params, to_records
+from .quality import quality_response, upload_quality
+from .plots import histograms_response, parse_histogram_params, parse_series_params, series_response
+from .exports import export_response, parse_export_params
+from .reports import REPORT_MODES, get_or_render, report_etag, report_filename
+from .caching import cache_stats, cached_response, invalidate_user
+from .downloads import file_response
+import tempfile
+import uuid
 from datetime import datetime
 
 
+def is_truthy(value):
+    """Interpret a query/form flag such as ?async=1 or async=true"""
+    return str(value).lower() in ('1', 'true', 'yes', 'on')
+
+
+def summary_payload(dataset):
+    """Summary block shared by the upload and append responses"""
+    return {
+        'total_count': dataset.total_count,
+        'avg_flowrate': round(dataset.avg_flowrate, 2),
+        'avg_pressure': round(dataset.avg_pressure, 2),
+        'avg_temperature': round(dataset.avg_temperature, 2),
+        'type_distribution': dataset.type_distribution,
+        'statistics': dataset.statistics
+    }
+
+
 class DatasetViewSet(viewsets.ModelViewSet):
     """ViewSet for managing datasets"""
     serializer_class = DatasetSerializer
@@ -29,6 +55,33 @@ class DatasetViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return Dataset.objects.filter(user=self.request.user)
     
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        invalidate_user(self.request.user.id)
+    
+    def perform_destroy(self, instance):
+        instance.purge()
+    
+    def perform_content_negotiation(self, request, force=False):
+        # ?format= of an export names the file format, not a renderer; errors fall back to JSON
+        return super().perform_content_negotiation(request, force=force or self.action == 'export')
+    
+    def list(self, request, *args, **kwargs):
+        """List datasets through the per-user response cache"""
+        return cached_response(
+            request,
+            'list',
+            lambda: super(DatasetViewSet, self).list(request, *args, **kwargs).data
+        )
+    
+    def retrieve(self, request, *args, **kwargs):
+        """Retrieve a dataset through the per-user response cache"""
+        return cached_response(
+            request,
+            f'retrieve-{kwargs.get(self.lookup_field)}',
+            lambda: super(DatasetViewSet, self).retrieve(request, *args, **kwargs).data
+        )
+    
     @action(detail=False, methods=['post'])
     def upload(self, request):
         """Upload and process CSV file"""
@@ -47,132 +100,177 @@ class DatasetViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        try:
-            # Read CSV file
-            df = pd.read_csv(csv_file)
-            
-            # Validate required columns
-            required_columns = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
-            if not all(col in df.columns for col in required_columns):
-                return Response(
-                    {'error': f'CSV must contain columns: {", ".join(required_columns)}'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Calculate summary statistics
-            total_count = len(df)
-            avg_flowrate = float(df['Flowrate'].mean())
-            avg_pressure = float(df['Pressure'].mean())
-            avg_temperature = float(df['Temperature'].mean())
-            type_distribution = df['Type'].value_counts().to_dict()
-            
-            # Save the file
-            csv_file.seek(0)  # Reset file pointer
-            file_path = default_storage.save(
-                f'uploads/{csv_file.name}',
-                ContentFile(csv_file.read())
+        # Hand the file to the background workers and return immediately
+        if is_truthy(request.query_params.get('async', request.data.get('async', ''))):
+            job = enqueue_upload(request.user, csv_file)
+            return Response(
+                {
+                    'message': 'File queued for processing',
+                    'job_id': str(job.id),
+                    'status_url': reverse('dataset-job-status', kwargs={'job_id': job.id}, request=request)
+                },
+                status=status.HTTP_202_ACCEPTED
             )
-            
-            # Create dataset record
-            dataset = Dataset.objects.create(
-                user=request.user,
-                filename=csv_file.name,
-                total_count=total_count,
-                avg_flowrate=avg_flowrate,
-                avg_pressure=avg_pressure,
-                avg_temperature=avg_temperature,
-                type_distribution=type_distribution,
-                csv_file=file_path
+        
+        # Rows can be left out of the response and paged via /rows/ instead
+        include_rows = is_truthy(request.query_params.get('include_rows', request.data.get('include_rows', 'true')))
+        
+        try:
+            # Parse, summarize and store the file in one streaming pass
+            data_records = []
+            dataset = create_dataset(
+                request.user,
+                csv_file,
+                csv_file.name,
+                on_chunk=(lambda chunk: data_records.extend(to_records(chunk, ()))) if include_rows else None
             )
-            
-            # Cleanup old datasets (keep only last 5)
-            Dataset.cleanup_old_datasets(request.user, keep_count=5)
-            
-            # Prepare response data
-            data_records = df.to_dict('records')
-            
+            # Whole-number columns are only known once every row is read
+            integral_records(data_records, integral_columns(dataset))
             response_data = {
                 'message': 'File uploaded successfully',
                 'dataset_id': dataset.id,
-                'summary': {
-                    'total_count': total_count,
-                    'avg_flowrate': round(avg_flowrate, 2),
-                    'avg_pressure': round(avg_pressure, 2),
-                    'avg_temperature': round(avg_temperature, 2),
-                    'type_distribution': type_distribution
-                },
-                'data': data_records
+                'summary': summary_payload(dataset),
+                'parse_report': dataset.parse_report,
+                'quality': upload_quality(dataset.quality),
+                'rows_url': reverse('dataset-rows', kwargs={'pk': dataset.id}, request=request)
             }
+            if include_rows:
+                response_data['data'] = data_records
             
             return Response(response_data, status=status.HTTP_201_CREATED)
             
+        except IngestError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except Exception as e:
+            return Response(
+                {'error': f'Error processing file: {str(e)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    
+    @action(detail=False, methods=['post'])
+    def batch_upload(self, request):
+        """Upload many CSV files, or ZIP archives of them, in one request"""
+        files = request.FILES.getlist('files') + request.FILES.getlist('file')
+        if not files:
+            return Response(
+                {'error': 'No files provided'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                items = ingest_batch(request.user, files, directory)
+        except IngestError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except Exception as e:
+            return Response(
+                {'error': f'Error processing batch: {str(e)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # One result per CSV, in upload order
+        results = []
+        for item in items:
+            if item.dataset is not None:
+                results.append({
+                    'filename': item.filename,
+                    'dataset_id': item.dataset.id,
+                    'summary': summary_payload(item.dataset),
+                    'parse_report': item.dataset.parse_report,
+                    'quality': upload_quality(item.dataset.quality),
+                    'rows_url': reverse('dataset-rows', kwargs={'pk': item.dataset.id}, request=request)
+                })
+            else:
+                results.append({'filename': item.filename, 'error': item.error})
+        created = sum(1 for item in items if item.dataset is not None)
+        
+        return Response(
+            {
+                'message': f'{created} of {len(items)} files uploaded',
+                'created': created,
+                'failed': len(items) - created,
+                'results': results
+            },
+            status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST
+        )
+    
+    @action(detail=True, methods=['post'])
+    def append(self, request, pk=None):
+        """Append the rows of another CSV file to a dataset"""
+        dataset = self.get_object()
+        if 'file' not in request.FILES:
+            return Response(
+                {'error': 'No file provided'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        csv_file = request.FILES['file']
+        if not csv_file.name.endswith('.csv'):
+            return Response(
+                {'error': 'File must be a CSV'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            # Only the new rows are parsed; stored aggregates are merged
+            dataset, appended, report = append_rows(dataset, csv_file, csv_file.name)
+        except IngestError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         except Exception as e:
             return Response(
                 {'error': f'Error processing file: {str(e)}'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        
+        return Response({
+            'message': 'Rows appended successfully',
+            'dataset_id': dataset.id,
+            'appended_rows': appended,
+            'revision': dataset.revision,
+            'summary': summary_payload(dataset),
+            'parse_report': report.to_dict(),
+            'rows_url': reverse('dataset-rows', kwargs={'pk': dataset.id}, request=request)
+        })
     
     @action(detail=True, methods=['get'])
     def download_pdf(self, request, pk=None):
-        """Generate and download PDF report for a dataset"""
+        """Download the (cached) PDF report for a dataset"""
+        mode = request.query_params.get('mode', 'summary')
+        if mode not in REPORT_MODES:
+            return Response(
+                {'error': f'mode must be one of: {", ".join(REPORT_MODES)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
         try:
             dataset = self.get_object()
             
-            # Create PDF in memory
-            buffer = io.BytesIO()
-            doc = SimpleDocTemplate(buffer, pagesize=letter)
-            elements = []
-            styles = getSampleStyleSheet()
+            # Reports never change for a given dataset revision, report version and mode
+            etag = report_etag(dataset, mode)
+            if etag in parse_etags(request.headers.get('If-None-Match', '')):
+                response = HttpResponseNotModified()
+                response['ETag'] = etag
+                return response
             
-            # Title
-            title = Paragraph(
-                f"<b>Chemical Equipment Report</b><br/>{dataset.filename}",
-                styles['Title']
+            # Stream the cached file in chunks (with Range support) instead of buffering it
+            name = get_or_render(dataset, mode)
+            return file_response(
+                request,
+                default_storage.open(name, 'rb'),
+                default_storage.size(name),
+                'application/pdf',
+                filename=report_filename(dataset, mode),
+                etag=etag
             )
-            elements.append(title)
-            elements.append(Spacer(1, 0.3*inch))
-            
-            # Summary section
-            summary_text = f"""
-            <b>Summary Statistics</b><br/>
-            Upload Date: {dataset.uploaded_at.strftime('%Y-%m-%d %H:%M')}<br/>
-            Total Equipment Count: {dataset.total_count}<br/>
-            Average Flowrate: {dataset.avg_flowrate:.2f}<br/>
-            Average Pressure: {dataset.avg_pressure:.2f}<br/>
-            Average Temperature: {dataset.avg_temperature:.2f}<br/>
-            """
-            elements.append(Paragraph(summary_text, styles['Normal']))
-            elements.append(Spacer(1, 0.3*inch))
-            
-            # Type distribution table
-            elements.append(Paragraph("<b>Equipment Type Distribution</b>", styles['Heading2']))
-            elements.append(Spacer(1, 0.1*inch))
-            
-            type_data = [['Equipment Type', 'Count']]
-            for eq_type, count in dataset.type_distribution.items():
-                type_data.append([eq_type, str(count)])
-            
-            type_table = Table(type_data)
-            type_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            elements.append(type_table)
-            
-            # Build PDF
-            doc.build(elements)
-            buffer.seek(0)
-            
-            # Create response
-            response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="report_{dataset.id}.pdf"'
-            return response
             
         except Exception as e:
             import traceback
@@ -185,10 +283,134 @@ class DatasetViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def history(self, request):
-        """Get last 5 uploaded datasets"""
-        datasets = self.get_queryset()[:5]  # Limit to 5 most recent
-        serializer = self.get_serializer(datasets, many=True)
-        return Response(serializer.data)
+        """Get the most recently uploaded datasets (5 unless ?limit= is given)"""
+        try:
+            limit = int(request.query_params.get('limit', settings.DATASET_HISTORY_LIMIT))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= MAX_HISTORY_LIMIT:
+            return Response(
+                {'error': f'limit must be between 1 and {MAX_HISTORY_LIMIT}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        def build():
+            datasets = self.get_queryset()[:limit]
+            serializer = self.get_serializer(datasets, many=True)
+            return serializer.data
+        
+        return cached_response(request, 'history', build)
+    
+    @action(detail=False, methods=['get'])
+    def compare(self, request):
+        """Compare datasets (?ids=1,2,3) against the first one, from stored aggregates"""
+        try:
+            ids = parse_ids(request.query_params)
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            return cached_response(request, 'compare', lambda: compare_datasets(request.user, ids))
+        except Dataset.DoesNotExist as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_404_NOT_FOUND
+            )
+    
+    @action(detail=False, methods=['get'])
+    def trends(self, request):
+        """Time series of counts, averages and type mix across the user's datasets"""
+        try:
+            queryset = trend_queryset(request.user, request.query_params)
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return cached_response(request, 'trends', lambda: dataset_trends(queryset))
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def cache_stats(self, request):
+        """Hit/miss counters of the dataset response cache (staff only)"""
+        return Response(cache_stats())
+    
+    @action(detail=True, methods=['get'])
+    def quality(self, request, pk=None):
+        """Data quality report: flagged rows and summaries with and without them"""
+        dataset = self.get_object()
+        return cached_response(request, f'quality-{dataset.id}', lambda: quality_response(dataset))
+    
+    @action(detail=True, methods=['get'])
+    def histograms(self, request, pk=None):
+        """Histograms of each numeric column, over all rows and per equipment type"""
+        dataset = self.get_object()
+        try:
+            bins = parse_histogram_params(request.query_params)
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return cached_response(
+            request, f'histograms-{dataset.id}', lambda: histograms_response(dataset, bins)
+        )
+    
+    @action(detail=True, methods=['get'])
+    def series(self, request, pk=None):
+        """One numeric column by row, decimated to a bounded number of points"""
+        dataset = self.get_object()
+        try:
+            params = parse_series_params(request.query_params, dataset.total_count)
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return cached_response(
+            request, f'series-{dataset.id}', lambda: series_response(dataset, *params)
+        )
+    
+    @action(detail=True, methods=['get'])
+    def export(self, request, pk=None):
+        """Stream the parsed rows as csv, json, parquet or xlsx, optionally filtered"""
+        dataset = self.get_object()
+        try:
+            fmt, columns, types = parse_export_params(request.query_params)
+            return export_response(request, dataset, fmt, columns, types)
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    
+    @action(detail=True, methods=['get'])
+    def rows(self, request, pk=None):
+        """Page through dataset rows in a compact columnar encoding"""
+        dataset = self.get_object()
+        try:
+            page = page_for_params(dataset, request.query_params)
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(page)
+    
+    @action(detail=False, methods=['get'], url_path=r'jobs/(?P<job_id>[^/.]+)')
+    def job_status(self, request, job_id=None):
+        """Report state and progress of a background upload job"""
+        try:
+            job = UploadJob.objects.get(pk=uuid.UUID(job_id), user=request.user)
+        except (ValueError, UploadJob.DoesNotExist):
+            return Response(
+                {'error': 'Job not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(UploadJobSerializer(job).data)
 
 
 @api_view(['POST'])
@@ -0,0 +1,102 @@
+"""
+Process-wide worker pools.
+
+``get_executor`` runs fire-and-forget background work (upload jobs, report
+renders). ``run_cpu`` lets async views hand pandas and ReportLab work to a
+separate pool bounded by ``CPU_WORKERS``, so the event loop stays free and
+at most that many requests compute at once. ``get_process_pool`` holds
+``BATCH_PARSE_WORKERS`` processes for parsing batch uploads on every core.
+"""
+import asyncio
+import functools
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+_executor = None
+_cpu_executor = None
+_process_pool = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the process-wide worker pool, creating it on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.UPLOAD_JOB_WORKERS,
+                thread_name_prefix='equipment-worker'
+            )
+        return _executor
+
+
+def wait_for_background():
+    """Block until all submitted background work is done; the next submit starts a new pool"""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+def get_cpu_executor():
+    """Return the bounded pool for CPU-bound work of async views"""
+    global _cpu_executor
+    with _executor_lock:
+        if _cpu_executor is None:
+            _cpu_executor = ThreadPoolExecutor(
+                max_workers=settings.CPU_WORKERS,
+                thread_name_prefix='equipment-cpu'
+            )
+        return _cpu_executor
+
+
+def _init_process():
+    # Spawned workers start from a fresh interpreter; they use storage, never the database
+    import django
+    django.setup()
+
+
+def get_process_pool():
+    """Return the process pool for batch parsing, creating it on first use"""
+    global _process_pool
+    with _executor_lock:
+        if _process_pool is None:
+            # Spawn rather than fork: forked children would share the parent's
+            # database connections and threads
+            _process_pool = ProcessPoolExecutor(
+                max_workers=settings.BATCH_PARSE_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_process
+            )
+        return _process_pool
+
+
+def reset_process_pool(pool):
+    """Drop ``pool`` (after a worker died) so the next call starts a new one"""
+    global _process_pool
+    with _executor_lock:
+        if _process_pool is pool:
+            _process_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _call_with_connection(func, args, kwargs):
+    # Pool threads outlive requests, so apply CONN_MAX_AGE around each call
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_cpu(func, *args, **kwargs):
+    """Await ``func(*args, **kwargs)`` running in the bounded CPU pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_cpu_executor(), functools.partial(_call_with_connection, func, args, kwargs)
+    )
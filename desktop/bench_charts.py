@@ -0,0 +1,96 @@
+"""
+Redraw times of the dashboard charts for large datasets.
+
+    QT_QPA_PLATFORM=offscreen python bench_charts.py --rows 1000000
+
+``panel`` is ``ChartPanel`` over a ``ColumnsSource``, which aggregates
+local arrays the way the server's /histograms/ and /series/ do: per-row
+charts draw at most a few points per pixel column, so updating with new
+data, zooming into a tenth of the rows and moving the cursor (blitted)
+take about as long at a million rows as at ten thousand. Against a
+server only the aggregates are transferred, a few kilobytes whatever the
+row count. ``naive`` plots every row as a line, the way a per-row chart
+is drawn without aggregation.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+from matplotlib.backend_bases import MouseEvent
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.figure import Figure
+from PyQt5.QtWidgets import QApplication
+
+from charts import ChartPanel, ColumnsSource
+from table_model import NUMERIC_COLUMNS
+
+
+def synthetic_columns(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    means = {'Flowrate': (200, 40), 'Pressure': (11, 3), 'Temperature': (100, 25)}
+    return {col: rng.normal(*means[col], rows).round(1) for col in NUMERIC_COLUMNS}
+
+
+def timed(app, fn):
+    start = time.perf_counter()
+    fn()
+    app.processEvents()
+    return time.perf_counter() - start
+
+
+def bench_panel(app, panel, columns, kind):
+    panel.kind_combo.setCurrentText(kind)
+    update = timed(app, lambda: (panel.set_source(ColumnsSource(columns), len(columns['Flowrate'])),
+                                 panel.canvas.draw()))
+    ax = panel.kind_axes()[0]
+    low, high = ax.get_xlim()
+
+    def zoom():
+        ax.set_xlim(low + (high - low) * 0.45, low + (high - low) * 0.55)
+        panel.refetch()
+        panel.canvas.draw()
+
+    zoomed = timed(app, zoom)
+    x, y = ax.transData.transform(((low + high) / 2, np.mean(ax.get_ylim())))
+    event = MouseEvent('motion_notify_event', panel.canvas, x, y)
+    cursor = timed(app, lambda: panel.move_cursor(event))
+    return update, zoomed, cursor
+
+
+def bench_naive(columns):
+    figure = Figure(figsize=(12, 5))
+    canvas = FigureCanvas(figure)
+    ax = figure.add_subplot(111)
+    start = time.perf_counter()
+    ax.plot(columns['Flowrate'], linewidth=0.8)
+    canvas.draw()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--naive-rows', type=int, default=1_000_000,
+                        help='Largest row count plotted point by point (0 to skip)')
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    panel = ChartPanel()
+    panel.resize(1200, 600)
+    panel.show()
+    app.processEvents()
+
+    print(f'{"rows":>9} {"chart":>13} {"update":>8} {"zoomed":>8} {"cursor":>8}')
+    for rows in args.rows:
+        columns = synthetic_columns(rows)
+        for kind in ['Series', 'Distribution']:
+            update, zoomed, cursor = bench_panel(app, panel, columns, kind)
+            print(f'{rows:>9} {kind.lower():>13} {update:>7.3f}s {zoomed:>7.3f}s {cursor:>7.3f}s')
+        if rows <= args.naive_rows:
+            line = bench_naive(columns)
+            print(f'{rows:>9} {"naive line":>13} {line:>7.3f}s')
+
+
+if __name__ == '__main__':
+    main()
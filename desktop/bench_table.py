@@ -0,0 +1,133 @@
+"""
+Time to first paint of the data table for large datasets.
+
+    QT_QPA_PLATFORM=offscreen python bench_table.py --rows 1000000 --widget-rows 100000
+
+``model`` is the virtualized ``RowsModel`` over a local DataFrame in a
+``QTableView``: only the visible cells are formatted, so first paint does
+not depend on the row count. It is also timed after jumping to the middle
+of the table and after sorting by a column. ``widget`` is the previous
+approach, one ``QTableWidgetItem`` per cell in a ``QTableWidget``; it is
+run at ``--widget-rows`` because a million rows takes minutes. Memory is
+the growth of the process's peak RSS, so ``model`` runs first.
+"""
+import argparse
+import resource
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from PyQt5.QtCore import QEvent, QObject, Qt
+from PyQt5.QtWidgets import QApplication, QTableView, QTableWidget, QTableWidgetItem
+
+from table_model import configure_view, frame_model
+
+TYPES = ['Reactor', 'Pump', 'Heat Exchanger', 'Compressor', 'Mixer', 'Separator', 'Column']
+
+
+def synthetic_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    types = np.array(TYPES, dtype=object)[rng.integers(0, len(TYPES), rows)]
+    return pd.DataFrame({
+        'Equipment Name': [f'{eq_type}-{i}' for i, eq_type in enumerate(types)],
+        'Type': types,
+        'Flowrate': rng.normal(200, 40, rows).round(1),
+        'Pressure': rng.normal(11, 3, rows).round(1),
+        'Temperature': rng.normal(100, 25, rows).round(1),
+    })
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class PaintTimer(QObject):
+    """Times until a view's viewport has painted"""
+
+    def __init__(self, app, view):
+        super().__init__()
+        self.app = app
+        self.painted = False
+        view.viewport().installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint:
+            self.painted = True
+        return False
+
+    def wait(self, start):
+        # Paint events are handled inside processEvents, so once it returns
+        # with a paint seen, that paint has finished
+        self.painted = False
+        while not self.painted:
+            self.app.processEvents()
+        return time.perf_counter() - start
+
+
+def bench_model(app, frame):
+    start = time.perf_counter()
+    view = QTableView()
+    configure_view(view)
+    view.setModel(frame_model(frame))
+    view.resize(1000, 700)
+    timer = PaintTimer(app, view)
+    view.show()
+    first = timer.wait(start)
+
+    start = time.perf_counter()
+    view.scrollTo(view.model().index(len(frame) // 2, 0))
+    scrolled = timer.wait(start)
+
+    start = time.perf_counter()
+    view.sortByColumn(3, Qt.DescendingOrder)
+    sorted_ = timer.wait(start)
+    view.close()
+    return first, scrolled, sorted_
+
+
+def bench_widget(app, frame):
+    start = time.perf_counter()
+    table = QTableWidget()
+    table.setColumnCount(len(frame.columns))
+    table.setHorizontalHeaderLabels(list(frame.columns))
+    table.setRowCount(len(frame))
+    for j, col in enumerate(frame.columns):
+        for i, value in enumerate(frame[col].tolist()):
+            table.setItem(i, j, QTableWidgetItem(str(value)))
+    table.resize(1000, 700)
+    timer = PaintTimer(app, table)
+    table.show()
+    first = timer.wait(start)
+    table.close()
+    return first
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--widget-rows', type=int, default=100_000,
+                        help='Largest row count run with QTableWidget (0 to skip)')
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    print(f'{"rows":>9} {"mode":>7} {"first paint":>12} {"scrolled":>9} {"sorted":>8} {"peak RSS +MB":>13}')
+    for rows in args.rows:
+        frame = synthetic_frame(rows)
+        before = peak_rss_mb()
+        first, scrolled, sorted_ = bench_model(app, frame)
+        print(f'{rows:>9} {"model":>7} {first:>11.3f}s {scrolled:>8.3f}s {sorted_:>7.3f}s '
+              f'{peak_rss_mb() - before:>13.1f}')
+
+    for rows in args.rows:
+        if rows > args.widget_rows:
+            continue
+        frame = synthetic_frame(rows)
+        before = peak_rss_mb()
+        first = bench_widget(app, frame)
+        print(f'{rows:>9} {"widget":>7} {first:>11.3f}s {"":>9} {"":>8} {peak_rss_mb() - before:>13.1f}')
+
+
+if __name__ == '__main__':
+    main()
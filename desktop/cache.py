@@ -0,0 +1,212 @@
+"""
+On-disk cache and offline mode for the desktop client.
+
+Responses are kept under the user's cache directory (``EQUIPMENT_CACHE_DIR``
+overrides it) with an sqlite index: JSON bodies inline, row pages as
+``.npz`` files of one binary array per column, PDFs as files. JSON and
+PDFs are stored with the server's ETag and revalidated with
+If-None-Match, so an unchanged resource costs a 304 with no body; row
+pages are keyed by dataset revision, which the revalidated history and
+dataset details carry. Least recently used entries are evicted once the
+cache grows past ``EQUIPMENT_CACHE_MAX_MB``.
+
+When the server cannot be reached the cached copies are returned instead,
+flagged as offline, so the client keeps working read-only.
+"""
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import requests
+from PyQt5.QtCore import QStandardPaths
+
+from network import download
+
+DEFAULT_MAX_MB = 512
+
+# Seconds to wait for a connection before treating the server as down
+CONNECT_TIMEOUT = 3
+
+NUMERIC_COLUMNS = ['Flowrate', 'Pressure', 'Temperature']
+
+
+# Statuses of a request the server would only serve to a logged-in session
+AUTH_STATUSES = {401, 403}
+
+
+class Offline(Exception):
+    """The server cannot be reached and nothing usable is cached"""
+
+
+class AuthenticationRequired(Exception):
+    """The server is reachable but does not accept the session, e.g. after an offline start"""
+
+
+def default_cache_dir():
+    base = QStandardPaths.writableLocation(QStandardPaths.GenericCacheLocation)
+    return os.environ.get('EQUIPMENT_CACHE_DIR') or os.path.join(base, 'chemical-equipment-visualizer')
+
+
+class LocalCache:
+    """
+    Cache entries of one user, shared by every thread of the client.
+
+    An entry has a key, an optional ETag, an optional JSON body and an
+    optional file under ``files/``; its size counts towards the cap.
+    """
+
+    def __init__(self, namespace, root=None, max_bytes=None):
+        self.namespace = namespace
+        self.root = root or default_cache_dir()
+        if max_bytes is None:
+            max_bytes = int(os.environ.get('EQUIPMENT_CACHE_MAX_MB', DEFAULT_MAX_MB)) * 1024 * 1024
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(self.root, 'files'), exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(
+            os.path.join(self.root, 'cache.sqlite3'), check_same_thread=False, isolation_level=None
+        )
+        with self.lock:
+            self.db.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                'key TEXT PRIMARY KEY, etag TEXT, body TEXT, file TEXT, '
+                'size INTEGER NOT NULL, accessed REAL NOT NULL)'
+            )
+            self.db.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+
+    def _key(self, key):
+        return f'{self.namespace}/{key}'
+
+    def file_path(self, key, suffix):
+        """Where the file of ``key`` is stored"""
+        digest = hashlib.sha1(self._key(key).encode()).hexdigest()
+        return os.path.join(self.root, 'files', digest + suffix)
+
+    def get(self, key):
+        """The entry as ``{'etag', 'body', 'file'}``, or None; marks it recently used"""
+        with self.lock:
+            row = self.db.execute(
+                'SELECT etag, body, file FROM entries WHERE key = ?', (self._key(key),)
+            ).fetchone()
+            if row is None:
+                return None
+            etag, body, file = row
+            if file and not os.path.exists(file):
+                # Removed from disk behind our back
+                self.db.execute('DELETE FROM entries WHERE key = ?', (self._key(key),))
+                return None
+            self.db.execute('UPDATE entries SET accessed = ? WHERE key = ?', (time.time(), self._key(key)))
+        return {'etag': etag, 'body': None if body is None else json.loads(body), 'file': file}
+
+    def put(self, key, etag=None, body=None, file=None):
+        """Store an entry (``file`` already written under file_path), then evict down to the cap"""
+        encoded = None if body is None else json.dumps(body)
+        size = (len(encoded) if encoded else 0) + (os.path.getsize(file) if file else 0)
+        with self.lock:
+            old = self.db.execute('SELECT file FROM entries WHERE key = ?', (self._key(key),)).fetchone()
+            if old and old[0] and old[0] != file and os.path.exists(old[0]):
+                os.remove(old[0])
+            self.db.execute(
+                'INSERT OR REPLACE INTO entries (key, etag, body, file, size, accessed) VALUES (?, ?, ?, ?, ?, ?)',
+                (self._key(key), etag, encoded, file, size, time.time())
+            )
+            self._evict()
+
+    def _evict(self):
+        total = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        while total > self.max_bytes:
+            oldest = self.db.execute(
+                'SELECT key, file, size FROM entries ORDER BY accessed LIMIT 100'
+            ).fetchall()
+            if not oldest:
+                break
+            for key, file, size in oldest:
+                self.db.execute('DELETE FROM entries WHERE key = ?', (key,))
+                if file and os.path.exists(file):
+                    os.remove(file)
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    def get_page(self, key):
+        """A cached /rows/ page, its columns as NumPy arrays"""
+        entry = self.get(key)
+        if entry is None:
+            return None
+        with np.load(entry['file']) as arrays:
+            values = [arrays[f'c{i}'] for i in range(len(entry['body']['columns']))]
+        return {**entry['body'], 'values': values}
+
+    def put_page(self, key, page):
+        """Store a /rows/ page as one binary array per column"""
+        arrays = {}
+        for i, (col, values) in enumerate(zip(page['columns'], page['values'])):
+            if col in NUMERIC_COLUMNS:
+                arrays[f'c{i}'] = np.asarray(values, dtype=float)
+            else:
+                # Fixed-width text, so no pickling is needed to read it back
+                arrays[f'c{i}'] = np.array(['' if value is None else str(value) for value in values])
+        path = self.file_path(key, '.npz')
+        with open(f'{path}.part', 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(f'{path}.part', path)
+        body = {field: value for field, value in page.items() if field != 'values'}
+        self.put(key, body=body, file=path)
+
+
+def get_json(session, cache, key, url, params=None):
+    """
+    GET a JSON resource through the cache, revalidating a cached copy by
+    its ETag. Returns ``(data, offline)``: the current body (None for an
+    error status), or the cached copy with ``offline`` True when the server
+    cannot be reached. Raises Offline when there is no cached copy, and
+    AuthenticationRequired for a 401 or 403.
+    """
+    entry = cache.get(key)
+    headers = {'If-None-Match': entry['etag']} if entry and entry['etag'] else {}
+    try:
+        response = session.get(url, params=params, headers=headers, timeout=(CONNECT_TIMEOUT, None))
+    except requests.ConnectionError:
+        if entry is None:
+            raise Offline('Server unreachable and nothing cached')
+        return entry['body'], True
+    if response.status_code == 304 and entry is not None:
+        return entry['body'], False
+    if response.status_code in AUTH_STATUSES:
+        raise AuthenticationRequired('Not logged in')
+    if response.status_code != 200:
+        return None, False
+    data = response.json()
+    cache.put(key, etag=response.headers.get('ETag'), body=data)
+    return data, False
+
+
+def download_cached(session, cache, key, url, path, task=None):
+    """
+    Download ``url`` to ``path`` through the cache, revalidating a cached
+    copy by its ETag. Returns ``(status, offline)``; when the server cannot
+    be reached a cached copy is used (status 200, offline True).
+    """
+    entry = cache.get(key)
+    headers = {'If-None-Match': entry['etag']} if entry and entry['etag'] else {}
+    target = cache.file_path(key, os.path.splitext(path)[1])
+    try:
+        response = download(session, url, target, task=task, headers=headers, timeout=(CONNECT_TIMEOUT, None))
+    except requests.ConnectionError:
+        if entry is None:
+            raise Offline('Server unreachable and nothing cached')
+        shutil.copyfile(entry['file'], path)
+        return 200, True
+    if response.status_code == 304 and entry is not None:
+        shutil.copyfile(entry['file'], path)
+        return 200, False
+    if response.status_code == 200:
+        # Copied first: a file larger than the cap is evicted as soon as it is stored
+        shutil.copyfile(target, path)
+        cache.put(key, etag=response.headers.get('ETag'), file=target)
+    return response.status_code, False
@@ -0,0 +1,477 @@
+"""
+Persistent charts for the dashboard.
+
+``ChartPanel`` owns a single Figure and canvas for the life of the window.
+New data updates the artists it already has (pie wedges, bar heights,
+line data, histogram steps) instead of building a new figure, and the
+mouse cursor is drawn with blitting, so moving it repaints one artist
+rather than the whole figure.
+
+Per-row charts never load every row. They draw aggregates the server
+computes over the whole dataset: a distribution is the fixed set of bins
+of /histograms/, and a series is /series/ decimated to the lowest and
+highest value of each pixel column, fetched again for the visible rows
+when zooming or panning. What is transferred and drawn depends on the
+canvas size, not the row count, so the charts stay interactive at a
+million rows.
+"""
+import math
+
+import numpy as np
+import requests
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT
+from matplotlib.figure import Figure
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QComboBox, QHBoxLayout, QLabel, QVBoxLayout, QWidget
+
+from cache import CONNECT_TIMEOUT, get_json
+from network import API_URL
+from table_model import NUMERIC_COLUMNS
+
+COLORS = {'Flowrate': '#36A2EB', 'Pressure': '#FF6384', 'Temperature': '#4BC0C0'}
+
+KINDS = ['Overview', 'Series', 'Distribution']
+
+HISTOGRAM_BINS = 64
+
+# Most points the /series/ endpoint returns; two per pixel column are asked for
+MAX_SERIES_POINTS = 2000
+
+
+def minmax_decimate(values, start, stop, buckets):
+    """
+    Min/max envelope of ``values[start:stop]`` in at most ``buckets``
+    buckets, as ``(x, lows, highs)`` with ``x`` the bucket centres. A line
+    from each low to its high covers the same pixels as a line through
+    every value when a bucket is a pixel wide, which is what the server's
+    ``minmax`` series keeps. Spans short enough to draw whole are returned
+    as they are, lows equal to highs. Buckets with no present value are
+    left out.
+    """
+    start = max(0, int(math.floor(start)))
+    stop = min(len(values), int(math.ceil(stop)))
+    if stop <= start:
+        return np.empty(0), np.empty(0), np.empty(0)
+    if stop - start <= 2 * buckets:
+        x, lows = np.arange(start, stop, dtype=float), values[start:stop]
+        highs = lows
+    else:
+        edges = np.linspace(start, stop, buckets + 1).astype(np.int64)
+        span = values[start:stop]
+        # fmin/fmax skip missing values unless a whole bucket is missing
+        lows = np.fmin.reduceat(span, edges[:-1] - start)
+        highs = np.fmax.reduceat(span, edges[:-1] - start)
+        x = (edges[:-1] + edges[1:] - 1) / 2
+    present = np.isfinite(lows)
+    return x[present], lows[present], highs[present]
+
+
+def histogram(values, bins=HISTOGRAM_BINS):
+    """Counts and bin edges of the present values"""
+    present = values[np.isfinite(values)]
+    if not len(present):
+        return np.zeros(bins), np.linspace(0, 1, bins + 1)
+    return np.histogram(present, bins=bins)
+
+
+def value_range(values):
+    """(low, high) of the present values, padded so the range is never empty"""
+    present = values[np.isfinite(values)]
+    if not len(present):
+        return 0.0, 1.0
+    low, high = float(present.min()), float(present.max())
+    pad = (high - low) * 0.02 or 0.5
+    return low - pad, high + pad
+
+
+class ColumnsSource:
+    """Chart data of local column arrays, in the shape of the server's responses"""
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    def histograms(self, bins, callback):
+        result = {}
+        for col, values in self.columns.items():
+            counts, edges = histogram(values, bins)
+            result[col] = {'edges': edges.tolist(), 'counts': counts.tolist()}
+        callback(result)
+
+    def series(self, column, start, stop, points, callback):
+        x, lows, highs = minmax_decimate(self.columns[column], start, stop, points // 2)
+        callback({
+            'column': column,
+            'start': start,
+            'stop': stop,
+            'x': np.repeat(x, 2),
+            'y': np.column_stack([lows, highs]).ravel(),
+        })
+
+
+class ServerChartSource:
+    """
+    Chart data of a stored dataset from GET /datasets/{id}/histograms/ and
+    /series/, fetched in the background and kept in ``cache``, so charts
+    seen before also load offline. Histograms are revalidated by ETag;
+    series are keyed by dataset ``revision``, like table pages.
+    """
+
+    def __init__(self, runner, session, dataset_id, cache, revision):
+        self.runner = runner
+        self.session = session
+        self.dataset_id = dataset_id
+        self.cache = cache
+        self.revision = revision
+
+    def histograms(self, bins, callback):
+        def get(task):
+            data, _ = get_json(
+                self.session, self.cache, f'histograms/{self.dataset_id}/{bins}',
+                f'{API_URL}/datasets/{self.dataset_id}/histograms/', params={'bins': bins}
+            )
+            return None if data is None else data['histograms']
+
+        self.runner.start(get, callback, lambda error: callback(None))
+
+    def series(self, column, start, stop, points, callback):
+        params = {'column': column, 'start': start, 'stop': stop, 'points': points, 'method': 'minmax'}
+        key = f'series/{self.dataset_id}/r{self.revision}/{column}/{start}/{stop}/{points}'
+
+        def get(task):
+            entry = self.cache.get(key)
+            if entry is not None:
+                return entry['body']
+            try:
+                response = self.session.get(
+                    f'{API_URL}/datasets/{self.dataset_id}/series/', params=params, timeout=(CONNECT_TIMEOUT, None)
+                )
+            except requests.ConnectionError:
+                return None
+            if response.status_code != 200:
+                return None
+            data = response.json()
+            self.cache.put(key, body=data)
+            return data
+
+        self.runner.start(get, callback, lambda error: callback(None))
+
+
+class ChartPanel(QWidget):
+    """
+    The Charts tab: an overview of a dataset summary and per-row charts of
+    its numeric columns, all on one canvas.
+
+    ``set_summary`` updates the overview, ``set_source`` the per-row charts
+    (``None`` clears them, showing ``message``). A source is a
+    ``ServerChartSource`` or ``ColumnsSource``: ``histograms(bins,
+    callback)`` and ``series(column, start, stop, points, callback)``
+    deliver data shaped like the server's responses to ``callback``, now
+    or later; ``None`` means the request failed. Each chart kind has its
+    own axes, created once and shown when its kind is selected.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.summary = None
+        self.source = None
+        self.rows = 0
+        self.histograms = None
+        self.histograms_loading = False
+        # (column, start, stop, points) of the latest series request
+        self.series_wanted = None
+        self.series_loading = False
+        self.fit_y = True
+        # Bumped for every new source, so responses for an earlier one are ignored
+        self.generation = 0
+        self.background = None
+        self._refetch_pending = False
+
+        layout = QVBoxLayout()
+        controls = QHBoxLayout()
+        self.kind_combo = QComboBox()
+        self.kind_combo.addItems(KINDS)
+        controls.addWidget(QLabel('Chart:'))
+        controls.addWidget(self.kind_combo)
+        self.x_combo = QComboBox()
+        self.x_combo.addItems(NUMERIC_COLUMNS)
+        controls.addWidget(self.x_combo)
+        self.readout = QLabel('')
+        controls.addWidget(self.readout, 1)
+        layout.addLayout(controls)
+
+        self.figure = Figure(figsize=(12, 5))
+        self.canvas = FigureCanvas(self.figure)
+        self.toolbar = NavigationToolbar2QT(self.canvas, self)
+        layout.addWidget(self.toolbar)
+        layout.addWidget(self.canvas)
+        self.setLayout(layout)
+
+        self.init_axes()
+        self.kind_combo.currentIndexChanged.connect(self.show_kind)
+        self.x_combo.currentIndexChanged.connect(self.columns_changed)
+        self.canvas.mpl_connect('draw_event', self.save_background)
+        self.canvas.mpl_connect('motion_notify_event', self.move_cursor)
+        self.canvas.mpl_connect('figure_leave_event', lambda event: self.hide_cursor())
+        self.show_kind()
+
+    def init_axes(self):
+        # Fixed margins: tight_layout would measure every axes, shown or not
+        self.figure.subplots_adjust(left=0.07, right=0.97, top=0.92, bottom=0.1, wspace=0.3)
+
+        self.pie_ax = self.figure.add_subplot(121)
+        self.pie_ax.set_title('Equipment Type Distribution')
+        self.pie_labels = None
+        self.wedges, self.wedge_labels, self.wedge_pcts = [], [], []
+
+        self.bar_ax = self.figure.add_subplot(122)
+        self.bars = self.bar_ax.bar(NUMERIC_COLUMNS, [0, 0, 0], color=[COLORS[col] for col in NUMERIC_COLUMNS])
+        self.bar_ax.set_title('Average Parameters')
+        self.bar_ax.set_ylabel('Value')
+
+        self.series_ax = self.figure.add_subplot(111)
+        self.series_line, = self.series_ax.plot([], [], linewidth=0.8)
+        self.series_ax.set_xlabel('Row')
+        self.series_ax.callbacks.connect('xlim_changed', lambda ax: self.schedule_refetch())
+
+        self.hist_ax = self.figure.add_subplot(111)
+        self.steps = self.hist_ax.stairs(np.zeros(HISTOGRAM_BINS), np.arange(HISTOGRAM_BINS + 1), fill=True)
+        self.hist_ax.set_ylabel('Rows')
+
+        # Cursors are animated: left out of normal draws and blitted on mouse moves
+        self.cursors = {
+            ax: ax.axvline(0, color='#444444', linewidth=0.8, animated=True, visible=False)
+            for ax in (self.series_ax, self.hist_ax)
+        }
+        self.messages = {
+            ax: ax.text(0.5, 0.5, '', transform=ax.transAxes, ha='center', va='center')
+            for ax in (self.series_ax, self.hist_ax)
+        }
+
+    @property
+    def kind(self):
+        return self.kind_combo.currentText()
+
+    def kind_axes(self):
+        return {
+            'Overview': [self.pie_ax, self.bar_ax],
+            'Series': [self.series_ax],
+            'Distribution': [self.hist_ax],
+        }[self.kind]
+
+    def show_kind(self):
+        shown = self.kind_axes()
+        for ax in self.figure.axes:
+            ax.set_visible(ax in shown)
+        self.x_combo.setVisible(self.kind != 'Overview')
+        self.readout.setText('')
+        self.update_rows()
+
+    def columns_changed(self):
+        # Another column's values need their own vertical range
+        self.series_line.set_data([], [])
+        self.fit_y = True
+        self.update_rows()
+
+    def set_summary(self, summary):
+        """Update the overview in place from a dataset summary"""
+        self.summary = summary
+        distribution = summary['type_distribution']
+        labels = list(distribution.keys())
+        sizes = np.array(list(distribution.values()), dtype=float)
+        if labels != self.pie_labels:
+            # A different set of types needs a different set of wedges
+            for artist in self.wedges + self.wedge_labels + self.wedge_pcts:
+                artist.remove()
+            self.wedges, self.wedge_labels, self.wedge_pcts = self.pie_ax.pie(
+                sizes, labels=labels, autopct='%1.1f%%', startangle=90
+            )
+            self.pie_labels = labels
+        else:
+            self.update_wedges(sizes)
+
+        for bar, col in zip(self.bars, NUMERIC_COLUMNS):
+            bar.set_height(summary[f'avg_{col.lower()}'] or 0)
+        self.bar_ax.relim()
+        self.bar_ax.autoscale_view()
+        self.canvas.draw_idle()
+
+    def update_wedges(self, sizes):
+        """Move the existing wedges and their texts to new fractions, as Axes.pie places them"""
+        fractions = sizes / (sizes.sum() or 1)
+        theta = 90.0
+        for wedge, label, pct, fraction in zip(self.wedges, self.wedge_labels, self.wedge_pcts, fractions):
+            start, theta = theta, theta + 360 * fraction
+            wedge.set_theta1(start)
+            wedge.set_theta2(theta)
+            middle = math.radians((start + theta) / 2)
+            x, y = math.cos(middle), math.sin(middle)
+            label.set_position((1.1 * x, 1.1 * y))
+            label.set_horizontalalignment('left' if x > 0 else 'right')
+            pct.set_position((0.6 * x, 0.6 * y))
+            pct.set_text(f'{fraction * 100:.1f}%')
+
+    def set_source(self, source, rows=0, message=''):
+        """Chart a new dataset of ``rows`` rows from ``source``; None clears the per-row charts"""
+        self.source = source
+        self.rows = rows
+        self.generation += 1
+        self.histograms = self.series_wanted = None
+        self.histograms_loading = self.series_loading = False
+        self.fit_y = True
+        self.series_line.set_data([], [])
+        for text in self.messages.values():
+            text.set_text('' if source is not None else message)
+        if source is not None:
+            # Fresh data starts fully zoomed out
+            self.series_ax.set_xlim(0, max(rows - 1, 1))
+        self.update_rows()
+
+    def set_message(self, message):
+        """Show a note (an error) on the per-row charts"""
+        for text in self.messages.values():
+            text.set_text(message)
+        if self.kind != 'Overview':
+            self.canvas.draw_idle()
+
+    def update_rows(self):
+        """Refresh the artists of the shown per-row chart, fetching what it still needs"""
+        if self.kind == 'Overview':
+            self.canvas.draw_idle()
+            return
+        x_col = self.x_combo.currentText()
+        if self.kind == 'Series':
+            self.series_line.set_color(COLORS[x_col])
+            self.series_ax.set_ylabel(x_col)
+            self.series_ax.set_title(f'{x_col} by row')
+            self.request_series()
+        else:
+            data = (self.histograms or {}).get(x_col)
+            if data is None:
+                counts, edges = np.zeros(HISTOGRAM_BINS), np.arange(HISTOGRAM_BINS + 1)
+            else:
+                counts, edges = np.asarray(data['counts'], dtype=float), np.asarray(data['edges'], dtype=float)
+            self.steps.set_data(counts, edges)
+            self.steps.set_color(COLORS[x_col])
+            self.hist_ax.set_xlim(edges[0], edges[-1])
+            self.hist_ax.set_ylim(0, max(counts.max(), 1) * 1.05)
+            self.hist_ax.set_xlabel(x_col)
+            self.hist_ax.set_title(f'{x_col} distribution')
+            self.request_histograms()
+        self.canvas.draw_idle()
+
+    def request_histograms(self):
+        if self.source is None or self.histograms is not None or self.histograms_loading:
+            return
+        self.histograms_loading = True
+        generation = self.generation
+        self.source.histograms(HISTOGRAM_BINS, lambda data: self.histograms_loaded(generation, data))
+
+    def histograms_loaded(self, generation, data):
+        if generation != self.generation:
+            return
+        self.histograms_loading = False
+        if data is None:
+            self.set_message('Histograms unavailable')
+            return
+        self.histograms = data
+        if self.kind == 'Distribution':
+            self.update_rows()
+
+    def schedule_refetch(self):
+        # Zooming changes both limits; fetch once they have both been set
+        if not self._refetch_pending:
+            self._refetch_pending = True
+            QTimer.singleShot(0, self.refetch)
+
+    def refetch(self):
+        self._refetch_pending = False
+        if self.kind == 'Series':
+            self.request_series()
+
+    def request_series(self):
+        """Fetch the shown column for the visible rows, unless that is already shown or on its way"""
+        if self.source is None or not self.rows:
+            return
+        low, high = self.series_ax.get_xlim()
+        start = min(max(int(math.floor(low)), 0), self.rows)
+        stop = max(min(int(math.ceil(high)) + 1, self.rows), start)
+        points = min(max(2 * int(self.series_ax.bbox.width), 4), MAX_SERIES_POINTS)
+        wanted = (self.x_combo.currentText(), start, stop, points)
+        if wanted == self.series_wanted:
+            return
+        self.series_wanted = wanted
+        if self.series_loading:
+            # Asked for again once the request on its way is back
+            return
+        self.series_loading = True
+        generation = self.generation
+        self.source.series(*wanted, lambda data: self.series_loaded(generation, wanted, data))
+
+    def series_loaded(self, generation, wanted, data):
+        if generation != self.generation:
+            return
+        self.series_loading = False
+        if data is None:
+            self.series_wanted = None
+            self.set_message('Series unavailable')
+            return
+        if wanted[0] == self.x_combo.currentText():
+            x, y = np.asarray(data['x'], dtype=float), np.asarray(data['y'], dtype=float)
+            self.series_line.set_data(x, y)
+            if self.fit_y and len(y):
+                self.series_ax.set_ylim(*value_range(y))
+                self.fit_y = False
+            self.canvas.draw_idle()
+        if wanted != self.series_wanted:
+            # The view moved while this was loading; fetch what it shows now
+            self.series_wanted = None
+            self.request_series()
+
+    def save_background(self, event):
+        # Everything but the animated cursors, restored under each cursor move
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+
+    def cursor_axes(self):
+        shown = self.kind_axes()[0]
+        return shown if shown in self.cursors else None
+
+    def move_cursor(self, event):
+        ax = self.cursor_axes()
+        if ax is None or self.background is None or self.source is None:
+            return
+        if event.inaxes is not ax or self.toolbar.mode:
+            self.hide_cursor()
+            return
+        cursor = self.cursors[ax]
+        cursor.set_xdata([event.xdata, event.xdata])
+        cursor.set_visible(True)
+        self.canvas.restore_region(self.background)
+        ax.draw_artist(cursor)
+        self.canvas.blit(self.figure.bbox)
+        self.readout.setText(self.describe(event.xdata))
+
+    def hide_cursor(self):
+        ax = self.cursor_axes()
+        if ax is None or not self.cursors[ax].get_visible() or self.background is None:
+            return
+        self.cursors[ax].set_visible(False)
+        self.canvas.restore_region(self.background)
+        self.canvas.blit(self.figure.bbox)
+        self.readout.setText('')
+
+    def describe(self, xdata):
+        """Readout text for the point under the mouse"""
+        x_col = self.x_combo.currentText()
+        if self.kind == 'Series':
+            # The nearest drawn point; rows between them were decimated away
+            x, y = (np.asarray(values) for values in self.series_line.get_data())
+            if not len(x):
+                return ''
+            index = int(np.abs(x - xdata).argmin())
+            return f'Row {int(x[index]) + 1}: {x_col} = {y[index]:g}'
+        counts, edges = self.steps.get_data()[:2]
+        index = np.searchsorted(edges, xdata) - 1
+        if 0 <= index < len(counts):
+            return f'{x_col} {edges[index]:g} to {edges[index + 1]:g}: {int(counts[index])} rows'
+        return ''
@@ -1,17 +1,20 @@
+import logging
 import sys
 import os
 import requests
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QPushButton, QLabel, QLineEdit, QTableWidget, QTableWidgetItem,
-    QFileDialog, QMessageBox, QTabWidget, QStackedWidget
+    QPushButton, QLabel, QLineEdit, QTableWidget, QTableWidgetItem, QTableView,
+    QFileDialog, QMessageBox, QTabWidget, QStackedWidget, QProgressBar
 )
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QFont
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
-import pandas as pd
+from cache import AUTH_STATUSES, AuthenticationRequired, LocalCache, download_cached, get_json
+from charts import ChartPanel, ServerChartSource
+from network import API_URL, TaskRunner, ThreadSessions, json_or_none, upload
+from table_model import REQUIRED_COLUMNS, RowsModel, ServerSource, configure_view
+
+logger = logging.getLogger(__name__)
 
 
 class LoginWindow(QWidget):
@@ -21,6 +24,7 @@ class LoginWindow(QWidget):
         super().__init__(parent)
         self.parent_window = parent
         self.session = requests.Session()  # Shared session for cookies
+        self.runner = TaskRunner(max_threads=1)
         self.init_ui()
     
     def init_ui(self):
@@ -62,28 +66,51 @@ class LoginWindow(QWidget):
         # Buttons
         btn_layout = QHBoxLayout()
         
-        login_btn = QPushButton('Login')
-        login_btn.clicked.connect(self.login)
-        btn_layout.addWidget(login_btn)
+        self.login_btn = QPushButton('Login')
+        self.login_btn.clicked.connect(self.login)
+        btn_layout.addWidget(self.login_btn)
         
-        register_btn = QPushButton('Register')
-        register_btn.clicked.connect(self.register)
-        btn_layout.addWidget(register_btn)
+        self.register_btn = QPushButton('Register')
+        self.register_btn.clicked.connect(self.register)
+        btn_layout.addWidget(self.register_btn)
         
         layout.addLayout(btn_layout)
         
         self.setLayout(layout)
     
     def get_csrf_token(self):
-        """Fetch CSRF token from the server"""
+        """Fetch CSRF token from the server (called from worker threads)"""
         try:
-            response = self.session.get('http://localhost:8000/api/auth/csrf/')
+            response = self.session.get(f'{API_URL}/auth/csrf/')
             if response.status_code == 200:
                 return self.session.cookies.get('csrftoken')
         except Exception as e:
-            print(f"Error fetching CSRF token: {e}")
+            logger.warning('Error fetching CSRF token: %s', e)
         return None
     
+    def set_busy(self, busy):
+        self.login_btn.setEnabled(not busy)
+        self.register_btn.setEnabled(not busy)
+    
+    def post_auth(self, path, payload):
+        """POST credentials in the background; returns (status, JSON body)"""
+        # Get CSRF token first
+        csrf_token = self.get_csrf_token()
+        headers = {}
+        if csrf_token:
+            headers['X-CSRFToken'] = csrf_token
+        
+        try:
+            response = self.session.post(f'{API_URL}/auth/{path}/', json=payload, headers=headers)
+        except requests.ConnectionError:
+            # Status None: the server is down
+            return None, None
+        return response.status_code, json_or_none(response)
+    
+    def connection_failed(self, error):
+        self.set_busy(False)
+        QMessageBox.critical(self, 'Error', f'Connection error: {error}')
+    
     def login(self):
         username = self.username_input.text()
         password = self.password_input.text()
@@ -92,25 +119,34 @@ class LoginWindow(QWidget):
             QMessageBox.warning(self, 'Error', 'Please enter username and password')
             return
         
-        try:
-            # Get CSRF token first
-            csrf_token = self.get_csrf_token()
-            headers = {}
-            if csrf_token:
-                headers['X-CSRFToken'] = csrf_token
-            
-            response = self.session.post(
-                'http://localhost:8000/api/auth/login/',
-                json={'username': username, 'password': password},
-                headers=headers
-            )
-            
-            if response.status_code == 200:
-                self.parent_window.login_success(username, self.session)
-            else:
-                QMessageBox.warning(self, 'Error', 'Invalid credentials')
-        except Exception as e:
-            QMessageBox.critical(self, 'Error', f'Connection error: {str(e)}')
+        self.set_busy(True)
+        self.runner.start(
+            lambda task: self.post_auth('login', {'username': username, 'password': password}),
+            lambda result: self.login_finished(username, result),
+            self.connection_failed
+        )
+    
+    def login_finished(self, username, result):
+        self.set_busy(False)
+        status, _ = result
+        if status == 200:
+            self.parent_window.login_success(username, self.session)
+        elif status is None:
+            self.offer_offline(username)
+        else:
+            QMessageBox.warning(self, 'Error', 'Invalid credentials')
+    
+    def offer_offline(self, username):
+        """Server down: open the user's cached data read-only, if there is any"""
+        if LocalCache(username).get('history') is None:
+            QMessageBox.critical(self, 'Error', 'Connection error: the server cannot be reached')
+            return
+        answer = QMessageBox.question(
+            self, 'Offline',
+            'The server cannot be reached. Open your cached data read-only?'
+        )
+        if answer == QMessageBox.Yes:
+            self.parent_window.login_success(username, self.session, offline=True)
     
     def register(self):
         username = self.username_input.text()
@@ -121,38 +157,53 @@ class LoginWindow(QWidget):
             QMessageBox.warning(self, 'Error', 'Please enter username and password')
             return
         
-        try:
-            # Get CSRF token first
-            csrf_token = self.get_csrf_token()
-            headers = {}
-            if csrf_token:
-                headers['X-CSRFToken'] = csrf_token
-            
-            response = self.session.post(
-                'http://localhost:8000/api/auth/register/',
-                json={'username': username, 'password': password, 'email': email},
-                headers=headers
-            )
-            
-            if response.status_code == 201:
-                QMessageBox.information(self, 'Success', 'Registration successful! Please login.')
-                self.password_input.clear()
-                self.email_input.clear()
-            else:
-                QMessageBox.warning(self, 'Error', response.json().get('error', 'Registration failed'))
-        except Exception as e:
-            QMessageBox.critical(self, 'Error', f'Connection error: {str(e)}')
+        self.set_busy(True)
+        self.runner.start(
+            lambda task: self.post_auth('register', {'username': username, 'password': password, 'email': email}),
+            self.register_finished,
+            self.connection_failed
+        )
+    
+    def register_finished(self, result):
+        self.set_busy(False)
+        status, data = result
+        if status is None:
+            QMessageBox.critical(self, 'Error', 'Connection error: the server cannot be reached')
+        elif status == 201:
+            QMessageBox.information(self, 'Success', 'Registration successful! Please login.')
+            self.password_input.clear()
+            self.email_input.clear()
+        else:
+            QMessageBox.warning(self, 'Error', (data or {}).get('error', 'Registration failed'))
 
 
 class DashboardWindow(QWidget):
     """Main Dashboard Widget"""
     
-    def __init__(self, username, session, parent=None):
+    def __init__(self, username, session, parent=None, offline=False):
         super().__init__(parent)
+        self.parent_window = parent
         self.username = username
-        self.session = session  # Use the session passed from LoginWindow
+        # The login session's cookies, with a Session per worker thread
+        self.session = ThreadSessions(session)
         self.current_data = None
+        # Responses kept on disk, revalidated by ETag; served read-only while offline
+        self.cache = LocalCache(username)
+        self.offline = offline
+        # Set once the server rejects the session, e.g. when it returns after an offline start
+        self.needs_login = False
+        self.history = []
+        # Network calls run in worker threads; results come back as Qt signals
+        self.runner = TaskRunner()
+        self.transfer_task = None  # Upload or PDF download in progress
+        self.transfer_sent_text = None
+        self.rows_model = None
         self.init_ui()
+        self.set_offline(offline)
+        # Cached history first, so the window is usable before the server answers
+        cached = self.cache.get('history')
+        if cached is not None:
+            self.display_history(cached['body'])
         self.load_history()
     
     def get_csrf_token(self):
@@ -167,6 +218,9 @@ class DashboardWindow(QWidget):
         header.setFont(QFont('Arial', 16, QFont.Bold))
         layout.addWidget(header)
         
+        self.status_label = QLabel('')
+        layout.addWidget(self.status_label)
+        
         # Upload section
         upload_layout = QHBoxLayout()
         self.file_label = QLabel('No file selected')
@@ -176,31 +230,52 @@ class DashboardWindow(QWidget):
         select_btn.clicked.connect(self.select_file)
         upload_layout.addWidget(select_btn)
         
-        upload_btn = QPushButton('Upload & Analyze')
-        upload_btn.clicked.connect(self.upload_file)
-        upload_layout.addWidget(upload_btn)
+        self.upload_btn = QPushButton('Upload & Analyze')
+        self.upload_btn.clicked.connect(self.upload_file)
+        upload_layout.addWidget(self.upload_btn)
         
         layout.addLayout(upload_layout)
         
+        # Transfer progress, shown while uploading or downloading
+        progress_layout = QHBoxLayout()
+        self.progress_label = QLabel('')
+        progress_layout.addWidget(self.progress_label)
+        self.progress_bar = QProgressBar()
+        progress_layout.addWidget(self.progress_bar)
+        self.cancel_btn = QPushButton('Cancel')
+        self.cancel_btn.clicked.connect(self.cancel_transfer)
+        progress_layout.addWidget(self.cancel_btn)
+        layout.addLayout(progress_layout)
+        self.show_progress(None)
+        
         # Tabs for different views
         self.tabs = QTabWidget()
         
         # Summary Tab
         self.summary_widget = QWidget()
         self.summary_layout = QVBoxLayout()
+        self.summary_label = QLabel('')
+        self.summary_label.setWordWrap(True)
+        self.summary_label.setAlignment(Qt.AlignTop)
+        self.summary_layout.addWidget(self.summary_label)
         self.summary_widget.setLayout(self.summary_layout)
         self.tabs.addTab(self.summary_widget, 'Summary')
         
         # Charts Tab
         self.charts_widget = QWidget()
         self.charts_layout = QVBoxLayout()
+        # One figure for the window's lifetime; new data updates its artists
+        self.charts = ChartPanel()
+        self.charts_layout.addWidget(self.charts)
         self.charts_widget.setLayout(self.charts_layout)
         self.tabs.addTab(self.charts_widget, 'Charts')
         
         # Data Table Tab
         self.table_widget = QWidget()
         self.table_layout = QVBoxLayout()
-        self.table = QTableWidget()
+        # Virtualized: rows are fetched page by page as they scroll into view
+        self.table = QTableView()
+        configure_view(self.table)
         self.table_layout.addWidget(self.table)
         self.table_widget.setLayout(self.table_layout)
         self.tabs.addTab(self.table_widget, 'Data Table')
@@ -209,6 +284,9 @@ class DashboardWindow(QWidget):
         self.history_widget = QWidget()
         self.history_layout = QVBoxLayout()
         self.history_table = QTableWidget()
+        self.history_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        # Double-click re-opens a past dataset (from the cache when offline)
+        self.history_table.cellDoubleClicked.connect(self.open_history_row)
         self.history_layout.addWidget(self.history_table)
         self.history_widget.setLayout(self.history_layout)
         self.tabs.addTab(self.history_widget, 'History')
@@ -216,9 +294,9 @@ class DashboardWindow(QWidget):
         layout.addWidget(self.tabs)
         
         # Download PDF button
-        pdf_btn = QPushButton('Download PDF Report')
-        pdf_btn.clicked.connect(self.download_pdf)
-        layout.addWidget(pdf_btn)
+        self.pdf_btn = QPushButton('Download PDF Report')
+        self.pdf_btn.clicked.connect(self.download_pdf)
+        layout.addWidget(self.pdf_btn)
         
         self.setLayout(layout)
         self.selected_file = None
@@ -231,47 +309,135 @@ class DashboardWindow(QWidget):
             self.selected_file = file_path
             self.file_label.setText(os.path.basename(file_path))
     
+    def show_progress(self, text):
+        """Show the progress row with ``text``, or hide it when ``text`` is None"""
+        visible = text is not None
+        for widget in (self.progress_label, self.progress_bar, self.cancel_btn):
+            widget.setVisible(visible)
+        if visible:
+            self.progress_label.setText(text)
+            # Busy indicator until the first progress signal gives a total
+            self.progress_bar.setRange(0, 0)
+            self.progress_bar.setFormat('%p%')
+            self.cancel_btn.setEnabled(True)
+    
+    def start_transfer(self, text, fn, on_finished, on_failed, sent_text=None):
+        """Run a cancellable upload or download; ``sent_text`` replaces ``text`` once all bytes are sent"""
+        self.upload_btn.setEnabled(False)
+        self.pdf_btn.setEnabled(False)
+        self.show_progress(text)
+        self.transfer_sent_text = sent_text
+        self.transfer_task = self.runner.start(
+            fn, on_finished, on_failed, self.transfer_progress, self.transfer_cancelled
+        )
+    
+    @property
+    def read_only(self):
+        return self.offline or self.needs_login
+    
+    def set_offline(self, offline):
+        """Offline, or online without a login, is read-only: cached data can be viewed but nothing uploaded"""
+        self.offline = offline
+        if offline:
+            self.status_label.setText('Offline: showing cached data (read-only)')
+        elif self.needs_login:
+            self.status_label.setText('Not logged in: showing cached data (read-only)')
+        else:
+            self.status_label.setText('')
+        self.upload_btn.setEnabled(not self.read_only and self.transfer_task is None)
+    
+    def login_required(self):
+        """The server answered but rejected the session; stay read-only and offer to log in again"""
+        asked = self.needs_login
+        self.needs_login = True
+        self.set_offline(False)
+        if asked:
+            return
+        answer = QMessageBox.question(
+            self, 'Login required',
+            'The server can be reached again, but you are not logged in. Log in now?'
+        )
+        if answer == QMessageBox.Yes:
+            self.parent_window.login_again(self.username)
+    
+    def end_transfer(self):
+        self.transfer_task = None
+        self.upload_btn.setEnabled(not self.read_only)
+        self.pdf_btn.setEnabled(True)
+        self.show_progress(None)
+    
+    def transfer_progress(self, done, total):
+        if self.transfer_task is None:
+            return
+        if not total:
+            self.progress_bar.setRange(0, 0)
+            self.progress_bar.setFormat(f'{done / 1024 / 1024:.1f} MB')
+            return
+        # Per mille, so files over 2 GB stay within the bar's int range
+        self.progress_bar.setRange(0, 1000)
+        self.progress_bar.setValue(done * 1000 // total)
+        self.progress_bar.setFormat(f'{done / 1024 / 1024:.1f} / {total / 1024 / 1024:.1f} MB')
+        if done == total and self.transfer_sent_text:
+            # Body sent; the server now parses it and nothing more can be reported
+            self.progress_label.setText(self.transfer_sent_text)
+            self.progress_bar.setRange(0, 0)
+    
+    def cancel_transfer(self):
+        if self.transfer_task is not None:
+            self.transfer_task.cancel()
+            self.cancel_btn.setEnabled(False)
+            self.progress_label.setText('Cancelling...')
+    
+    def transfer_cancelled(self):
+        self.end_transfer()
+    
     def upload_file(self):
         if not self.selected_file:
             QMessageBox.warning(self, 'Error', 'Please select a file first')
             return
+        if self.transfer_task is not None:
+            return
         
-        try:
-            # Get CSRF token
-            csrf_token = self.get_csrf_token()
-            headers = {}
-            if csrf_token:
-                headers['X-CSRFToken'] = csrf_token
-            
-            with open(self.selected_file, 'rb') as f:
-                files = {'file': f}
-                response = self.session.post(
-                    'http://localhost:8000/api/datasets/upload/',
-                    files=files,
-                    headers=headers
-                )
-            
-            if response.status_code == 201:
-                self.current_data = response.json()
-                self.display_results()
-                self.load_history()
-                QMessageBox.information(self, 'Success', 'File uploaded successfully!')
-            else:
-                error_msg = response.json().get('error', 'Upload failed') if response.headers.get('content-type', '').startswith('application/json') else 'Upload failed'
-                QMessageBox.warning(self, 'Error', error_msg)
-        except Exception as e:
-            QMessageBox.critical(self, 'Error', f'Upload error: {str(e)}')
+        # Get CSRF token
+        csrf_token = self.get_csrf_token()
+        headers = {}
+        if csrf_token:
+            headers['X-CSRFToken'] = csrf_token
+        
+        path = self.selected_file
+        self.start_transfer(
+            'Uploading...',
+            lambda task: upload(
+                self.session, path, f'{API_URL}/datasets/upload/',
+                fields={'include_rows': 'false'}, headers=headers, task=task
+            ),
+            self.upload_finished,
+            self.upload_failed,
+            sent_text='Processing on server...'
+        )
+    
+    def upload_finished(self, result):
+        self.end_transfer()
+        status, data = result
+        if status in AUTH_STATUSES:
+            self.login_required()
+        elif status == 201:
+            self.current_data = data
+            self.display_results()
+            self.load_history()
+            QMessageBox.information(self, 'Success', 'File uploaded successfully!')
+        else:
+            QMessageBox.warning(self, 'Error', (data or {}).get('error', 'Upload failed'))
+    
+    def upload_failed(self, error):
+        self.end_transfer()
+        QMessageBox.critical(self, 'Error', f'Upload error: {error}')
     
     def display_results(self):
         if not self.current_data:
             return
         
         summary = self.current_data['summary']
-        data = self.current_data['data']
-        
-        # Clear previous content
-        for i in reversed(range(self.summary_layout.count())): 
-            self.summary_layout.itemAt(i).widget().setParent(None)
         
         # Display summary
         summary_text = f"""
@@ -286,70 +452,90 @@ class DashboardWindow(QWidget):
         for eq_type, count in summary['type_distribution'].items():
             summary_text += f"<p>{eq_type}: {count}</p>"
         
-        summary_label = QLabel(summary_text)
-        summary_label.setWordWrap(True)
-        self.summary_layout.addWidget(summary_label)
+        self.summary_label.setText(summary_text)
         
         # Display charts
         self.display_charts(summary)
         
         # Display data table
-        self.display_table(data)
+        self.display_table(self.current_data['dataset_id'])
     
     def display_charts(self, summary):
-        # Clear previous charts
-        for i in reversed(range(self.charts_layout.count())): 
-            self.charts_layout.itemAt(i).widget().setParent(None)
-        
-        # Create figure with subplots
-        fig = Figure(figsize=(12, 5))
-        
-        # Pie chart for type distribution
-        ax1 = fig.add_subplot(121)
-        labels = list(summary['type_distribution'].keys())
-        sizes = list(summary['type_distribution'].values())
-        ax1.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=90)
-        ax1.set_title('Equipment Type Distribution')
-        
-        # Bar chart for average parameters
-        ax2 = fig.add_subplot(122)
-        parameters = ['Flowrate', 'Pressure', 'Temperature']
-        values = [summary['avg_flowrate'], summary['avg_pressure'], summary['avg_temperature']]
-        ax2.bar(parameters, values, color=['#36A2EB', '#FF6384', '#4BC0C0'])
-        ax2.set_title('Average Parameters')
-        ax2.set_ylabel('Value')
-        
-        fig.tight_layout()
-        
-        # Add canvas to layout
-        canvas = FigureCanvas(fig)
-        self.charts_layout.addWidget(canvas)
-    
-    def display_table(self, data):
-        if not data:
-            return
-        
-        df = pd.DataFrame(data)
-        self.table.setRowCount(len(df))
-        self.table.setColumnCount(len(df.columns))
-        self.table.setHorizontalHeaderLabels(df.columns.tolist())
-        
-        for i, row in df.iterrows():
-            for j, value in enumerate(row):
-                self.table.setItem(i, j, QTableWidgetItem(str(value)))
+        self.charts.set_summary(summary)
         
-        self.table.resizeColumnsToContents()
+        # Per-row charts fetch server-side histograms and decimated series as they are shown
+        source = ServerChartSource(
+            self.runner, self.session, self.current_data['dataset_id'], self.cache,
+            self.current_data.get('revision', 0)
+        )
+        self.charts.set_source(source, summary['total_count'])
+    
+    def display_table(self, dataset_id):
+        # New uploads are at revision 0
+        source = ServerSource(
+            self.runner, self.session, dataset_id, self.cache, self.current_data.get('revision', 0)
+        )
+        self.rows_model = RowsModel(source, REQUIRED_COLUMNS)
+        self.table.setModel(self.rows_model)
+        # A new model starts unsorted, in file order
+        self.table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.rows_model.start()
     
     def load_history(self):
-        try:
-            response = self.session.get('http://localhost:8000/api/datasets/history/')
-            if response.status_code == 200:
-                history = response.json()
-                self.display_history(history)
-        except Exception as e:
-            print(f'Error loading history: {str(e)}')
+        # Revalidated against the cached copy, so an unchanged history costs a 304
+        self.runner.start(
+            lambda task: get_json(self.session, self.cache, 'history', f'{API_URL}/datasets/history/'),
+            self.history_loaded,
+            self.history_failed
+        )
+    
+    def history_failed(self, error):
+        if isinstance(error, AuthenticationRequired):
+            self.login_required()
+        else:
+            self.status_label.setText(f'Could not load history: {error}')
+    
+    def history_loaded(self, result):
+        history, offline = result
+        self.set_offline(offline)
+        if history is not None:
+            self.display_history(history)
+    
+    def open_history_row(self, row, column):
+        dataset_id = self.history[row]['id']
+        self.runner.start(
+            lambda task: get_json(
+                self.session, self.cache, f'datasets/{dataset_id}', f'{API_URL}/datasets/{dataset_id}/'
+            ),
+            self.dataset_loaded,
+            self.dataset_failed
+        )
+    
+    def dataset_failed(self, error):
+        if isinstance(error, AuthenticationRequired):
+            self.login_required()
+        else:
+            QMessageBox.warning(self, 'Error', f'Cannot open dataset: {error}')
+    
+    def dataset_loaded(self, result):
+        dataset, offline = result
+        self.set_offline(offline)
+        if dataset is None:
+            QMessageBox.warning(self, 'Error', 'Dataset not found')
+            return
+        self.current_data = {
+            'dataset_id': dataset['id'],
+            'revision': dataset['revision'],
+            'summary': {
+                field: dataset[field]
+                for field in ['total_count', 'avg_flowrate', 'avg_pressure', 'avg_temperature', 'type_distribution']
+            },
+        }
+        self.display_results()
+        self.tabs.setCurrentWidget(self.summary_widget)
     
     def display_history(self, history):
+        self.history = history
         self.history_table.setRowCount(len(history))
         self.history_table.setColumnCount(5)
         self.history_table.setHorizontalHeaderLabels([
@@ -369,28 +555,42 @@ class DashboardWindow(QWidget):
         if not self.current_data:
             QMessageBox.warning(self, 'Error', 'No data to download')
             return
+        if self.transfer_task is not None:
+            return
         
         dataset_id = self.current_data['dataset_id']
         
-        try:
-            response = self.session.get(
-                f'http://localhost:8000/api/datasets/{dataset_id}/download_pdf/',
-                stream=True
-            )
-            
-            if response.status_code == 200:
-                file_path, _ = QFileDialog.getSaveFileName(
-                    self, 'Save PDF', f'equipment_report_{dataset_id}.pdf', 'PDF Files (*.pdf)'
-                )
-                
-                if file_path:
-                    with open(file_path, 'wb') as f:
-                        f.write(response.content)
-                    QMessageBox.information(self, 'Success', 'PDF downloaded successfully!')
-            else:
-                QMessageBox.warning(self, 'Error', 'Failed to download PDF')
-        except Exception as e:
-            QMessageBox.critical(self, 'Error', f'Download error: {str(e)}')
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, 'Save PDF', f'equipment_report_{dataset_id}.pdf', 'PDF Files (*.pdf)'
+        )
+        if not file_path:
+            return
+        
+        # Written to disk as it arrives instead of being held in memory
+        self.start_transfer(
+            'Downloading...',
+            lambda task: download_cached(
+                self.session, self.cache, f'pdf/{dataset_id}/summary',
+                f'{API_URL}/datasets/{dataset_id}/download_pdf/', file_path, task=task
+            ),
+            self.download_finished,
+            self.download_failed
+        )
+    
+    def download_finished(self, result):
+        status, offline = result
+        self.set_offline(offline)
+        self.end_transfer()
+        if status in AUTH_STATUSES:
+            self.login_required()
+        elif status == 200:
+            QMessageBox.information(self, 'Success', 'PDF downloaded successfully!')
+        else:
+            QMessageBox.warning(self, 'Error', 'Failed to download PDF')
+    
+    def download_failed(self, error):
+        self.end_transfer()
+        QMessageBox.critical(self, 'Error', f'Download error: {error}')
 
 
 class MainWindow(QMainWindow):
@@ -414,9 +614,27 @@ class MainWindow(QMainWindow):
         
         self.show()
     
-    def login_success(self, username, session):
+    def closeEvent(self, event):
+        # Stop transfers at their next block instead of finishing them on exit
+        self.login_window.runner.cancel_all()
+        if hasattr(self, 'dashboard'):
+            self.dashboard.runner.cancel_all()
+        super().closeEvent(event)
+    
+    def login_again(self, username):
+        """Back to the login form, e.g. when the server returns after an offline start"""
+        self.login_window.username_input.setText(username)
+        self.login_window.password_input.clear()
+        self.central_widget.setCurrentWidget(self.login_window)
+    
+    def login_success(self, username, session, offline=False):
+        if hasattr(self, 'dashboard'):
+            # A new login replaces the dashboard of the previous one
+            self.dashboard.runner.cancel_all()
+            self.central_widget.removeWidget(self.dashboard)
+            self.dashboard.deleteLater()
         # Create and show dashboard
-        self.dashboard = DashboardWindow(username, session, self)
+        self.dashboard = DashboardWindow(username, session, self, offline=offline)
         self.central_widget.addWidget(self.dashboard)
         self.central_widget.setCurrentWidget(self.dashboard)
 
@@ -0,0 +1,264 @@
+"""
+Background networking for the desktop client.
+
+Requests run as ``NetworkTask``s in a ``QThreadPool`` so the GUI thread
+only ever handles their results, delivered through Qt signals. A
+``requests.Session`` is not thread-safe, so tasks running side by side
+each borrow their own from ``ThreadSessions``. Uploads are
+sent as a streamed multipart body read from disk in blocks, which reports
+progress and stops at the next block once the task is cancelled.
+"""
+import io
+import os
+import threading
+import uuid
+
+import requests
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+API_URL = 'http://localhost:8000/api'
+
+# Bytes between progress signals, so a large transfer does not flood the event loop
+PROGRESS_STEP = 256 * 1024
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+class Cancelled(Exception):
+    """Raised inside a task once it has been cancelled"""
+
+
+class TaskSignals(QObject):
+    """Signals of a NetworkTask, delivered on the thread that created the task"""
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(object)
+    cancelled = pyqtSignal()
+    progress = pyqtSignal(int, int)
+
+
+class NetworkTask(QRunnable):
+    """
+    Run ``fn(task)`` in a worker thread.
+
+    ``fn`` reports progress with ``task.report(done, total)`` and calls
+    ``task.check()`` between blocks of work. Its return value is emitted by
+    ``finished``, an exception by ``failed``. Once cancelled, the task emits
+    ``cancelled`` and nothing else, even if ``fn`` was blocked in a call it
+    could not leave early.
+    """
+
+    def __init__(self, fn):
+        super().__init__()
+        self.fn = fn
+        self.signals = TaskSignals()
+        self._cancelled = threading.Event()
+        self._reported = -PROGRESS_STEP
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def is_cancelled(self):
+        return self._cancelled.is_set()
+
+    def check(self):
+        if self._cancelled.is_set():
+            raise Cancelled()
+
+    def report(self, done, total):
+        if done - self._reported >= PROGRESS_STEP or done == total:
+            self._reported = done
+            self.signals.progress.emit(done, total)
+
+    def run(self):
+        try:
+            result = self.fn(self)
+        except Cancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            if self.is_cancelled:
+                self.signals.cancelled.emit()
+            else:
+                self.signals.failed.emit(e)
+        else:
+            if self.is_cancelled:
+                self.signals.cancelled.emit()
+            else:
+                self.signals.finished.emit(result)
+
+
+class TaskRunner:
+    """Starts NetworkTasks in a thread pool and keeps them alive until they report back"""
+
+    def __init__(self, max_threads=4):
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(max_threads)
+        self.tasks = set()
+
+    def start(self, fn, on_finished, on_failed=None, on_progress=None, on_cancelled=None):
+        task = NetworkTask(fn)
+        # Owned by Python, not the pool: kept here until its last signal is delivered
+        task.setAutoDelete(False)
+        self.tasks.add(task)
+
+        def done(*_):
+            self.tasks.discard(task)
+
+        task.signals.finished.connect(on_finished)
+        if on_failed is not None:
+            task.signals.failed.connect(on_failed)
+        if on_progress is not None:
+            task.signals.progress.connect(on_progress)
+        if on_cancelled is not None:
+            task.signals.cancelled.connect(on_cancelled)
+        for signal in (task.signals.finished, task.signals.failed, task.signals.cancelled):
+            signal.connect(done)
+        self.pool.start(task)
+        return task
+
+    def cancel_all(self):
+        for task in list(self.tasks):
+            task.cancel()
+
+
+class ThreadSessions:
+    """
+    Stands in for a logged-in ``requests.Session`` in tasks. Each ``get``
+    or ``post`` borrows a Session no other thread is using, created with a
+    copy of the login session's cookies and headers, and keeps it for
+    later requests, so there are only as many as requests ever ran at once
+    and their connections are reused. ``cookies`` (e.g. the CSRF token)
+    are the login session's.
+    """
+
+    def __init__(self, session):
+        self.cookies = session.cookies
+        self.headers = session.headers
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        with self._lock:
+            session = self._idle.pop() if self._idle else None
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self.headers)
+            session.cookies.update(self.cookies)
+        try:
+            # A streamed response only needs the connection pool, which is thread-safe
+            return session.request(method, url, **kwargs)
+        finally:
+            with self._lock:
+                self._idle.append(session)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+
+class MultipartBody:
+    """
+    A multipart/form-data body that streams one file from disk.
+
+    ``requests`` sends any object with ``read`` and ``__len__`` as the
+    request body with a Content-Length, so the file is never held in
+    memory. Every read reports progress to ``task`` and raises Cancelled
+    once it is cancelled, which aborts the upload mid-body.
+    """
+
+    def __init__(self, path, field='file', fields=None, content_type='text/csv', task=None):
+        self.boundary = uuid.uuid4().hex
+        self.task = task
+        head = ''.join(
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'
+            for name, value in (fields or {}).items()
+        )
+        head += (
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="{field}"; filename="{os.path.basename(path)}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'
+        )
+        tail = f'\r\n--{self.boundary}--\r\n'
+        self.length = len(head.encode()) + os.path.getsize(path) + len(tail.encode())
+        self.sent = 0
+        self.parts = [io.BytesIO(head.encode()), open(path, 'rb'), io.BytesIO(tail.encode())]
+
+    @property
+    def content_type(self):
+        return f'multipart/form-data; boundary={self.boundary}'
+
+    def __len__(self):
+        return self.length
+
+    def read(self, size=-1):
+        if self.task is not None:
+            self.task.check()
+        data = b''
+        while self.parts and (size < 0 or len(data) < size):
+            block = self.parts[0].read(-1 if size < 0 else size - len(data))
+            if not block:
+                self.parts.pop(0).close()
+                continue
+            data += block
+        self.sent += len(data)
+        if self.task is not None:
+            self.task.report(self.sent, self.length)
+        return data
+
+    def close(self):
+        for part in self.parts:
+            part.close()
+        self.parts = []
+
+
+def json_or_none(response):
+    """The decoded body of a JSON response, None for anything else"""
+    if response.headers.get('content-type', '').startswith('application/json'):
+        return response.json()
+    return None
+
+
+def upload(session, path, url, fields=None, headers=None, task=None):
+    """POST ``path`` as a streamed multipart upload; returns (status, JSON body)"""
+    body = MultipartBody(path, fields=fields, task=task)
+    try:
+        response = session.post(
+            url,
+            data=body,
+            headers={**(headers or {}), 'Content-Type': body.content_type}
+        )
+    finally:
+        body.close()
+    return response.status_code, json_or_none(response)
+
+
+def download(session, url, path, task=None, headers=None, timeout=None):
+    """
+    Stream ``url`` into ``path`` and return the (closed) response; the file
+    is only written for a 200. It is written under a temporary name and
+    renamed once complete, so a cancelled or failed download leaves
+    nothing behind.
+    """
+    partial = f'{path}.part'
+    with session.get(url, stream=True, headers=headers, timeout=timeout) as response:
+        if response.status_code != 200:
+            return response
+        total = int(response.headers.get('Content-Length') or 0)
+        done = 0
+        try:
+            with open(partial, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    if task is not None:
+                        task.check()
+                    f.write(chunk)
+                    done += len(chunk)
+                    if task is not None:
+                        task.report(done, total)
+            os.replace(partial, path)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+    return response
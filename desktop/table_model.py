@@ -0,0 +1,266 @@
+"""
+Virtualized table model for dataset rows.
+
+``RowsModel`` is a ``QAbstractTableModel`` for a ``QTableView``: the view
+only asks for the cells it paints, and the model fetches the rows behind
+them one page at a time from a source, keeping each page as one NumPy
+array per column and at most ``MAX_PAGES`` pages in memory. Sorting is
+passed to the source, so a server sorts in its database and a local frame
+in pandas; nothing is materialized per cell.
+"""
+from collections import OrderedDict
+
+import numpy as np
+import requests
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PyQt5.QtWidgets import QHeaderView
+
+from cache import CONNECT_TIMEOUT
+from network import API_URL
+
+REQUIRED_COLUMNS = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
+NUMERIC_COLUMNS = ['Flowrate', 'Pressure', 'Temperature']
+
+# Server-side ordering fields of the /rows/ endpoint, by column
+ORDERING_FIELDS = {
+    'Equipment Name': 'name',
+    'Type': 'type',
+    'Flowrate': 'flowrate',
+    'Pressure': 'pressure',
+    'Temperature': 'temperature',
+}
+
+PAGE_SIZE = 1000
+
+# Pages kept in memory; the least recently painted ones are dropped first
+MAX_PAGES = 64
+
+PLACEHOLDER = '...'
+
+
+def format_value(value):
+    """Cell text of a value, matching how the JSON value would print"""
+    if value is None:
+        return ''
+    if isinstance(value, (float, np.floating)):
+        if np.isnan(value):
+            return ''
+        text = repr(float(value))
+        return text[:-2] if text.endswith('.0') else text
+    return str(value)
+
+
+class FrameSource:
+    """Pages of a local DataFrame, in the shape of the /rows/ endpoint"""
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.columns = list(frame.columns)
+        self.arrays = [frame[col].to_numpy() for col in self.columns]
+        self.orders = {}
+
+    def order(self, ordering):
+        """Row permutation for an ordering like '-pressure', sorted as the server sorts"""
+        if ordering not in self.orders:
+            field = ordering.lstrip('-')
+            column = next(col for col, name in ORDERING_FIELDS.items() if name == field)
+            ascending = not ordering.startswith('-')
+            # Stable, so ties keep file order; missing values sort highest, as on the server
+            self.orders[ordering] = self.frame[column].sort_values(
+                kind='stable', ascending=ascending, na_position='last' if ascending else 'first'
+            ).index.to_numpy()
+        return self.orders[ordering]
+
+    def fetch(self, offset, limit, ordering, callback):
+        if ordering:
+            rows = self.order(ordering)[offset:offset + limit]
+            values = [array[rows] for array in self.arrays]
+        else:
+            # Slices are views, so an unsorted page copies nothing
+            values = [array[offset:offset + limit] for array in self.arrays]
+        callback({
+            'columns': self.columns,
+            'values': values,
+            'count': len(values[0]) if values else 0,
+            'total_count': len(self.frame),
+        })
+
+
+class RowsModel(QAbstractTableModel):
+    """
+    Dataset rows paged in from ``source`` as the view scrolls.
+
+    ``source.fetch(offset, limit, ordering, callback)`` delivers a page
+    shaped like the /rows/ endpoint's response (``columns``, ``values``,
+    ``total_count``) to ``callback``, now or later; ``None`` means the fetch
+    failed. Cells of pages still on their way show a placeholder.
+    """
+
+    def __init__(self, source, columns, page_size=PAGE_SIZE, parent=None):
+        super().__init__(parent)
+        self.source = source
+        self.columns = list(columns)
+        self.page_size = page_size
+        self.total = 0
+        self.ordering = None
+        self.pages = OrderedDict()
+        self.pending = set()
+        # Bumped on every reset, so pages of an earlier ordering are ignored
+        self.generation = 0
+        self._fetching = False
+
+    def start(self):
+        """Fetch the first page, which also gives the row count"""
+        self.request(0)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.total
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.columns[section]
+        return str(section + 1)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.TextAlignmentRole:
+            if self.columns[index.column()] in NUMERIC_COLUMNS:
+                return int(Qt.AlignRight | Qt.AlignVCenter)
+            return None
+        if role != Qt.DisplayRole:
+            return None
+        page = self.page(index.row() // self.page_size)
+        if page is None:
+            return PLACEHOLDER
+        return format_value(page[index.column()][index.row() % self.page_size])
+
+    def page(self, number):
+        """The column arrays of page ``number``, requesting it if not loaded"""
+        if number in self.pages:
+            self.pages.move_to_end(number)
+            return self.pages[number]
+        self._fetching = True
+        try:
+            self.request(number)
+        finally:
+            self._fetching = False
+        return self.pages.get(number)
+
+    def request(self, number):
+        if number in self.pending:
+            return
+        self.pending.add(number)
+        generation = self.generation
+        self.source.fetch(
+            number * self.page_size,
+            self.page_size,
+            self.ordering,
+            lambda page: self.page_loaded(generation, number, page)
+        )
+
+    def page_loaded(self, generation, number, page):
+        if generation != self.generation:
+            return
+        self.pending.discard(number)
+        if page is None:
+            return
+
+        positions = [page['columns'].index(col) for col in self.columns]
+        self.pages[number] = [
+            np.asarray(page['values'][i], dtype=float if col in NUMERIC_COLUMNS else object)
+            for i, col in zip(positions, self.columns)
+        ]
+        while len(self.pages) > MAX_PAGES:
+            self.pages.popitem(last=False)
+
+        if page['total_count'] != self.total:
+            self.beginResetModel()
+            self.total = page['total_count']
+            self.endResetModel()
+        elif not self._fetching:
+            # Loaded in the background: repaint the rows that showed placeholders
+            first = number * self.page_size
+            last = min(first + self.page_size, self.total) - 1
+            self.dataChanged.emit(self.index(first, 0), self.index(last, len(self.columns) - 1))
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """Re-sort through the source; the view refetches the pages it shows"""
+        self.beginResetModel()
+        if column < 0:
+            # No sort indicator: file order
+            self.ordering = None
+        else:
+            field = ORDERING_FIELDS[self.columns[column]]
+            self.ordering = f'-{field}' if order == Qt.DescendingOrder else field
+        self.generation += 1
+        self.pages.clear()
+        self.pending.clear()
+        self.endResetModel()
+
+
+class ServerSource:
+    """
+    Pages of a stored dataset from GET /datasets/{id}/rows/, fetched in the
+    background. With a ``cache``, pages are kept on disk under the dataset
+    ``revision`` and read from there first, so they also load offline.
+    """
+
+    def __init__(self, runner, session, dataset_id, cache=None, revision=None):
+        self.runner = runner
+        self.session = session
+        self.dataset_id = dataset_id
+        self.cache = cache if revision is not None else None
+        self.revision = revision
+
+    def fetch(self, offset, limit, ordering, callback):
+        params = {'offset': offset, 'limit': limit}
+        if ordering:
+            params['ordering'] = ordering
+        # A revision's rows never change, so cached pages need no revalidation
+        key = f'rows/{self.dataset_id}/r{self.revision}/{ordering or ""}/{offset}/{limit}'
+
+        def get(task):
+            if self.cache is not None:
+                page = self.cache.get_page(key)
+                if page is not None:
+                    return page
+            try:
+                response = self.session.get(
+                    f'{API_URL}/datasets/{self.dataset_id}/rows/', params=params, timeout=(CONNECT_TIMEOUT, None)
+                )
+            except requests.ConnectionError:
+                return None
+            if response.status_code != 200:
+                return None
+            page = response.json()
+            if self.cache is not None:
+                self.cache.put_page(key, page)
+            return page
+
+        self.runner.start(get, callback, lambda error: callback(None))
+
+
+def configure_view(view):
+    """Set up a QTableView for a RowsModel of any size"""
+    # Fixed row heights: the view never measures rows it does not paint
+    view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+    view.verticalHeader().setDefaultSectionSize(view.fontMetrics().height() + 6)
+    view.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+    view.horizontalHeader().setDefaultSectionSize(140)
+    # Unsorted until a header is clicked; sorting runs in the model's source
+    view.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+    view.setSortingEnabled(True)
+
+
+def frame_model(frame, page_size=PAGE_SIZE):
+    """A RowsModel over a local DataFrame, its row count already known"""
+    model = RowsModel(FrameSource(frame), list(frame.columns), page_size)
+    model.start()
+    return model
+
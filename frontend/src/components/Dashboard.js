@@ -1,10 +1,16 @@
 import React, { useState, useEffect } from 'react';
-import { Chart as ChartJS, ArcElement, Tooltip, Legend, CategoryScale, LinearScale, BarElement } from 'chart.js';
-import { Pie, Bar } from 'react-chartjs-2';
+import {
+  Chart as ChartJS, ArcElement, Tooltip, Legend, CategoryScale, LinearScale, BarElement, LineElement, PointElement,
+} from 'chart.js';
+import { Pie, Bar, Line } from 'react-chartjs-2';
 import { datasetService } from '../services/api';
 import './Dashboard.css';
 
-ChartJS.register(ArcElement, Tooltip, Legend, CategoryScale, LinearScale, BarElement);
+ChartJS.register(ArcElement, Tooltip, Legend, CategoryScale, LinearScale, BarElement, LineElement, PointElement);
+
+const NUMERIC_COLUMNS = ['Flowrate', 'Pressure', 'Temperature'];
+const HISTOGRAM_BINS = 30;
+const SERIES_POINTS = 1000;
 
 function Dashboard({ username }) {
   const [file, setFile] = useState(null);
@@ -12,6 +18,12 @@ function Dashboard({ username }) {
   const [currentData, setCurrentData] = useState(null);
   const [history, setHistory] = useState([]);
   const [error, setError] = useState('');
+  const [rows, setRows] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingRows, setLoadingRows] = useState(false);
+  const [chartColumn, setChartColumn] = useState(NUMERIC_COLUMNS[0]);
+  const [histograms, setHistograms] = useState(null);
+  const [series, setSeries] = useState(null);
 
   useEffect(() => {
     fetchHistory();
@@ -26,6 +38,50 @@ function Dashboard({ username }) {
     }
   };
 
+  // Convert a columnar page ({columns, values}) into row arrays
+  const pageToRows = (page) => {
+    const count = page.values.length ? page.values[0].length : 0;
+    return Array.from({ length: count }, (_, i) => page.values.map((column) => column[i]));
+  };
+
+  const fetchRows = async (datasetId, cursor = null) => {
+    setLoadingRows(true);
+    try {
+      const page = await datasetService.getRows(datasetId, { cursor });
+      const pageRows = pageToRows(page);
+      setRows((prev) => (cursor ? [...prev, ...pageRows] : pageRows));
+      setNextCursor(page.next_cursor);
+    } catch (err) {
+      console.error('Error fetching rows:', err);
+    } finally {
+      setLoadingRows(false);
+    }
+  };
+
+  // Binned and decimated on the server, so charts cost kilobytes whatever the row count
+  const fetchCharts = async (datasetId, column) => {
+    try {
+      const [histogramData, seriesData] = await Promise.all([
+        datasetService.getHistograms(datasetId, { bins: HISTOGRAM_BINS }),
+        datasetService.getSeries(datasetId, { column, points: SERIES_POINTS }),
+      ]);
+      setHistograms(histogramData.histograms);
+      setSeries(seriesData);
+    } catch (err) {
+      console.error('Error fetching charts:', err);
+    }
+  };
+
+  const handleChartColumnChange = async (e) => {
+    const column = e.target.value;
+    setChartColumn(column);
+    try {
+      setSeries(await datasetService.getSeries(currentData.dataset_id, { column, points: SERIES_POINTS }));
+    } catch (err) {
+      console.error('Error fetching series:', err);
+    }
+  };
+
   const handleFileChange = (e) => {
     setFile(e.target.files[0]);
     setError('');
@@ -43,6 +99,10 @@ function Dashboard({ username }) {
     try {
       const response = await datasetService.uploadCSV(file);
       setCurrentData(response);
+      setHistograms(null);
+      setSeries(null);
+      fetchRows(response.dataset_id);
+      fetchCharts(response.dataset_id, chartColumn);
       fetchHistory();
       setFile(null);
       document.getElementById('file-input').value = '';
@@ -98,6 +158,28 @@ function Dashboard({ username }) {
     };
   };
 
+  const getHistogramChart = (histogram) => {
+    const { edges } = histogram;
+    return {
+      labels: edges.slice(0, -1).map((edge, i) => ((edge + edges[i + 1]) / 2).toFixed(1)),
+      datasets: Object.entries(histogram.by_type).map(([type, counts], i) => ({
+        label: type,
+        data: counts,
+        backgroundColor: `hsla(${(i * 360) / Object.keys(histogram.by_type).length}, 65%, 55%, 0.7)`,
+      })),
+    };
+  };
+
+  const getSeriesChart = (seriesData) => ({
+    datasets: [{
+      label: `${seriesData.column} by row`,
+      data: seriesData.x.map((x, i) => ({ x: x + 1, y: seriesData.y[i] })),
+      borderColor: 'rgba(54, 162, 235, 0.8)',
+      borderWidth: 1,
+      pointRadius: 0,
+    }],
+  });
+
   return (
     <div className="dashboard">
       <header className="dashboard-header">
@@ -161,6 +243,30 @@ function Dashboard({ username }) {
             </div>
           </div>
 
+          {histograms && histograms[chartColumn] && series && (
+            <div className="charts-section">
+              <div className="chart-container">
+                <h3>
+                  <select value={chartColumn} onChange={handleChartColumnChange}>
+                    {NUMERIC_COLUMNS.map((col) => <option key={col} value={col}>{col}</option>)}
+                  </select>
+                  {' '}Distribution by Type
+                </h3>
+                <Bar data={getHistogramChart(histograms[chartColumn])} options={{
+                  scales: { x: { stacked: true }, y: { stacked: true, beginAtZero: true } },
+                }} />
+              </div>
+              <div className="chart-container">
+                <h3>{chartColumn} by Row ({series.x.length} of {series.count} points)</h3>
+                <Line data={getSeriesChart(series)} options={{
+                  animation: false,
+                  parsing: false,
+                  scales: { x: { type: 'linear', title: { display: true, text: 'Row' } } },
+                }} />
+              </div>
+            </div>
+          )}
+
           <div className="data-table-section">
             <h3>Equipment Data</h3>
             <div className="table-wrapper">
@@ -175,18 +281,24 @@ function Dashboard({ username }) {
                   </tr>
                 </thead>
                 <tbody>
-                  {currentData.data.map((row, idx) => (
+                  {rows.map((row, idx) => (
                     <tr key={idx}>
-                      <td>{row['Equipment Name']}</td>
-                      <td>{row.Type}</td>
-                      <td>{row.Flowrate}</td>
-                      <td>{row.Pressure}</td>
-                      <td>{row.Temperature}</td>
+                      {row.map((value, col) => (
+                        <td key={col}>{value}</td>
+                      ))}
                     </tr>
                   ))}
                 </tbody>
               </table>
             </div>
+            {nextCursor && (
+              <button
+                onClick={() => fetchRows(currentData.dataset_id, nextCursor)}
+                disabled={loadingRows}
+              >
+                {loadingRows ? 'Loading...' : `Load more rows (${rows.length} of ${currentData.summary.total_count})`}
+              </button>
+            )}
           </div>
 
           <button 
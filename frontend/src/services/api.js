@@ -69,6 +69,8 @@ export const datasetService = {
   uploadCSV: async (file) => {
     const formData = new FormData();
     formData.append('file', file);
+    // Rows are fetched page by page via getRows instead
+    formData.append('include_rows', 'false');
     
     const response = await api.post('/datasets/upload/', formData, {
       headers: {
@@ -78,6 +80,29 @@ export const datasetService = {
     return response.data;
   },
 
+  getRows: async (datasetId, { cursor, limit = 500, columns } = {}) => {
+    const params = { limit };
+    if (cursor) params.cursor = cursor;
+    if (columns) params.columns = columns.join(',');
+    const response = await api.get(`/datasets/${datasetId}/rows/`, { params });
+    return response.data;
+  },
+
+  // Histograms of every numeric column, overall and per equipment type
+  getHistograms: async (datasetId, { bins = 20 } = {}) => {
+    const response = await api.get(`/datasets/${datasetId}/histograms/`, { params: { bins } });
+    return response.data;
+  },
+
+  // One column by row, decimated on the server to at most `points` points
+  getSeries: async (datasetId, { column, points = 1000, method = 'lttb', start, stop } = {}) => {
+    const params = { column, points, method };
+    if (start !== undefined) params.start = start;
+    if (stop !== undefined) params.stop = stop;
+    const response = await api.get(`/datasets/${datasetId}/series/`, { params });
+    return response.data;
+  },
+
   getHistory: async () => {
     const response = await api.get('/datasets/history/');
     return response.data;